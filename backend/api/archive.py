@@ -0,0 +1,202 @@
+"""
+Archive Query Module
+Reads archived transaction partitions (Parquet files written by
+maintenance/partition_maintenance.py) through DuckDB
+"""
+
+import json
+import os
+from datetime import date, timedelta
+from typing import Optional, List, Tuple
+
+from instrumentation import timed
+
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    DUCKDB_AVAILABLE = False
+
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', '/data/archive')
+TRANSACTIONS_DIR = os.path.join(ARCHIVE_DIR, 'transactions')
+MANIFEST_PATH = os.path.join(TRANSACTIONS_DIR, '_manifest.json')
+
+# Manifest cache, refreshed when the file changes
+_manifest_mtime = None
+_archived_before = None
+
+
+def archive_boundary() -> Optional[str]:
+    """First invoice_date still stored in MySQL, or None if nothing is archived"""
+    global _manifest_mtime, _archived_before
+    try:
+        mtime = os.path.getmtime(MANIFEST_PATH)
+    except OSError:
+        return None
+
+    if mtime != _manifest_mtime:
+        with open(MANIFEST_PATH) as f:
+            _archived_before = json.load(f).get('archived_before')
+        _manifest_mtime = mtime
+    return _archived_before
+
+
+def split_date_range(
+    startDate: Optional[str], endDate: Optional[str]
+) -> Tuple[Optional[Tuple[Optional[str], str]], Optional[Tuple[Optional[str], Optional[str]]]]:
+    """Split a requested range into (archive_range, live_range)
+
+    Requests that start before the archive boundary, or have no start date,
+    touch the archive. MySQL is still queried for the whole range: late or
+    backfilled rows dated before the boundary land there after their month
+    was archived, and partition pruning keeps that lookup to the lowest
+    partition. Callers merge the two results.
+    """
+    boundary = archive_boundary()
+    if not DUCKDB_AVAILABLE or boundary is None or (startDate and startDate >= boundary):
+        return None, (startDate, endDate)
+
+    last_archived = (date.fromisoformat(boundary) - timedelta(days=1)).isoformat()
+    archive_range = (startDate, min(endDate, last_archived) if endDate else last_archived)
+    return archive_range, (startDate, endDate)
+
+
+def _date_filter(startDate: Optional[str], endDate: Optional[str]) -> Tuple[str, List]:
+    """invoice_date range clause with DuckDB placeholders"""
+    clause = ""
+    params = []
+    if startDate:
+        clause += " AND invoice_date >= ?"
+        params.append(startDate)
+    if endDate:
+        clause += " AND invoice_date <= ?"
+        params.append(endDate)
+    return clause, params
+
+
+def _query(sql: str, params: List) -> List[dict]:
+    """Run a query over the archive and return rows as dicts"""
+    with timed('archive'):
+        con = duckdb.connect()
+        try:
+            cursor = con.execute(sql.format(source=_source()), params)
+            names = [d[0] for d in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+        finally:
+            con.close()
+
+
+def _source() -> str:
+    """Table expression over all archived partition files"""
+    return f"read_parquet('{os.path.join(TRANSACTIONS_DIR, '*.parquet')}')"
+
+
+def archive_transactions(
+    startDate: Optional[str],
+    endDate: str,
+    category: Optional[str] = None,
+    paymentMethod: Optional[str] = None,
+    gender: Optional[str] = None,
+    limit: int = 1000
+) -> List[dict]:
+    """Archived raw transaction rows, newest first"""
+    clause, params = _date_filter(startDate, endDate)
+    query = """
+        SELECT customer_id, gender, age, category, quantity, price, payment_method, invoice_date
+        FROM {source}
+        WHERE 1=1
+    """ + clause
+
+    if category:
+        query += " AND category = ?"
+        params.append(category)
+    if paymentMethod:
+        query += " AND payment_method = ?"
+        params.append(paymentMethod)
+    if gender:
+        query += " AND gender = ?"
+        params.append(gender)
+
+    query += " ORDER BY invoice_date DESC LIMIT ?"
+    params.append(limit)
+    return _query(query, params)
+
+
+def archive_trends(startDate: Optional[str], endDate: str) -> List[dict]:
+    """Archived daily GMV, orders and buyers"""
+    clause, params = _date_filter(startDate, endDate)
+    return _query(f"""
+        SELECT
+            invoice_date as date,
+            SUM(price * quantity) as gmv,
+            COUNT(*) as order_count,
+            COUNT(DISTINCT customer_id) as unique_buyers
+        FROM {{source}}
+        WHERE 1=1 {clause}
+        GROUP BY invoice_date
+        ORDER BY invoice_date
+    """, params)
+
+
+def archive_categories(startDate: Optional[str], endDate: str) -> List[dict]:
+    """Archived GMV and orders per category"""
+    clause, params = _date_filter(startDate, endDate)
+    return _query(f"""
+        SELECT
+            category,
+            SUM(price * quantity) as gmv,
+            COUNT(*) as order_count
+        FROM {{source}}
+        WHERE 1=1 {clause}
+        GROUP BY category
+    """, params)
+
+
+def archive_customer_totals(startDate: Optional[str], endDate: str) -> List[dict]:
+    """Archived GMV, items and orders per customer (see queries.customer_totals_query)"""
+    clause, params = _date_filter(startDate, endDate)
+    return _query(f"""
+        SELECT
+            customer_id,
+            SUM(price * quantity) as gmv,
+            SUM(quantity) as items,
+            COUNT(*) as counted_orders,
+            COUNT(*) as orders
+        FROM {{source}}
+        WHERE 1=1 {clause}
+        GROUP BY customer_id
+    """, params)
+
+
+def archive_age_distribution(startDate: Optional[str], endDate: str) -> List[dict]:
+    """Archived buyers and GMV per age band (see queries.age_distribution_query)"""
+    clause, params = _date_filter(startDate, endDate)
+    return _query(f"""
+        SELECT
+            CASE
+                WHEN age BETWEEN 18 AND 24 THEN '18-24岁'
+                WHEN age BETWEEN 25 AND 34 THEN '25-34岁'
+                WHEN age BETWEEN 35 AND 44 THEN '35-44岁'
+                WHEN age BETWEEN 45 AND 54 THEN '45-54岁'
+                ELSE '55岁以上'
+            END as age_group,
+            COUNT(DISTINCT customer_id) as count,
+            SUM(price * quantity) as gmv
+        FROM {{source}}
+        WHERE 1=1 {clause}
+        GROUP BY age_group
+    """, params)
+
+
+def archive_payment_methods(startDate: Optional[str], endDate: str) -> List[dict]:
+    """Archived orders and GMV per payment method"""
+    clause, params = _date_filter(startDate, endDate)
+    return _query(f"""
+        SELECT
+            payment_method,
+            COUNT(*) as order_count,
+            SUM(price * quantity) as gmv
+        FROM {{source}}
+        WHERE 1=1 {clause}
+        GROUP BY payment_method
+    """, params)
@@ -0,0 +1,97 @@
+"""
+Customer Feature Lookups
+Point reads of one customer's feature vector (HBase `customer_features`)
+and model outputs (`ml_predictions`), behind an in-process LRU with a TTL
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from instrumentation import timed
+
+FEATURE_TABLE = 'customer_features'
+PREDICTION_TABLE = 'ml_predictions'
+
+FEATURE_CACHE_SIZE = int(os.getenv('FEATURE_CACHE_SIZE', '10000'))  # customers
+FEATURE_CACHE_TTL = float(os.getenv('FEATURE_CACHE_TTL', '60'))  # seconds
+
+INT_FIELDS = {'order_count', 'total_quantity', 'age', 'segment_cluster', 'updated_at'}
+FLOAT_FIELDS = {'price_sum', 'avg_price', 'churn_probability'}
+# Fields written under an earlier name (total_gmv held the sum of unit prices)
+LEGACY_FIELDS = {'total_gmv': 'price_sum'}
+
+
+class TTLCache:
+    """LRU of at most `size` entries, each valid for `ttl` seconds
+
+    Thread-safe: the sync feature endpoint runs in FastAPI's threadpool.
+    """
+
+    def __init__(self, size=FEATURE_CACHE_SIZE, ttl=FEATURE_CACHE_TTL, clock=time.monotonic):
+        self.size = size
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """(hit, value); expired entries count as misses"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= self.clock():
+                return False, None
+            self.entries.move_to_end(key)
+            return True, entry[1]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (self.clock() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+
+_cache = TTLCache()
+
+
+def _decode(data: dict) -> dict:
+    values = {}
+    for column, raw in data.items():
+        name = column.decode('utf-8').split(':', 1)[1]
+        if name in LEGACY_FIELDS:
+            if f"cf:{LEGACY_FIELDS[name]}".encode() in data:
+                continue
+            name = LEGACY_FIELDS[name]
+        text = raw.decode('utf-8')
+        if name in INT_FIELDS:
+            values[name] = int(text)
+        elif name in FLOAT_FIELDS:
+            values[name] = float(text)
+        else:
+            values[name] = text
+    return values
+
+
+def customer_features(pool, customer_id: str) -> Optional[dict]:
+    """{features, predictions} for a customer, or None if it has no feature vector
+
+    Misses are cached too, so unknown ids do not hit HBase on every request.
+    """
+    hit, value = _cache.get(customer_id)
+    if hit:
+        return value
+
+    key = customer_id.encode('utf-8')
+    with timed('hbase'):
+        with pool.connection() as connection:
+            features = connection.table(FEATURE_TABLE).row(key)
+            predictions = connection.table(PREDICTION_TABLE).row(key) if features else {}
+
+    value = None
+    if features:
+        value = {'features': _decode(features), 'predictions': _decode(predictions)}
+    _cache.put(customer_id, value)
+    return value
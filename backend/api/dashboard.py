@@ -0,0 +1,93 @@
+"""
+Default Dashboard Precomputation
+Most dashboard loads ask for the same unfiltered panels, so one background
+task per API process recomputes them every DASHBOARD_REFRESH seconds and
+requests are answered from memory (stale-while-revalidate)
+"""
+
+import asyncio
+import os
+import time
+
+DASHBOARD_REFRESH = float(os.getenv('DASHBOARD_REFRESH', '30'))  # seconds; 0 disables
+DASHBOARD_MAX_STALE = float(os.getenv('DASHBOARD_MAX_STALE', '300'))  # older payloads fall back to live queries
+
+
+class DashboardCache:
+    """Payloads of registered builders, refreshed together in the background"""
+
+    def __init__(self, interval=DASHBOARD_REFRESH, max_stale=DASHBOARD_MAX_STALE, clock=time.monotonic):
+        self.interval = interval
+        self.max_stale = max_stale
+        self.clock = clock
+        self.builders = {}  # name -> blocking callable returning the payload
+        self.payloads = {}  # name -> (refresh started at, payload)
+        self.last_refresh = None
+        self.refreshing = None
+        self.task = None
+
+    def register(self, name: str):
+        """Decorator adding a builder to the refresh set"""
+        def decorator(build):
+            self.builders[name] = build
+            return build
+        return decorator
+
+    def get(self, name: str):
+        """Cached payload, or None when missing or older than max_stale
+
+        Stale payloads are still served while a refresh runs in the background.
+        """
+        if not self.interval:
+            return None
+        entry = self.payloads.get(name)
+        age = self.clock() - entry[0] if entry else None
+        if age is None or age >= self.interval:
+            self.revalidate()
+        if age is None or age > self.max_stale:
+            return None
+        return entry[1]
+
+    def revalidate(self) -> asyncio.Task:
+        """Start a refresh unless one is already running"""
+        if self.refreshing is None or self.refreshing.done():
+            self.refreshing = asyncio.create_task(self.refresh())
+        return self.refreshing
+
+    async def refresh(self):
+        """Rebuild every payload off the event loop; a failed builder keeps its last payload"""
+        started = self.clock()
+        self.last_refresh = started
+        for name, build in self.builders.items():
+            try:
+                payload = await asyncio.to_thread(build)
+            except Exception as e:
+                print(f"[API] Dashboard refresh error ({name}): {e}")
+                continue
+            self.payloads[name] = (started, payload)
+
+    async def run(self):
+        while True:
+            delay = self.interval - (self.clock() - self.last_refresh) if self.last_refresh is not None else 0
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            await self.revalidate()
+
+    def start(self):
+        if self.interval and self.builders and (self.task is None or self.task.done()):
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        for task in (self.task, self.refreshing):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self.task = None
+        self.refreshing = None
+
+
+dashboard = DashboardCache()
@@ -8,6 +8,8 @@ import mysql.connector
 from mysql.connector import pooling
 import redis
 
+from instrumentation import timed_connection
+
 try:
     import happybase
     HBASE_AVAILABLE = True
@@ -32,8 +34,10 @@ REDIS_CONFIG = {
 # HBase Configuration
 HBASE_CONFIG = {
     'host': os.getenv('HBASE_HOST', 'localhost'),
-    'port': int(os.getenv('HBASE_PORT', '9090'))
+    'port': int(os.getenv('HBASE_PORT', '9090')),
+    'timeout': int(os.getenv('HBASE_TIMEOUT_MS', '5000'))
 }
+HBASE_POOL_SIZE = int(os.getenv('HBASE_POOL_SIZE', '4'))
 
 # Connection pool for MySQL
 mysql_pool = None
@@ -52,8 +56,8 @@ def get_mysql_pool():
 
 
 def get_mysql_connection():
-    """Get a connection from the pool"""
-    return get_mysql_pool().get_connection()
+    """Get a connection from the pool (timed and wrapped for slow-query logging)"""
+    return timed_connection(get_mysql_pool().get_connection)
 
 
 # Redis client (singleton)
@@ -71,23 +75,36 @@ def get_redis_client():
     return redis_client
 
 
-# HBase client (singleton)
-hbase_connection = None
+# HBase connection pool (connections open on first checkout)
+hbase_pool = None
 
-def get_hbase_connection():
-    """Get HBase connection"""
-    global hbase_connection
+def get_hbase_pool():
+    """Get or create the HBase Thrift connection pool (None without happybase)"""
+    global hbase_pool
     if not HBASE_AVAILABLE:
         return None
 
-    if hbase_connection is None:
-        try:
-            hbase_connection = happybase.Connection(
-                HBASE_CONFIG['host'],
-                HBASE_CONFIG['port']
-            )
-        except Exception as e:
-            print(f"[Database] Warning: Failed to connect to HBase: {e}")
-            return None
-
-    return hbase_connection
+    if hbase_pool is None:
+        hbase_pool = happybase.ConnectionPool(size=HBASE_POOL_SIZE, **HBASE_CONFIG)
+
+    return hbase_pool
+
+
+def prewarm_connections():
+    """Open the MySQL pool and the Redis connection before the first request
+
+    Failures are logged only; the endpoints retry on demand.
+    """
+    try:
+        conn = get_mysql_pool().get_connection()
+        conn.ping(reconnect=True)
+        conn.close()
+        print("[API] MySQL pool ready")
+    except Exception as e:
+        print(f"[API] MySQL prewarm failed: {e}")
+
+    try:
+        get_redis_client().ping()
+        print("[API] Redis ready")
+    except Exception as e:
+        print(f"[API] Redis prewarm failed: {e}")
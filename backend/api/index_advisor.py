@@ -0,0 +1,128 @@
+"""
+Index Advisor
+Runs EXPLAIN for every endpoint query shape against the configured MySQL
+database and reports plans that fall back to full table scans.
+
+Usage:
+    python index_advisor.py            # print a report
+    python index_advisor.py --check    # exit 1 if any query does a full scan
+
+The same plan assertions run in tests/test_index_advisor.py.
+"""
+
+import argparse
+import itertools
+import sys
+from datetime import date, timedelta
+
+from database import get_mysql_connection
+from queries import (
+    transactions_query, summary_query, customer_stats_summary_query, trends_query,
+    categories_query, segments_query, cohort_query, age_distribution_query,
+    payment_methods_query, forecast_query, customer_query, top_customers_query,
+    category_bits_query
+)
+
+# Representative filter values for EXPLAIN
+SAMPLE_START = (date.today() - timedelta(days=30)).isoformat()
+SAMPLE_END = date.today().isoformat()
+SAMPLE_CATEGORY = '电子产品'
+SAMPLE_PAYMENT_METHOD = '信用卡'
+SAMPLE_GENDER = 'Female'
+SAMPLE_CUSTOMER = 'CUST_000001'
+
+# Queries that intentionally read a whole small, materialized table
+SMALL_TABLE_QUERIES = {'analytics/cohort', 'metrics/summary:stats', 'customers/category-bits'}
+
+# Extra notes that are acceptable but worth surfacing
+WARN_EXTRAS = ('Using filesort', 'Using temporary')
+
+
+def endpoint_queries():
+    """Yield (name, sql, params) for every query shape the API can issue"""
+    date_ranges = [(None, None), (SAMPLE_START, SAMPLE_END)]
+
+    # /api/transactions: every combination of its filters
+    for (start, end), category, payment, gender in itertools.product(
+        date_ranges, (None, SAMPLE_CATEGORY), (None, SAMPLE_PAYMENT_METHOD), (None, SAMPLE_GENDER)
+    ):
+        filters = [name for name, value in (
+            ('date', start), ('category', category), ('payment', payment), ('gender', gender)
+        ) if value]
+        name = f"transactions[{','.join(filters) or 'none'}]"
+        yield (name, *transactions_query(start, end, category, payment, gender, 1000))
+
+    for start, end in date_ranges:
+        suffix = 'date' if start else 'none'
+        yield (f"metrics/summary[{suffix}]", *summary_query(start, end))
+        yield (f"metrics/trends[{suffix}]", *trends_query(start, end))
+        yield (f"analytics/categories[{suffix}]", *categories_query(start, end))
+
+    yield ("metrics/summary:stats", *customer_stats_summary_query())
+    yield ("analytics/segments", *segments_query())
+    yield ("analytics/cohort", *cohort_query())
+    yield ("analytics/age-distribution", *age_distribution_query())
+    yield ("analytics/payment-methods", *payment_methods_query())
+    yield ("forecast[none]", *forecast_query(None, 7))
+    yield ("forecast[category]", *forecast_query(SAMPLE_CATEGORY, 7))
+    yield ("customers/top", *top_customers_query(20))
+    yield ("customers/id", *customer_query(SAMPLE_CUSTOMER))
+    yield ("customers/category-bits", *category_bits_query())
+
+
+def explain(cursor, sql, params):
+    """Return the traditional EXPLAIN rows for a query"""
+    cursor.execute("EXPLAIN " + sql, params)
+    return cursor.fetchall()
+
+
+def analyze_plan(plan):
+    """Return (errors, warnings) for an EXPLAIN plan"""
+    errors = []
+    warnings = []
+    for row in plan:
+        table = row.get('table') or ''
+        # Derived tables and unions are materialized results, not base tables
+        if table.startswith('<'):
+            continue
+        if row.get('type') == 'ALL':
+            errors.append(f"full scan on {table} (rows={row.get('rows')})")
+        extra = row.get('Extra') or ''
+        for note in WARN_EXTRAS:
+            if note in extra:
+                warnings.append(f"{note.lower()} on {table} (key={row.get('key')})")
+    return errors, warnings
+
+
+def run(check=False):
+    """Explain every endpoint query and print a report"""
+    conn = get_mysql_connection()
+    cursor = conn.cursor(dictionary=True)
+    failures = 0
+
+    try:
+        for name, sql, params in endpoint_queries():
+            plan = explain(cursor, sql, params)
+            errors, warnings = analyze_plan(plan)
+            if name in SMALL_TABLE_QUERIES:
+                warnings += errors
+                errors = []
+            keys = sorted({row.get('key') for row in plan if row.get('key')})
+            status = 'FAIL' if errors else ('WARN' if warnings else 'OK')
+            print(f"[{status:4}] {name:40} key={','.join(keys) or '-'}")
+            for message in errors + warnings:
+                print(f"         {message}")
+            failures += bool(errors)
+    finally:
+        cursor.close()
+        conn.close()
+
+    print(f"\n{failures} endpoint queries fall back to a full table scan")
+    return 1 if check and failures else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--check', action='store_true', help='exit non-zero on any full table scan')
+    args = parser.parse_args()
+    sys.exit(run(check=args.check))
@@ -0,0 +1,218 @@
+"""
+Request Instrumentation
+Per-request phase timings (pool acquisition, SQL execution, row fetch,
+OLAP/archive queries, JSON rendering) collected through a context variable,
+exported as Prometheus histograms and a Server-Timing header, plus a
+slow-query log with the query's EXPLAIN plan
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi.responses import JSONResponse
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, Histogram, generate_latest
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+# Configuration from environment
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '200'))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+if PROMETHEUS_AVAILABLE:
+    REQUEST_SECONDS = Histogram(
+        'api_request_seconds', 'Request latency by endpoint',
+        ['endpoint', 'method', 'status'], buckets=LATENCY_BUCKETS
+    )
+    PHASE_SECONDS = Histogram(
+        'api_request_phase_seconds', 'Time spent per request phase by endpoint',
+        ['endpoint', 'phase'], buckets=LATENCY_BUCKETS
+    )
+
+# Phase -> accumulated seconds for the current request (None outside requests)
+_timings = ContextVar('request_timings', default=None)
+
+# Bound histogram children, keyed by label values
+_children = {}
+
+
+def record(phase, seconds):
+    """Add time to a phase of the current request"""
+    timings = _timings.get()
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + seconds
+
+
+@contextmanager
+def timed(phase):
+    """Time a block as part of a request phase"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - start)
+
+
+def _child(histogram, *labels):
+    child = _children.get((histogram, labels))
+    if child is None:
+        child = _children[(histogram, labels)] = histogram.labels(*labels)
+    return child
+
+
+# ============================================
+# Database Wrapper
+# ============================================
+
+class TimedCursor:
+    """Cursor proxy that times execute/fetch and logs slow statements"""
+
+    def __init__(self, cursor, connection):
+        self._cursor = cursor
+        self._connection = connection
+        self._slow = []
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            record('sql', elapsed)
+            if elapsed * 1000 >= SLOW_QUERY_MS:
+                self._slow.append((elapsed, operation, params))
+
+    def fetchone(self):
+        with timed('fetch'):
+            return self._cursor.fetchone()
+
+    def fetchmany(self, *args, **kwargs):
+        with timed('fetch'):
+            return self._cursor.fetchmany(*args, **kwargs)
+
+    def fetchall(self):
+        with timed('fetch'):
+            return self._cursor.fetchall()
+
+    def close(self):
+        result = self._cursor.close()
+        # EXPLAIN once the result set is consumed, so the connection is free
+        for elapsed, operation, params in self._slow:
+            log_slow_query(self._connection, elapsed, operation, params)
+        self._slow.clear()
+        return result
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class TimedConnection:
+    """Connection proxy whose cursors are TimedCursors"""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self._connection.cursor(*args, **kwargs), self._connection)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+def timed_connection(get_connection):
+    """Acquire a connection from the pool, timing the wait"""
+    with timed('pool'):
+        return TimedConnection(get_connection())
+
+
+def log_slow_query(connection, elapsed, operation, params):
+    """Print a slow statement with its EXPLAIN plan"""
+    statement = ' '.join(operation.split())
+    print(f"[API] Slow query ({elapsed * 1000:.0f} ms): {statement} params={params}")
+    if not statement.upper().startswith('SELECT'):
+        return
+
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute("EXPLAIN " + operation, params)
+        for row in cursor.fetchall():
+            print(f"[API]   plan: table={row.get('table')} type={row.get('type')} key={row.get('key')} "
+                  f"rows={row.get('rows')} extra={row.get('Extra')}")
+    except Exception as e:
+        print(f"[API]   plan unavailable: {e}")
+    finally:
+        cursor.close()
+
+
+# ============================================
+# Middleware and Responses
+# ============================================
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse that records serialization time"""
+
+    def render(self, content) -> bytes:
+        with timed('render'):
+            return super().render(content)
+
+
+class TimingMiddleware:
+    """ASGI middleware: collects phase timings, adds Server-Timing and records histograms"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        timings = {}
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+        streaming = False
+
+        async def send_with_timing(message):
+            nonlocal status, streaming
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                streaming = any(name == b'content-type' and value.startswith(b'text/event-stream')
+                                for name, value in message.get('headers', []))
+                total = time.perf_counter() - start
+                header = ', '.join(
+                    [f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in timings.items()]
+                    + [f"total;dur={total * 1000:.1f}"]
+                )
+                message['headers'] = list(message.get('headers', [])) + [(b'server-timing', header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            # Long-lived event streams would swamp the latency histograms
+            if PROMETHEUS_AVAILABLE and not streaming:
+                # Route templates keep label cardinality bounded
+                route = scope.get('route')
+                endpoint = getattr(route, 'path', None) or 'unmatched'
+                total = time.perf_counter() - start
+                _child(REQUEST_SECONDS, endpoint, scope['method'], str(status)).observe(total)
+                for phase, seconds in timings.items():
+                    _child(PHASE_SECONDS, endpoint, phase).observe(seconds)
+                _child(PHASE_SECONDS, endpoint, 'other').observe(max(0.0, total - sum(timings.values())))
+
+
+def metrics_payload():
+    """(body, content type) for the Prometheus scrape endpoint"""
+    if not PROMETHEUS_AVAILABLE:
+        return b"# prometheus_client not installed\n", 'text/plain; charset=utf-8'
+    return generate_latest(), CONTENT_TYPE_LATEST
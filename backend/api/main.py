@@ -3,18 +3,40 @@ FastAPI Backend - RESTful API for E-commerce Analytics
 Provides endpoints for the frontend dashboard to consume
 """
 
-import json
-from datetime import datetime
+import asyncio
+from datetime import date, datetime, timedelta
 from typing import Optional, List
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 
-from database import get_mysql_connection, get_redis_client
+from archive import (
+    split_date_range, archive_transactions, archive_trends, archive_categories,
+    archive_customer_totals, archive_age_distribution, archive_payment_methods
+)
+from customer_features import customer_features
+from dashboard import dashboard
+from database import get_hbase_pool, get_mysql_connection, get_redis_client, prewarm_connections
+from instrumentation import TimedJSONResponse, TimingMiddleware, metrics_payload
+from olap import (
+    BACKENDS, use_olap, olap_summary, olap_trends, olap_categories,
+    olap_age_distribution, olap_payment_methods
+)
+from raw import column_spec, customer_prefixes, day_prefixes, stream_rows
+from realtime import WINDOWS, data_freshness, day_totals, realtime_totals, window_metrics
+from stream import hub, snapshot_events
+from queries import (
+    transactions_query, summary_query, customer_totals_query, customer_stats_summary_query, trends_query,
+    categories_query, segments_query, cohort_query, age_distribution_query,
+    payment_methods_query, forecast_query, customer_query, top_customers_query,
+    category_bits_query
+)
 from models import (
     TransactionRow, MetricsSummary, CategoryData, 
-    UserSegment, CohortData, TrendDataPoint, HealthResponse
+    UserSegment, CohortData, TrendDataPoint, ForecastPoint, CustomerStats, HealthResponse,
+    CustomerFeatures
 )
 
 
@@ -22,15 +44,21 @@ from models import (
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     print("[API] Starting FastAPI service...")
+    await asyncio.to_thread(prewarm_connections)
+    # First refresh runs in the background; requests fall back to live queries until it lands
+    dashboard.start()
     yield
     print("[API] Shutting down...")
+    await dashboard.stop()
+    await hub.stop()
 
 
 app = FastAPI(
     title="E-commerce Analytics API",
     description="RESTful API for e-commerce data visualization dashboard",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=TimedJSONResponse
 )
 
 # CORS middleware for frontend
@@ -40,8 +68,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Per-phase request timing (Server-Timing header and /api/metrics)
+app.add_middleware(TimingMiddleware)
+
 
 # ============================================
 # Health Check
@@ -81,6 +113,13 @@ async def health_check():
     )
 
 
+@app.get("/api/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint for request latency histograms"""
+    body, content_type = metrics_payload()
+    return Response(content=body, media_type=content_type)
+
+
 # ============================================
 # Transaction Endpoints
 # ============================================
@@ -99,30 +138,18 @@ async def get_transactions(
         conn = get_mysql_connection()
         cursor = conn.cursor(dictionary=True)
         
-        query = "SELECT customer_id, gender, age, category, quantity, price, payment_method, invoice_date FROM transactions WHERE 1=1"
-        params = []
-        
-        if startDate:
-            query += " AND invoice_date >= %s"
-            params.append(startDate)
-        if endDate:
-            query += " AND invoice_date <= %s"
-            params.append(endDate)
-        if category:
-            query += " AND category = %s"
-            params.append(category)
-        if paymentMethod:
-            query += " AND payment_method = %s"
-            params.append(paymentMethod)
-        if gender:
-            query += " AND gender = %s"
-            params.append(gender)
-        
-        query += " ORDER BY invoice_date DESC LIMIT %s"
-        params.append(limit)
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
+        archive_range, live_range = split_date_range(startDate, endDate)
+        
+        rows = []
+        if live_range:
+            query, params = transactions_query(*live_range, category, paymentMethod, gender, limit)
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        
+        # Older rows come from the Parquet archive; MySQL may hold late rows for the same dates
+        if archive_range:
+            rows += archive_transactions(*archive_range, category, paymentMethod, gender, limit)
+            rows = sorted(rows, key=lambda row: row['invoice_date'], reverse=True)[:limit]
         
         # Convert date to string
         for row in rows:
@@ -138,140 +165,239 @@ async def get_transactions(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _raw_stream(prefixes, fields, limit, batchSize):
+    """NDJSON response over HBase prefix scans"""
+    pool = get_hbase_pool()
+    if pool is None:
+        raise HTTPException(status_code=503, detail="HBase is not available")
+    try:
+        columns = column_spec(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(stream_rows(pool, prefixes, columns, limit, batchSize), media_type="application/x-ndjson")
+
+
+@app.get("/api/transactions/raw/day/{day}")
+async def get_raw_transactions_by_day(
+    day: date,
+    customerId: Optional[str] = Query(None, description="Only this customer's rows"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    limit: int = Query(1000, ge=1, le=100000, description="Max rows to return"),
+    batchSize: int = Query(500, ge=1, le=10000, description="Rows per HBase scanner round trip")
+):
+    """Raw rows for one day from HBase (NDJSON stream)"""
+    return _raw_stream(day_prefixes(day.isoformat(), customerId), fields, limit, batchSize)
+
+
+@app.get("/api/transactions/raw/customer/{customer_id}")
+async def get_raw_transactions_by_customer(
+    customer_id: str,
+    startDate: Optional[date] = Query(None, description="Start date (default: 30 days before endDate)"),
+    endDate: Optional[date] = Query(None, description="End date (default: today)"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    limit: int = Query(1000, ge=1, le=100000, description="Max rows to return"),
+    batchSize: int = Query(500, ge=1, le=10000, description="Rows per HBase scanner round trip")
+):
+    """Raw rows for one customer from HBase, newest day first (NDJSON stream)"""
+    end = endDate or date.today()
+    start = startDate or end - timedelta(days=30)
+    try:
+        prefixes = customer_prefixes(customer_id, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _raw_stream(prefixes, fields, limit, batchSize)
+
+
+@app.get("/api/customers/{customer_id}/features", response_model=CustomerFeatures)
+def get_customer_features(customer_id: str):
+    """Feature vector and model outputs for one customer (HBase point reads, cached)"""
+    pool = get_hbase_pool()
+    if pool is None:
+        raise HTTPException(status_code=503, detail="HBase is not available")
+    try:
+        value = customer_features(pool, customer_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if value is None:
+        raise HTTPException(status_code=404, detail=f"No features for customer {customer_id}")
+    return {"customerId": customer_id, **value}
+
+
 # ============================================
 # Metrics Endpoints
 # ============================================
 
+def _default_panel(name: str, *filters):
+    """Precomputed payload for an unfiltered request, else None"""
+    return None if any(filters) else dashboard.get(name)
+
+
 @app.get("/api/metrics/summary")
 async def get_metrics_summary(
     startDate: Optional[str] = Query(None),
-    endDate: Optional[str] = Query(None)
+    endDate: Optional[str] = Query(None),
+    backend: Optional[str] = Query(None, pattern=f"^({'|'.join(BACKENDS)})$", description="Analytics backend"),
+    realtime: bool = Query(False, description="Take today's GMV/orders/items from the Redis counters")
 ):
     """Get aggregated KPI metrics"""
+    summary = _default_panel('summary', startDate, endDate, backend, realtime)
+    if summary is None:
+        try:
+            summary = _metrics_summary(startDate, endDate, backend, realtime)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    # Freshness is read per request so a cached summary never reports a
+    # frozen staleness; a Redis outage should not fail the summary
     try:
-        # First try Redis cache for real-time data
-        redis_client = get_redis_client()
-        cached_gmv = redis_client.get('realtime:total_gmv')
-        cached_orders = redis_client.get('realtime:total_orders')
-        
+        freshness = data_freshness(get_redis_client())
+    except Exception:
+        freshness = None
+    return {**summary, "dataFreshness": freshness}
+
+
+@dashboard.register('summary')
+def _metrics_summary(startDate=None, endDate=None, backend=None, realtime=False):
+    """KPI payload (blocking), without the per-request dataFreshness"""
+    # Today's additive totals come from Redis when it falls inside the range
+    today = date.today().isoformat()
+    live_from = today if realtime and (startDate or today) <= today <= (endDate or today) else None
+    
+    if use_olap(backend):
+        result = olap_summary(startDate, endDate, live_from)
+    else:
         conn = get_mysql_connection()
         cursor = conn.cursor(dictionary=True)
         
-        # Build date filter
-        date_filter = ""
-        params = []
-        if startDate:
-            date_filter += " AND invoice_date >= %s"
-            params.append(startDate)
-        if endDate:
-            date_filter += " AND invoice_date <= %s"
-            params.append(endDate)
-        
-        # Get aggregated metrics
-        cursor.execute(f"""
-            SELECT 
-                COALESCE(SUM(price * quantity), 0) as gmv,
-                COUNT(*) as order_count,
-                COUNT(DISTINCT customer_id) as unique_buyers,
-                COALESCE(SUM(quantity), 0) as items_sold
-            FROM transactions
-            WHERE 1=1 {date_filter}
-        """, params)
-        
-        result = cursor.fetchone()
-        
-        # Calculate additional metrics
-        gmv = float(result['gmv'] or 0)
-        order_count = int(result['order_count'] or 0)
-        unique_buyers = int(result['unique_buyers'] or 0)
-        items_sold = int(result['items_sold'] or 0)
-        aov = gmv / max(1, order_count)
-        ipv = gmv / max(1, items_sold)
-        
-        # Get repurchase rate
-        cursor.execute(f"""
-            SELECT COUNT(*) as repeat_buyers
-            FROM (
-                SELECT customer_id, COUNT(*) as orders
-                FROM transactions
-                WHERE 1=1 {date_filter}
-                GROUP BY customer_id
-                HAVING orders > 1
-            ) t
-        """, params)
-        
-        repeat_result = cursor.fetchone()
-        repeat_buyers = int(repeat_result['repeat_buyers'] or 0)
-        repurchase_rate = repeat_buyers / max(1, unique_buyers)
+        archive_range, live_range = split_date_range(startDate, endDate)
+        
+        if not startDate and not endDate:
+            # All-time totals from the per-customer aggregates, which the
+            # consumer keeps as current as the Redis day counters (archiving
+            # partitions does not remove customers from them)
+            cursor.execute(*customer_stats_summary_query())
+            live_from = None
+            result = cursor.fetchone()
+        elif archive_range:
+            # Buyers and repeat buyers are per customer, so merge per customer
+            cursor.execute(*customer_totals_query(*live_range, live_from))
+            result = _merge_customer_totals(cursor.fetchall() + archive_customer_totals(*archive_range))
+        else:
+            # Totals and repeat buyers in a single pass
+            cursor.execute(*summary_query(startDate, endDate, live_from))
+            result = cursor.fetchone()
         
         cursor.close()
         conn.close()
-        
-        return {
-            "gmv": round(gmv, 2),
-            "orderCount": order_count,
-            "uniqueBuyers": unique_buyers,
-            "totalItemsSold": items_sold,
-            "aov": round(aov, 2),
-            "ipv": round(ipv, 2),
-            "repurchaseRate": round(repurchase_rate, 4)
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    
+    # Calculate additional metrics
+    gmv = float(result['gmv'] or 0)
+    order_count = int(result['order_count'] or 0)
+    unique_buyers = int(result['unique_buyers'] or 0)
+    items_sold = int(result['items_sold'] or 0)
+    repeat_buyers = int(result['repeat_buyers'] or 0)
+    
+    if live_from:
+        live = day_totals(get_redis_client(), live_from)
+        gmv += live['gmv']
+        order_count += live['order_count']
+        items_sold += live['items_sold']
+    
+    aov = gmv / max(1, order_count)
+    ipv = gmv / max(1, items_sold)
+    repurchase_rate = repeat_buyers / max(1, unique_buyers)
+    
+    return {
+        "gmv": round(gmv, 2),
+        "orderCount": order_count,
+        "uniqueBuyers": unique_buyers,
+        "totalItemsSold": items_sold,
+        "aov": round(aov, 2),
+        "ipv": round(ipv, 2),
+        "repurchaseRate": round(repurchase_rate, 4)
+    }
+
+
+def _merge_customer_totals(rows):
+    """Summary totals from per-customer rows of the archive and MySQL"""
+    customers = {}
+    for row in rows:
+        totals = customers.setdefault(row['customer_id'], [0.0, 0, 0, 0])
+        totals[0] += float(row['gmv'] or 0)
+        totals[1] += int(row['items'] or 0)
+        totals[2] += int(row['counted_orders'] or 0)
+        totals[3] += int(row['orders'] or 0)
+    return {
+        'gmv': sum(t[0] for t in customers.values()),
+        'items_sold': sum(t[1] for t in customers.values()),
+        'order_count': sum(t[2] for t in customers.values()),
+        'unique_buyers': len(customers),
+        'repeat_buyers': sum(1 for t in customers.values() if t[3] > 1),
+    }
 
 
 @app.get("/api/metrics/trends")
 async def get_trends(
     startDate: Optional[str] = Query(None),
-    endDate: Optional[str] = Query(None)
+    endDate: Optional[str] = Query(None),
+    backend: Optional[str] = Query(None, pattern=f"^({'|'.join(BACKENDS)})$", description="Analytics backend")
 ):
     """Get daily trend data"""
+    cached = _default_panel('trends', startDate, endDate, backend)
+    if cached is not None:
+        return cached
     try:
-        conn = get_mysql_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        date_filter = ""
-        params = []
-        if startDate:
-            date_filter += " AND invoice_date >= %s"
-            params.append(startDate)
-        if endDate:
-            date_filter += " AND invoice_date <= %s"
-            params.append(endDate)
-        
-        cursor.execute(f"""
-            SELECT 
-                invoice_date as date,
-                SUM(price * quantity) as gmv,
-                COUNT(*) as order_count,
-                COUNT(DISTINCT customer_id) as unique_buyers
-            FROM transactions
-            WHERE 1=1 {date_filter}
-            GROUP BY invoice_date
-            ORDER BY invoice_date
-        """, params)
-        
-        rows = cursor.fetchall()
-        
-        result = []
-        for row in rows:
-            result.append({
-                "date": row['date'].strftime('%Y-%m-%d'),
-                "gmv": float(row['gmv'] or 0),
-                "orderCount": int(row['order_count'] or 0),
-                "uniqueBuyers": int(row['unique_buyers'] or 0)
-            })
-        
-        cursor.close()
-        conn.close()
-        
-        return result
-        
+        return _daily_trends(startDate, endDate, backend)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@dashboard.register('trends')
+def _daily_trends(startDate=None, endDate=None, backend=None):
+    """Daily trend payload (blocking)"""
+    if use_olap(backend):
+        return _format_trends(olap_trends(startDate, endDate))
+    
+    conn = get_mysql_connection()
+    cursor = conn.cursor(dictionary=True)
+    
+    archive_range, live_range = split_date_range(startDate, endDate)
+    
+    rows = []
+    if live_range:
+        cursor.execute(*trends_query(*live_range))
+        rows = cursor.fetchall()
+    
+    # Merge archived days with late rows MySQL holds for the same dates
+    # (buyers are summed, so a customer in both counts twice on that day)
+    if archive_range:
+        merged = {row['date']: dict(row) for row in rows}
+        for row in archive_trends(*archive_range):
+            target = merged.setdefault(row['date'], {'date': row['date'], 'gmv': 0, 'order_count': 0, 'unique_buyers': 0})
+            target['gmv'] = float(target['gmv'] or 0) + float(row['gmv'] or 0)
+            target['order_count'] = int(target['order_count'] or 0) + int(row['order_count'] or 0)
+            target['unique_buyers'] = int(target['unique_buyers'] or 0) + int(row['unique_buyers'] or 0)
+        rows = [merged[day] for day in sorted(merged)]
+    
+    cursor.close()
+    conn.close()
+    
+    return _format_trends(rows)
+
+
+def _format_trends(rows):
+    """Convert daily trend rows to the response shape"""
+    return [
+        {
+            "date": row['date'].strftime('%Y-%m-%d'),
+            "gmv": float(row['gmv'] or 0),
+            "orderCount": int(row['order_count'] or 0),
+            "uniqueBuyers": int(row['unique_buyers'] or 0)
+        }
+        for row in rows
+    ]
+
+
 # ============================================
 # Analytics Endpoints
 # ============================================
@@ -279,98 +405,91 @@ async def get_trends(
 @app.get("/api/analytics/categories")
 async def get_category_analytics(
     startDate: Optional[str] = Query(None),
-    endDate: Optional[str] = Query(None)
+    endDate: Optional[str] = Query(None),
+    backend: Optional[str] = Query(None, pattern=f"^({'|'.join(BACKENDS)})$", description="Analytics backend")
 ):
     """Get category breakdown data"""
+    cached = _default_panel('categories', startDate, endDate, backend)
+    if cached is not None:
+        return cached
     try:
-        conn = get_mysql_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        date_filter = ""
-        params = []
-        if startDate:
-            date_filter += " AND invoice_date >= %s"
-            params.append(startDate)
-        if endDate:
-            date_filter += " AND invoice_date <= %s"
-            params.append(endDate)
-        
-        cursor.execute(f"""
-            SELECT 
-                category,
-                SUM(price * quantity) as gmv,
-                COUNT(*) as order_count
-            FROM transactions
-            WHERE 1=1 {date_filter}
-            GROUP BY category
-            ORDER BY gmv DESC
-        """, params)
-        
-        rows = cursor.fetchall()
-        
-        # Calculate percentages
-        total_gmv = sum(float(row['gmv'] or 0) for row in rows)
-        
-        result = []
-        for row in rows:
-            gmv = float(row['gmv'] or 0)
-            result.append({
-                "category": row['category'],
-                "gmv": round(gmv, 2),
-                "orderCount": int(row['order_count'] or 0),
-                "percentage": round(gmv / max(1, total_gmv) * 100, 2)
-            })
-        
-        cursor.close()
-        conn.close()
-        
-        return result
-        
+        return _category_breakdown(startDate, endDate, backend)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@dashboard.register('categories')
+def _category_breakdown(startDate=None, endDate=None, backend=None):
+    """Category breakdown payload (blocking)"""
+    if use_olap(backend):
+        return _format_breakdown(olap_categories(startDate, endDate), 'category')
+    
+    conn = get_mysql_connection()
+    cursor = conn.cursor(dictionary=True)
+    
+    archive_range, live_range = split_date_range(startDate, endDate)
+    
+    rows = []
+    if live_range:
+        cursor.execute(*categories_query(*live_range))
+        rows = cursor.fetchall()
+    
+    # Merge archived totals into the live ones
+    if archive_range:
+        merged = {row['category']: dict(row) for row in rows}
+        for row in archive_categories(*archive_range):
+            target = merged.setdefault(row['category'], {'category': row['category'], 'gmv': 0, 'order_count': 0})
+            target['gmv'] = float(target['gmv'] or 0) + float(row['gmv'] or 0)
+            target['order_count'] = int(target['order_count'] or 0) + int(row['order_count'] or 0)
+        rows = sorted(merged.values(), key=lambda row: float(row['gmv'] or 0), reverse=True)
+    
+    cursor.close()
+    conn.close()
+    
+    return _format_breakdown(rows, 'category')
+
+
 @app.get("/api/analytics/segments")
 async def get_user_segments():
     """Get user segmentation data"""
+    cached = _default_panel('segments')
+    if cached is not None:
+        return cached
     try:
-        conn = get_mysql_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT 
-                segment,
-                COUNT(*) as count,
-                SUM(total_gmv) as gmv
-            FROM user_segments
-            GROUP BY segment
-            ORDER BY gmv DESC
-        """)
-        
-        rows = cursor.fetchall()
-        
-        # Calculate percentages
-        total_count = sum(int(row['count'] or 0) for row in rows)
-        
-        result = []
-        for row in rows:
-            count = int(row['count'] or 0)
-            result.append({
-                "segment": row['segment'],
-                "count": count,
-                "percentage": round(count / max(1, total_count) * 100, 2),
-                "gmv": float(row['gmv'] or 0)
-            })
-        
-        cursor.close()
-        conn.close()
-        
-        return result
-        
+        return _user_segments()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@dashboard.register('segments')
+def _user_segments():
+    """Segment payload (blocking)"""
+    conn = get_mysql_connection()
+    cursor = conn.cursor(dictionary=True)
+    
+    cursor.execute(*segments_query())
+    
+    rows = cursor.fetchall()
+    
+    # Calculate percentages
+    total_count = sum(int(row['count'] or 0) for row in rows)
+    
+    result = []
+    for row in rows:
+        count = int(row['count'] or 0)
+        result.append({
+            "segment": row['segment'],
+            "count": count,
+            "percentage": round(count / max(1, total_count) * 100, 2),
+            "gmv": float(row['gmv'] or 0)
+        })
+    
+    cursor.close()
+    conn.close()
+    
+    return result
+
+
 @app.get("/api/analytics/cohort")
 async def get_cohort_data():
     """Get cohort retention data"""
@@ -379,11 +498,7 @@ async def get_cohort_data():
         cursor = conn.cursor(dictionary=True)
         
         # Get cohort data from cohort_retention table
-        cursor.execute("""
-            SELECT cohort_month, cohort_size, month_offset, retention_rate
-            FROM cohort_retention
-            ORDER BY cohort_month, month_offset
-        """)
+        cursor.execute(*cohort_query())
         
         rows = cursor.fetchall()
         
@@ -409,40 +524,141 @@ async def get_cohort_data():
 
 
 @app.get("/api/analytics/age-distribution")
-async def get_age_distribution():
+async def get_age_distribution(
+    backend: Optional[str] = Query(None, pattern=f"^({'|'.join(BACKENDS)})$", description="Analytics backend")
+):
     """Get age distribution data"""
+    cached = _default_panel('age', backend)
+    if cached is not None:
+        return cached
     try:
+        return _age_distribution(backend)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@dashboard.register('age')
+def _age_distribution(backend=None):
+    """Age group payload (blocking)"""
+    if use_olap(backend):
+        return _format_age_groups(olap_age_distribution())
+    
+    conn = get_mysql_connection()
+    cursor = conn.cursor(dictionary=True)
+    
+    cursor.execute(*age_distribution_query())
+    
+    rows = cursor.fetchall()
+    
+    # Merge archived months (buyers are summed, so a customer in both counts twice)
+    archive_range, _ = split_date_range(None, None)
+    if archive_range:
+        merged = {row['age_group']: dict(row) for row in rows}
+        for row in archive_age_distribution(*archive_range):
+            target = merged.setdefault(row['age_group'], {'age_group': row['age_group'], 'count': 0, 'gmv': 0})
+            target['count'] = int(target['count'] or 0) + int(row['count'] or 0)
+            target['gmv'] = float(target['gmv'] or 0) + float(row['gmv'] or 0)
+        # Band labels sort in age order
+        rows = [merged[group] for group in sorted(merged)]
+    
+    cursor.close()
+    conn.close()
+    
+    return _format_age_groups(rows)
+
+
+def _format_age_groups(rows):
+    """Convert age group rows to segment-shaped results with percentages"""
+    total_count = sum(int(row['count'] or 0) for row in rows)
+    
+    result = []
+    for row in rows:
+        count = int(row['count'] or 0)
+        result.append({
+            "segment": row['age_group'],
+            "count": count,
+            "percentage": round(count / max(1, total_count) * 100, 2),
+            "gmv": float(row['gmv'] or 0)
+        })
+    return result
+
+
+@app.get("/api/analytics/payment-methods")
+async def get_payment_method_distribution(
+    backend: Optional[str] = Query(None, pattern=f"^({'|'.join(BACKENDS)})$", description="Analytics backend")
+):
+    """Get payment method distribution"""
+    try:
+        if use_olap(backend):
+            return _format_breakdown(olap_payment_methods(), 'payment_method')
+        
         conn = get_mysql_connection()
         cursor = conn.cursor(dictionary=True)
         
-        cursor.execute("""
-            SELECT 
-                CASE 
-                    WHEN age BETWEEN 18 AND 24 THEN '18-24岁'
-                    WHEN age BETWEEN 25 AND 34 THEN '25-34岁'
-                    WHEN age BETWEEN 35 AND 44 THEN '35-44岁'
-                    WHEN age BETWEEN 45 AND 54 THEN '45-54岁'
-                    ELSE '55岁以上'
-                END as age_group,
-                COUNT(DISTINCT customer_id) as count,
-                SUM(price * quantity) as gmv
-            FROM transactions
-            GROUP BY age_group
-            ORDER BY FIELD(age_group, '18-24岁', '25-34岁', '35-44岁', '45-54岁', '55岁以上')
-        """)
+        cursor.execute(*payment_methods_query())
         
         rows = cursor.fetchall()
         
-        total_count = sum(int(row['count'] or 0) for row in rows)
+        # Merge archived months into the live totals
+        archive_range, _ = split_date_range(None, None)
+        if archive_range:
+            merged = {row['payment_method']: dict(row) for row in rows}
+            for row in archive_payment_methods(*archive_range):
+                target = merged.setdefault(row['payment_method'], {'payment_method': row['payment_method'], 'gmv': 0, 'order_count': 0})
+                target['gmv'] = float(target['gmv'] or 0) + float(row['gmv'] or 0)
+                target['order_count'] = int(target['order_count'] or 0) + int(row['order_count'] or 0)
+            rows = sorted(merged.values(), key=lambda row: float(row['gmv'] or 0), reverse=True)
+        
+        cursor.close()
+        conn.close()
+        
+        return _format_breakdown(rows, 'payment_method')
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _format_breakdown(rows, key):
+    """Convert GMV breakdown rows to category-shaped results with percentages"""
+    total_gmv = sum(float(row['gmv'] or 0) for row in rows)
+    
+    result = []
+    for row in rows:
+        gmv = float(row['gmv'] or 0)
+        result.append({
+            "category": row[key],
+            "gmv": round(gmv, 2),
+            "orderCount": int(row['order_count'] or 0),
+            "percentage": round(gmv / max(1, total_gmv) * 100, 2)
+        })
+    return result
+
+
+# ============================================
+# Forecast Endpoints
+# ============================================
+
+@app.get("/api/forecast", response_model=List[ForecastPoint])
+async def get_forecast(
+    category: Optional[str] = Query(None, description="Category filter"),
+    days: int = Query(7, ge=1, le=90, description="Number of days ahead")
+):
+    """Get precomputed demand forecasts (written by the consumer)"""
+    try:
+        conn = get_mysql_connection()
+        cursor = conn.cursor(dictionary=True)
+        
+        cursor.execute(*forecast_query(category, days))
+        rows = cursor.fetchall()
         
         result = []
         for row in rows:
-            count = int(row['count'] or 0)
             result.append({
-                "segment": row['age_group'],
-                "count": count,
-                "percentage": round(count / max(1, total_count) * 100, 2),
-                "gmv": float(row['gmv'] or 0)
+                "category": row['category'],
+                "date": row['forecast_date'].strftime('%Y-%m-%d'),
+                "predictedGmv": float(row['predicted_gmv'] or 0),
+                "predictedOrders": int(row['predicted_orders'] or 0),
+                "generatedAt": row['generated_at'].isoformat()
             })
         
         cursor.close()
@@ -454,44 +670,81 @@ async def get_age_distribution():
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/analytics/payment-methods")
-async def get_payment_method_distribution():
-    """Get payment method distribution"""
+# ============================================
+# Customer Endpoints (from customer_stats)
+# ============================================
+
+def _format_customer(row: dict, categories: Optional[List[str]] = None) -> dict:
+    """Shape a customer_stats row for the API"""
+    order_count = int(row['order_count'] or 0)
+    total_gmv = float(row['total_gmv'] or 0)
+    customer = {
+        "customerId": row['customer_id'],
+        "orderCount": order_count,
+        "totalGmv": round(total_gmv, 2),
+        "itemsSold": int(row['items_sold'] or 0),
+        "aov": round(total_gmv / max(1, order_count), 2),
+        "firstOrderDate": str(row['first_order_date']),
+        "lastOrderDate": str(row['last_order_date'])
+    }
+    if categories is not None:
+        customer.update({
+            "gender": row['gender'],
+            "age": row['age'],
+            "categories": categories,
+            "segment": row['segment'],
+            "churnRisk": float(row['predicted_churn_risk']) if row['predicted_churn_risk'] is not None else None
+        })
+    return customer
+
+
+@app.get("/api/customers/top", response_model=List[CustomerStats])
+async def get_top_customers(
+    limit: int = Query(20, ge=1, le=500, description="Number of customers")
+):
+    """Get the customers with the highest lifetime GMV"""
     try:
         conn = get_mysql_connection()
         cursor = conn.cursor(dictionary=True)
         
-        cursor.execute("""
-            SELECT 
-                payment_method,
-                COUNT(*) as order_count,
-                SUM(price * quantity) as gmv
-            FROM transactions
-            GROUP BY payment_method
-            ORDER BY gmv DESC
-        """)
-        
+        cursor.execute(*top_customers_query(limit))
         rows = cursor.fetchall()
         
-        total_gmv = sum(float(row['gmv'] or 0) for row in rows)
+        cursor.close()
+        conn.close()
         
-        result = []
-        for row in rows:
-            gmv = float(row['gmv'] or 0)
-            result.append({
-                "category": row['payment_method'],
-                "gmv": round(gmv, 2),
-                "orderCount": int(row['order_count'] or 0),
-                "percentage": round(gmv / max(1, total_gmv) * 100, 2)
-            })
+        return [_format_customer(row) for row in rows]
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/customers/{customer_id}", response_model=CustomerStats)
+async def get_customer(customer_id: str):
+    """Get one customer's lifetime aggregates"""
+    try:
+        conn = get_mysql_connection()
+        cursor = conn.cursor(dictionary=True)
+        
+        cursor.execute(*customer_query(customer_id))
+        row = cursor.fetchone()
+        
+        categories = []
+        if row is not None:
+            cursor.execute(*category_bits_query())
+            mask = int(row['category_mask'] or 0)
+            categories = [b['category'] for b in sorted(cursor.fetchall(), key=lambda b: b['bit'])
+                          if mask >> b['bit'] & 1]
         
         cursor.close()
         conn.close()
         
-        return result
-        
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"Customer {customer_id} not found")
+    return _format_customer(row, categories)
 
 
 # ============================================
@@ -499,30 +752,35 @@ async def get_payment_method_distribution():
 # ============================================
 
 @app.get("/api/realtime/latest")
-async def get_realtime_latest():
+async def get_realtime_latest(
+    window: str = Query("1h", pattern=f"^({'|'.join(WINDOWS)})$", description="Sliding window for GMV/orders/categories")
+):
     """Get real-time metrics from Redis cache"""
     try:
         redis_client = get_redis_client()
-        
-        total_gmv = redis_client.get('realtime:total_gmv') or '0'
-        total_orders = redis_client.get('realtime:total_orders') or '0'
-        last_updated = redis_client.get('realtime:last_updated') or None
-        
-        # Get latest transactions
-        latest_transactions = redis_client.lrange('realtime:latest_transactions', 0, 9)
-        transactions = [json.loads(t) for t in latest_transactions]
-        
         return {
-            "total_gmv": float(total_gmv),
-            "total_orders": int(total_orders),
-            "last_updated": last_updated,
-            "latest_transactions": transactions
+            **realtime_totals(redis_client),
+            "window": window_metrics(redis_client, window)
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+
+@app.get("/api/realtime/stream")
+async def stream_realtime(
+    request: Request,
+    window: str = Query("1h", pattern=f"^({'|'.join(WINDOWS)})$", description="Sliding window for GMV/orders/categories")
+):
+    """Server-Sent Events push of the /api/realtime/latest snapshot after each consumer batch"""
+    return StreamingResponse(
+        snapshot_events(request, window),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -2,7 +2,7 @@
 Pydantic Models for API Request/Response
 """
 
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import date
 from pydantic import BaseModel
 
@@ -28,6 +28,7 @@ class MetricsSummary(BaseModel):
     aov: float
     ipv: float
     repurchaseRate: float
+    dataFreshness: Optional[dict] = None
 
 
 class CategoryData(BaseModel):
@@ -59,6 +60,38 @@ class TrendDataPoint(BaseModel):
     value: float
 
 
+class ForecastPoint(BaseModel):
+    """Precomputed demand forecast for one category and day"""
+    category: str
+    date: str
+    predictedGmv: float
+    predictedOrders: int
+    generatedAt: str
+
+
+class CustomerStats(BaseModel):
+    """Lifetime aggregates for one customer"""
+    customerId: str
+    orderCount: int
+    totalGmv: float
+    itemsSold: int
+    aov: float
+    firstOrderDate: str
+    lastOrderDate: str
+    gender: Optional[str] = None
+    age: Optional[int] = None
+    categories: Optional[List[str]] = None
+    segment: Optional[str] = None
+    churnRisk: Optional[float] = None
+
+
+class CustomerFeatures(BaseModel):
+    """Feature-store vector and latest model outputs for one customer"""
+    customerId: str
+    features: Dict[str, Any]
+    predictions: Dict[str, Any]
+
+
 class FilterParams(BaseModel):
     """Filter parameters for queries"""
     startDate: Optional[str] = None
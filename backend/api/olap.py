@@ -0,0 +1,165 @@
+"""
+OLAP Query Module
+Runs the dashboard aggregations over the consumer's Parquet dataset with
+DuckDB, as an alternative to row-oriented InnoDB
+"""
+
+import glob
+import os
+from typing import Optional, List, Tuple
+
+from instrumentation import timed
+
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    DUCKDB_AVAILABLE = False
+
+OLAP_DIR = os.getenv('OLAP_DIR', '/data/olap')
+ANALYTICS_BACKEND = os.getenv('ANALYTICS_BACKEND', 'mysql')  # 'mysql' or 'duckdb'
+BACKENDS = ('mysql', 'duckdb')
+
+# Stand-in with the dataset's columns and no rows, for before the first flush
+EMPTY_SOURCE = """(
+    SELECT NULL::VARCHAR as customer_id, NULL::VARCHAR as gender, NULL::INTEGER as age,
+           NULL::VARCHAR as category, NULL::INTEGER as quantity, NULL::DOUBLE as price,
+           NULL::VARCHAR as payment_method, NULL::DATE as invoice_date,
+           NULL::VARCHAR as invoice_time, NULL::VARCHAR as month
+    WHERE false
+)"""
+
+
+def use_olap(backend: Optional[str] = None) -> bool:
+    """Whether a request should run on the DuckDB backend"""
+    return DUCKDB_AVAILABLE and (backend or ANALYTICS_BACKEND) == 'duckdb'
+
+
+def _source() -> str:
+    """Table expression over the hive-partitioned transaction dataset"""
+    pattern = os.path.join(OLAP_DIR, 'transactions', '*', '*.parquet')
+    # read_parquet raises on a glob with no matches
+    if not glob.glob(pattern):
+        return EMPTY_SOURCE
+    return f"read_parquet('{pattern}', hive_partitioning = true)"
+
+
+def _date_filter(startDate: Optional[str], endDate: Optional[str]) -> Tuple[str, List]:
+    """Build an invoice_date range filter, plus a month filter for partition pruning"""
+    clause = ""
+    params = []
+    if startDate:
+        clause += " AND invoice_date >= CAST(? AS DATE) AND month >= ?"
+        params += [startDate, startDate[:7]]
+    if endDate:
+        clause += " AND invoice_date <= CAST(? AS DATE) AND month <= ?"
+        params += [endDate, endDate[:7]]
+    return clause, params
+
+
+def _query(sql: str, params: List) -> List[dict]:
+    """Run a query on a fresh in-memory DuckDB connection and return dict rows"""
+    with timed('olap'):
+        con = duckdb.connect()
+        try:
+            cursor = con.execute(sql.format(source=_source()), params)
+            names = [d[0] for d in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+        finally:
+            con.close()
+
+
+def olap_summary(
+    startDate: Optional[str] = None,
+    endDate: Optional[str] = None,
+    liveFrom: Optional[str] = None
+) -> dict:
+    """KPI totals and repeat buyers in one pass (see queries.summary_query for liveFrom)"""
+    clause, params = _date_filter(startDate, endDate)
+    if liveFrom:
+        counted = "invoice_date < CAST(? AS DATE)"
+        params = [liveFrom] * 3 + params
+    else:
+        counted = "true"
+    return _query(f"""
+        SELECT
+            COALESCE(SUM(gmv), 0) as gmv,
+            COALESCE(SUM(counted_orders), 0) as order_count,
+            COUNT(*) as unique_buyers,
+            COALESCE(SUM(items), 0) as items_sold,
+            COUNT(*) FILTER (WHERE orders > 1) as repeat_buyers
+        FROM (
+            SELECT
+                customer_id,
+                COALESCE(SUM(price * quantity) FILTER (WHERE {counted}), 0) as gmv,
+                COALESCE(SUM(quantity) FILTER (WHERE {counted}), 0) as items,
+                COUNT(*) FILTER (WHERE {counted}) as counted_orders,
+                COUNT(*) as orders
+            FROM {{source}}
+            WHERE 1=1 {clause}
+            GROUP BY customer_id
+        ) t
+    """, params)[0]
+
+
+def olap_trends(startDate: Optional[str] = None, endDate: Optional[str] = None) -> List[dict]:
+    """Daily GMV, orders and buyers"""
+    clause, params = _date_filter(startDate, endDate)
+    return _query(f"""
+        SELECT
+            invoice_date as date,
+            SUM(price * quantity) as gmv,
+            COUNT(*) as order_count,
+            COUNT(DISTINCT customer_id) as unique_buyers
+        FROM {{source}}
+        WHERE 1=1 {clause}
+        GROUP BY invoice_date
+        ORDER BY invoice_date
+    """, params)
+
+
+def olap_categories(startDate: Optional[str] = None, endDate: Optional[str] = None) -> List[dict]:
+    """GMV and orders per category"""
+    clause, params = _date_filter(startDate, endDate)
+    return _query(f"""
+        SELECT
+            category,
+            SUM(price * quantity) as gmv,
+            COUNT(*) as order_count
+        FROM {{source}}
+        WHERE 1=1 {clause}
+        GROUP BY category
+        ORDER BY gmv DESC
+    """, params)
+
+
+def olap_age_distribution() -> List[dict]:
+    """Buyers and GMV per age band"""
+    return _query("""
+        SELECT
+            CASE
+                WHEN age BETWEEN 18 AND 24 THEN '18-24岁'
+                WHEN age BETWEEN 25 AND 34 THEN '25-34岁'
+                WHEN age BETWEEN 35 AND 44 THEN '35-44岁'
+                WHEN age BETWEEN 45 AND 54 THEN '45-54岁'
+                ELSE '55岁以上'
+            END as age_group,
+            COUNT(DISTINCT customer_id) as count,
+            SUM(price * quantity) as gmv
+        FROM {source}
+        GROUP BY age_group
+        ORDER BY age_group
+    """, [])
+
+
+def olap_payment_methods() -> List[dict]:
+    """Orders and GMV per payment method"""
+    return _query("""
+        SELECT
+            payment_method,
+            COUNT(*) as order_count,
+            SUM(price * quantity) as gmv
+        FROM {source}
+        GROUP BY payment_method
+        ORDER BY gmv DESC
+    """, [])
@@ -0,0 +1,242 @@
+"""
+SQL Query Builders
+Builds the SQL and parameters for each API endpoint so that the endpoints
+and the index advisor share exactly the same query shapes
+"""
+
+from typing import Optional, List, Tuple
+
+
+def date_filter(startDate: Optional[str], endDate: Optional[str]) -> Tuple[str, List]:
+    """Build an invoice_date range filter clause"""
+    clause = ""
+    params = []
+    if startDate:
+        clause += " AND invoice_date >= %s"
+        params.append(startDate)
+    if endDate:
+        clause += " AND invoice_date <= %s"
+        params.append(endDate)
+    return clause, params
+
+
+def transactions_query(
+    startDate: Optional[str] = None,
+    endDate: Optional[str] = None,
+    category: Optional[str] = None,
+    paymentMethod: Optional[str] = None,
+    gender: Optional[str] = None,
+    limit: int = 1000
+) -> Tuple[str, List]:
+    """Raw transaction rows with optional filters, newest first"""
+    query = "SELECT customer_id, gender, age, category, quantity, price, payment_method, invoice_date FROM transactions WHERE 1=1"
+    clause, params = date_filter(startDate, endDate)
+    query += clause
+
+    if category:
+        query += " AND category = %s"
+        params.append(category)
+    if paymentMethod:
+        query += " AND payment_method = %s"
+        params.append(paymentMethod)
+    if gender:
+        query += " AND gender = %s"
+        params.append(gender)
+
+    query += " ORDER BY invoice_date DESC LIMIT %s"
+    params.append(limit)
+    return query, params
+
+
+def customer_totals_query(
+    startDate: Optional[str] = None,
+    endDate: Optional[str] = None,
+    liveFrom: Optional[str] = None
+) -> Tuple[str, List]:
+    """GMV, items and orders per customer over a date range
+
+    With liveFrom, GMV, items and counted_orders only count rows before that
+    date (the caller adds those days from Redis); orders covers the whole range.
+    """
+    clause, params = date_filter(startDate, endDate)
+    if liveFrom:
+        counted = "invoice_date < %s"
+        params = [liveFrom] * 3 + params
+    else:
+        counted = "1=1"
+    return f"""
+        SELECT
+            customer_id,
+            SUM(CASE WHEN {counted} THEN price * quantity ELSE 0 END) as gmv,
+            SUM(CASE WHEN {counted} THEN quantity ELSE 0 END) as items,
+            SUM({counted}) as counted_orders,
+            COUNT(*) as orders
+        FROM transactions
+        WHERE 1=1 {clause}
+        GROUP BY customer_id
+    """, params
+
+
+def summary_query(
+    startDate: Optional[str] = None,
+    endDate: Optional[str] = None,
+    liveFrom: Optional[str] = None
+) -> Tuple[str, List]:
+    """KPI totals and repeat buyers in one pass over transactions
+
+    With liveFrom, GMV, orders and items only count rows before that date
+    (the caller adds those days from Redis); buyer counts cover the whole range.
+    """
+    totals, params = customer_totals_query(startDate, endDate, liveFrom)
+    return f"""
+        SELECT
+            COALESCE(SUM(gmv), 0) as gmv,
+            COALESCE(SUM(counted_orders), 0) as order_count,
+            COUNT(*) as unique_buyers,
+            COALESCE(SUM(items), 0) as items_sold,
+            COALESCE(SUM(orders > 1), 0) as repeat_buyers
+        FROM ({totals}) t
+    """, params
+
+
+def customer_stats_summary_query() -> Tuple[str, List]:
+    """All-time KPI totals from the per-customer aggregates (no transactions scan)"""
+    return """
+        SELECT
+            COALESCE(SUM(total_gmv), 0) as gmv,
+            COALESCE(SUM(order_count), 0) as order_count,
+            COUNT(*) as unique_buyers,
+            COALESCE(SUM(items_sold), 0) as items_sold,
+            (SELECT COUNT(*) FROM customer_stats WHERE order_count > 1) as repeat_buyers
+        FROM customer_stats
+    """, []
+
+
+def trends_query(startDate: Optional[str] = None, endDate: Optional[str] = None) -> Tuple[str, List]:
+    """Daily GMV, orders and buyers"""
+    clause, params = date_filter(startDate, endDate)
+    return f"""
+        SELECT
+            invoice_date as date,
+            SUM(price * quantity) as gmv,
+            COUNT(*) as order_count,
+            COUNT(DISTINCT customer_id) as unique_buyers
+        FROM transactions
+        WHERE 1=1 {clause}
+        GROUP BY invoice_date
+        ORDER BY invoice_date
+    """, params
+
+
+def categories_query(startDate: Optional[str] = None, endDate: Optional[str] = None) -> Tuple[str, List]:
+    """GMV and orders per category"""
+    clause, params = date_filter(startDate, endDate)
+    return f"""
+        SELECT
+            category,
+            SUM(price * quantity) as gmv,
+            COUNT(*) as order_count
+        FROM transactions
+        WHERE 1=1 {clause}
+        GROUP BY category
+        ORDER BY gmv DESC
+    """, params
+
+
+def segments_query() -> Tuple[str, List]:
+    """Customer counts and GMV per segment"""
+    return """
+        SELECT
+            segment,
+            COUNT(*) as count,
+            SUM(total_gmv) as gmv
+        FROM user_segments
+        GROUP BY segment
+        ORDER BY gmv DESC
+    """, []
+
+
+def customer_query(customer_id: str) -> Tuple[str, List]:
+    """One customer's aggregates and segment by primary key"""
+    return """
+        SELECT
+            c.customer_id, c.gender, c.age, c.first_order_date, c.last_order_date,
+            c.order_count, c.total_gmv, c.items_sold, c.category_mask,
+            s.segment, s.predicted_churn_risk
+        FROM customer_stats c
+        LEFT JOIN user_segments s ON s.customer_id = c.customer_id
+        WHERE c.customer_id = %s
+    """, [customer_id]
+
+
+def top_customers_query(limit: int = 20) -> Tuple[str, List]:
+    """Highest lifetime GMV customers, read in idx_total_gmv order"""
+    return """
+        SELECT customer_id, order_count, total_gmv, items_sold, first_order_date, last_order_date
+        FROM customer_stats
+        ORDER BY total_gmv DESC
+        LIMIT %s
+    """, [limit]
+
+
+def category_bits_query() -> Tuple[str, List]:
+    """Category to bit assignments for customer_stats.category_mask"""
+    return "SELECT category, bit FROM category_bits", []
+
+
+def cohort_query() -> Tuple[str, List]:
+    """Materialized cohort retention rows"""
+    return """
+        SELECT cohort_month, cohort_size, month_offset, retention_rate
+        FROM cohort_retention
+        ORDER BY cohort_month, month_offset
+    """, []
+
+
+def age_distribution_query() -> Tuple[str, List]:
+    """Buyers and GMV per age band"""
+    return """
+        SELECT
+            CASE
+                WHEN age BETWEEN 18 AND 24 THEN '18-24岁'
+                WHEN age BETWEEN 25 AND 34 THEN '25-34岁'
+                WHEN age BETWEEN 35 AND 44 THEN '35-44岁'
+                WHEN age BETWEEN 45 AND 54 THEN '45-54岁'
+                ELSE '55岁以上'
+            END as age_group,
+            COUNT(DISTINCT customer_id) as count,
+            SUM(price * quantity) as gmv
+        FROM transactions
+        GROUP BY age_group
+        ORDER BY FIELD(age_group, '18-24岁', '25-34岁', '35-44岁', '45-54岁', '55岁以上')
+    """, []
+
+
+def payment_methods_query() -> Tuple[str, List]:
+    """Orders and GMV per payment method"""
+    return """
+        SELECT
+            payment_method,
+            COUNT(*) as order_count,
+            SUM(price * quantity) as gmv
+        FROM transactions
+        GROUP BY payment_method
+        ORDER BY gmv DESC
+    """, []
+
+
+def forecast_query(category: Optional[str] = None, days: int = 7) -> Tuple[str, List]:
+    """Precomputed demand forecasts for the next `days` days"""
+    query = """
+        SELECT category, forecast_date, predicted_gmv, predicted_orders, generated_at
+        FROM demand_forecasts
+        WHERE forecast_date >= CURDATE() AND forecast_date < CURDATE() + INTERVAL %s DAY
+    """
+    params = [days]
+
+    if category:
+        query += " AND category = %s"
+        params.append(category)
+
+    query += " ORDER BY category, forecast_date"
+    return query, params
@@ -0,0 +1,97 @@
+"""
+Raw Transaction Lookups
+Serves raw rows from the HBase `transactions` table with row-key prefix
+scans (row key: invoice_date#customer_id#batch_ms-seq), streamed as NDJSON,
+so cold raw-data reads stay off MySQL. Scan helpers take any object with
+happybase's Table.scan() signature.
+"""
+
+import json
+import os
+from datetime import date, timedelta
+from typing import Iterator, List, Optional
+
+TABLE = 'transactions'
+COLUMN_FAMILY = 'cf'
+RAW_FIELDS = ('customer_id', 'gender', 'age', 'category', 'quantity', 'price', 'payment_method', 'invoice_time')
+INT_FIELDS = {'age', 'quantity'}
+FLOAT_FIELDS = {'price'}
+
+# Widest date range a per-customer lookup may scan (one prefix scan per day)
+RAW_MAX_DAYS = int(os.getenv('RAW_MAX_DAYS', '92'))
+
+
+def column_spec(fields: Optional[str]) -> Optional[List[bytes]]:
+    """HBase columns for a comma-separated field list (None = all columns)"""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name for name in names if name not in RAW_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return [f"{COLUMN_FAMILY}:{name}".encode() for name in names]
+
+
+def decode_row(key: bytes, data: dict) -> dict:
+    """HBase cells to a JSON-ready row; date and customer come from the key"""
+    row_key = key.decode('utf-8')
+    invoice_date, customer_id, _ = row_key.split('#', 2)
+    row = {'rowKey': row_key, 'invoice_date': invoice_date, 'customer_id': customer_id}
+
+    for column, value in data.items():
+        field = column.decode('utf-8').split(':', 1)[1]
+        text = value.decode('utf-8')
+        if field in INT_FIELDS:
+            row[field] = int(text)
+        elif field in FLOAT_FIELDS:
+            row[field] = float(text)
+        else:
+            row[field] = text
+    return row
+
+
+def day_prefixes(day: str, customer_id: Optional[str] = None) -> List[str]:
+    """Row-key prefix for one day, optionally narrowed to one customer"""
+    return [f"{day}#{customer_id}#" if customer_id else f"{day}#"]
+
+
+def customer_prefixes(customer_id: str, start: date, end: date) -> List[str]:
+    """One prefix per day in [start, end], newest day first"""
+    days = (end - start).days
+    if days < 0:
+        raise ValueError("startDate is after endDate")
+    if days >= RAW_MAX_DAYS:
+        raise ValueError(f"Date range exceeds {RAW_MAX_DAYS} days")
+    return [f"{(end - timedelta(days=offset)).isoformat()}#{customer_id}#" for offset in range(days + 1)]
+
+
+def scan_prefixes(table, prefixes: List[str], columns=None, limit: int = 1000,
+                  batch_size: int = 500) -> Iterator[dict]:
+    """Decoded rows from consecutive prefix scans, stopping at `limit` rows"""
+    remaining = limit
+    for prefix in prefixes:
+        scanner = table.scan(
+            row_prefix=prefix.encode('utf-8'),
+            columns=columns,
+            batch_size=min(batch_size, remaining),
+            limit=remaining
+        )
+        for key, data in scanner:
+            yield decode_row(key, data)
+            remaining -= 1
+            if remaining == 0:
+                return
+
+
+def stream_rows(pool, prefixes: List[str], columns=None, limit: int = 1000,
+                batch_size: int = 500) -> Iterator[str]:
+    """NDJSON lines from one pooled connection held for the whole scan"""
+    with pool.connection() as connection:
+        table = connection.table(TABLE)
+        try:
+            for row in scan_prefixes(table, prefixes, columns, limit, batch_size):
+                yield json.dumps(row, ensure_ascii=False) + "\n"
+        except Exception as e:
+            # Headers are already sent; log and end the stream
+            print(f"[API] HBase scan error: {e}")
+            raise
@@ -0,0 +1,119 @@
+"""
+Real-time Window Module
+Sums the consumer's per-minute and per-hour Redis hash buckets into
+sliding-window GMV, orders and per-category totals
+"""
+
+import json
+import time
+from datetime import datetime
+from typing import List, Optional
+
+# Window name -> length in minutes
+WINDOWS = {'5m': 5, '1h': 60, '24h': 1440}
+
+
+def window_bucket_keys(minutes: int, now: float) -> List[str]:
+    """Bucket keys covering the last `minutes` minutes, including the current one
+
+    Whole clock hours inside the window use the hourly bucket; only the
+    partial hours at either edge are read minute by minute.
+    """
+    end = int(now // 60)
+    minute = end - minutes + 1
+    keys = []
+    while minute <= end:
+        if minute % 60 == 0 and minute + 59 <= end:
+            keys.append(f"realtime:h:{minute // 60}")
+            minute += 60
+        else:
+            keys.append(f"realtime:m:{minute}")
+            minute += 1
+    return keys
+
+
+def format_freshness(values: dict) -> Optional[dict]:
+    """Shape the consumer's realtime:freshness hash; None before the first flush"""
+    if not values:
+        return None
+    newest_event = float(values['newest_event'])
+    return {
+        "newestEventAt": datetime.fromtimestamp(newest_event).isoformat(),
+        "visibleAt": datetime.fromtimestamp(float(values['visible_at'])).isoformat(),
+        "stalenessSeconds": round(max(0.0, time.time() - newest_event), 3),
+        "latencyP50Seconds": float(values['p50']),
+        "latencyP95Seconds": float(values['p95']),
+        "latencyP99Seconds": float(values['p99'])
+    }
+
+
+def data_freshness(redis_client) -> Optional[dict]:
+    """Age of the newest producer timestamp visible in MySQL and Redis"""
+    return format_freshness(redis_client.hgetall('realtime:freshness'))
+
+
+def realtime_totals(redis_client) -> dict:
+    """Running totals, last update time, freshness and latest transactions in one round trip"""
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.get('realtime:total_gmv')
+    pipe.get('realtime:total_orders')
+    pipe.get('realtime:last_updated')
+    pipe.lrange('realtime:latest_transactions', 0, 9)
+    pipe.hgetall('realtime:freshness')
+    total_gmv, total_orders, last_updated, latest_transactions, freshness = pipe.execute()
+
+    return {
+        "total_gmv": float(total_gmv or 0),
+        "total_orders": int(total_orders or 0),
+        "last_updated": last_updated,
+        "dataFreshness": format_freshness(freshness),
+        "latest_transactions": [json.loads(t) for t in latest_transactions]
+    }
+
+
+def day_totals(redis_client, day: str) -> dict:
+    """GMV, orders and items the consumer has seen for one invoice date"""
+    totals = redis_client.hgetall(f"realtime:day:{day}")
+    return {
+        "gmv": float(totals.get('gmv', 0)),
+        "order_count": int(totals.get('orders', 0)),
+        "items_sold": int(totals.get('items', 0))
+    }
+
+
+def window_metrics(redis_client, window: str) -> dict:
+    """GMV, orders and category breakdown over a sliding window"""
+    keys = window_bucket_keys(WINDOWS[window], time.time())
+
+    pipe = redis_client.pipeline(transaction=False)
+    for key in keys:
+        pipe.hgetall(key)
+
+    gmv = 0.0
+    orders = 0
+    categories = {}
+    for bucket in pipe.execute():
+        for field, value in bucket.items():
+            if field == 'gmv':
+                gmv += float(value)
+            elif field == 'orders':
+                orders += int(value)
+            else:
+                metric, category = field.split(':', 1)
+                totals = categories.setdefault(category, {'gmv': 0.0, 'order_count': 0})
+                if metric == 'gmv':
+                    totals['gmv'] += float(value)
+                else:
+                    totals['order_count'] += int(value)
+
+    return {
+        "window": window,
+        "gmv": round(gmv, 2),
+        "order_count": orders,
+        "categories": sorted(
+            ({"category": name, "gmv": round(t['gmv'], 2), "order_count": t['order_count']}
+             for name, t in categories.items()),
+            key=lambda c: c['gmv'],
+            reverse=True
+        )
+    }
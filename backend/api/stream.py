@@ -0,0 +1,137 @@
+"""
+Real-time Push Module
+One Redis pub/sub subscriber per API process turns consumer batch
+notifications into snapshots and fans them out to Server-Sent Events clients
+"""
+
+import asyncio
+import json
+import os
+from typing import Optional
+
+import redis.asyncio as aioredis
+
+from database import REDIS_CONFIG, get_redis_client
+from realtime import realtime_totals, window_metrics
+
+# Channel the consumer publishes to after each batch flush
+UPDATES_CHANNEL = 'realtime:updates'
+SSE_KEEPALIVE = int(os.getenv('SSE_KEEPALIVE', '15'))  # seconds
+RECONNECT_DELAY = 2  # seconds
+
+
+def build_snapshots(windows) -> dict:
+    """One Redis read per window in use, shared by every client"""
+    redis_client = get_redis_client()
+    totals = realtime_totals(redis_client)
+    return {window: {**totals, "window": window_metrics(redis_client, window)} for window in windows}
+
+
+class ClientSlot:
+    """Holds only the newest snapshot, so a slow client never builds a backlog"""
+
+    def __init__(self, window: str):
+        self.window = window
+        self.latest = None
+        self.updated = asyncio.Event()
+
+    def publish(self, snapshot: dict):
+        self.latest = snapshot
+        self.updated.set()
+
+    async def next(self, timeout: float) -> Optional[dict]:
+        """Wait for a newer snapshot; None on timeout"""
+        try:
+            await asyncio.wait_for(self.updated.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.updated.clear()
+        return self.latest
+
+
+class RealtimeHub:
+    """Shared subscriber; started with the first client, stopped on shutdown"""
+
+    def __init__(self):
+        self.clients = set()
+        self.snapshots = {}  # window -> last snapshot, served to new clients
+        self.task = None
+
+    def subscribe(self, window: str) -> ClientSlot:
+        slot = ClientSlot(window)
+        self.clients.add(slot)
+        if window in self.snapshots:
+            slot.publish(self.snapshots[window])
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+        return slot
+
+    def unsubscribe(self, slot: ClientSlot):
+        self.clients.discard(slot)
+
+    async def refresh(self, windows):
+        """Rebuild snapshots off the event loop and hand them to the clients"""
+        snapshots = await asyncio.to_thread(build_snapshots, windows)
+        self.snapshots.update(snapshots)
+        for slot in list(self.clients):
+            if slot.window in snapshots:
+                slot.publish(snapshots[slot.window])
+
+    async def run(self):
+        while True:
+            client = aioredis.Redis(**REDIS_CONFIG, decode_responses=True)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(UPDATES_CHANNEL)
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=SSE_KEEPALIVE)
+                    if message is None:
+                        continue
+                    # Coalesce notifications that queued up while the last refresh ran
+                    while await pubsub.get_message(ignore_subscribe_messages=True, timeout=0) is not None:
+                        pass
+
+                    windows = {slot.window for slot in self.clients}
+                    if windows:
+                        await self.refresh(windows)
+                    # Cached snapshots for unwatched windows would go stale
+                    for window in set(self.snapshots) - windows:
+                        del self.snapshots[window]
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[API] Realtime subscriber error: {e}")
+                await asyncio.sleep(RECONNECT_DELAY)
+            finally:
+                await pubsub.close()
+                await client.close()
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+
+hub = RealtimeHub()
+
+
+async def snapshot_events(request, window: str):
+    """SSE stream of snapshots for one client"""
+    slot = hub.subscribe(window)
+    try:
+        # Clients on a window nobody watched yet get one direct read to start
+        if slot.latest is None:
+            slot.publish((await asyncio.to_thread(build_snapshots, [window]))[window])
+
+        while not await request.is_disconnected():
+            snapshot = await slot.next(SSE_KEEPALIVE)
+            if snapshot is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: snapshot\ndata: {json.dumps(snapshot, ensure_ascii=False, default=str)}\n\n"
+    finally:
+        hub.unsubscribe(slot)
@@ -0,0 +1,214 @@
+"""
+API Load Test
+Replays the dashboard's request mix against the FastAPI app in process
+(httpx ASGI transport, no server or network) at several concurrency levels
+and reports throughput and p50/p95/p99 latency per endpoint.
+
+The app talks to the MySQL and Redis configured in the environment. With
+--seed-rows the script first loads that many synthetic transactions (spread
+over --seed-days) through the consumer's own sink functions, so every table
+the dashboard reads is populated. Seeding writes to MYSQL_DATABASE, so point
+it at a scratch database created from init/mysql/init.sql.
+
+Usage:
+    pip install httpx
+    MYSQL_DATABASE=ecommerce_bench python benchmarks/bench_api_load.py --seed-rows 200000 --seed-days 365
+    python benchmarks/bench_api_load.py --concurrency 1 8 32 64 --duration 20 --output api-load.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+import httpx
+
+from common import git_revision, synthetic_transactions
+from main import app
+
+# (endpoint, weight): roughly what one dashboard load plus its refresh timer issues
+REQUEST_MIX = (
+    ('summary', 25),
+    ('trends', 20),
+    ('categories', 20),
+    ('segments', 10),
+    ('cohort', 10),
+    ('realtime', 15),
+)
+RANGE_DAYS = (1, 7, 30, 90, 365)
+DEFAULT_SHARE = 0.5  # ranged requests sent unfiltered, as on a fresh dashboard load
+WARMUP_SECONDS = 2
+
+
+def date_range(rng, first_day, last_day):
+    """Random dashboard date range inside the seeded span (or none, for the default view)"""
+    if rng.random() < DEFAULT_SHARE:
+        return {}
+    days = min(rng.choice(RANGE_DAYS), (last_day - first_day).days + 1)
+    end = last_day - timedelta(days=rng.randint(0, (last_day - first_day).days - days + 1))
+    return {'startDate': (end - timedelta(days=days - 1)).isoformat(), 'endDate': end.isoformat()}
+
+
+def build_request(endpoint, rng, first_day, last_day):
+    """(path, params) for one request of the mix"""
+    if endpoint == 'summary':
+        return '/api/metrics/summary', date_range(rng, first_day, last_day)
+    if endpoint == 'trends':
+        return '/api/metrics/trends', date_range(rng, first_day, last_day)
+    if endpoint == 'categories':
+        return '/api/analytics/categories', date_range(rng, first_day, last_day)
+    if endpoint == 'segments':
+        return '/api/analytics/segments', {}
+    if endpoint == 'cohort':
+        return '/api/analytics/cohort', {}
+    return '/api/realtime/latest', {'window': rng.choice(['5m', '1h', '24h'])}
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+# ============================================
+# Seeding
+# ============================================
+
+def seed(rows, days, batch_size=1000):
+    """Load synthetic history through the consumer's MySQL, cohort and Redis writers"""
+    import consumer
+    from cohort import CohortEngine, save_cohorts
+
+    transactions = synthetic_transactions(rows)
+    rng = random.Random(7)
+    today = date.today()
+    for t in transactions:
+        t['invoice_date'] = (today - timedelta(days=rng.randrange(days))).isoformat()
+    # Cohorts are built month by month, as the live consumer sees them
+    transactions.sort(key=lambda t: t['invoice_date'])
+
+    mysql_conn = consumer.create_mysql_connection()
+    redis_conn = consumer.create_redis_connection()
+    engine = CohortEngine()
+    try:
+        for offset in range(0, rows, batch_size):
+            batch = transactions[offset:offset + batch_size]
+            for t in batch:
+                consumer.process_transaction(t)
+            consumer.save_to_mysql(mysql_conn, batch)
+            save_cohorts(mysql_conn, engine, batch)
+            consumer.update_redis_cache(redis_conn, batch)
+            consumer.clear_batch_aggregators()
+    finally:
+        mysql_conn.close()
+        redis_conn.close()
+    print(f"Seeded {rows} transactions over {days} days")
+
+
+# ============================================
+# Load Generation
+# ============================================
+
+async def worker(client, rng, deadline, measure_from, first_day, last_day, samples, errors):
+    endpoints = [endpoint for endpoint, _ in REQUEST_MIX]
+    weights = [weight for _, weight in REQUEST_MIX]
+    while time.perf_counter() < deadline:
+        endpoint = rng.choices(endpoints, weights)[0]
+        path, params = build_request(endpoint, rng, first_day, last_day)
+        start = time.perf_counter()
+        try:
+            response = await client.get(path, params=params)
+            failed = response.status_code >= 400
+        except Exception:
+            failed = True
+        finished = time.perf_counter()
+        if start >= measure_from:
+            samples[endpoint].append(finished - start)
+            if failed:
+                errors[endpoint] += 1
+
+
+async def run_level(concurrency, duration, seed_value, first_day, last_day):
+    """Drive the app with `concurrency` clients for `duration` seconds after warmup"""
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=60) as client:
+        measure_from = time.perf_counter() + WARMUP_SECONDS
+        deadline = measure_from + duration
+        await asyncio.gather(*[
+            worker(client, random.Random(seed_value * 1000 + i), deadline, measure_from,
+                   first_day, last_day, samples, errors)
+            for i in range(concurrency)
+        ])
+
+    results = []
+    all_samples = []
+    for endpoint, _ in REQUEST_MIX:
+        latencies = sorted(samples[endpoint])
+        all_samples.extend(latencies)
+        if latencies:
+            results.append(summarize(concurrency, endpoint, latencies, errors[endpoint], duration))
+    if all_samples:
+        results.append(summarize(concurrency, 'all', sorted(all_samples), sum(errors.values()), duration))
+    return results
+
+
+def summarize(concurrency, endpoint, latencies, error_count, duration):
+    return {
+        'concurrency': concurrency,
+        'endpoint': endpoint,
+        'requests': len(latencies),
+        'errors': error_count,
+        'rps': round(len(latencies) / duration, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+async def run(args):
+    last_day = date.today()
+    first_day = last_day - timedelta(days=args.seed_days - 1)
+
+    results = []
+    print(f"{'conc':>5} {'endpoint':>11} {'requests':>9} {'errors':>7} {'rps':>8} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    async with app.router.lifespan_context(app):
+        for concurrency in args.concurrency:
+            for r in await run_level(concurrency, args.duration, args.seed, first_day, last_day):
+                results.append(r)
+                print(f"{r['concurrency']:>5} {r['endpoint']:>11} {r['requests']:>9} {r['errors']:>7} "
+                      f"{r['rps']:>8} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=10, help='measured seconds per concurrency level')
+    parser.add_argument('--seed', type=int, default=42, help='RNG seed for the request sequence')
+    parser.add_argument('--seed-rows', type=int, default=0, help='Load this many synthetic transactions first')
+    parser.add_argument('--seed-days', type=int, default=365, help='Days of history to spread them (and queries) over')
+    parser.add_argument('--output', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    if args.seed_rows:
+        seed(args.seed_rows, args.seed_days)
+
+    results = asyncio.run(run(args))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'revision': git_revision(),
+                'duration': args.duration,
+                'seed': args.seed,
+                'results': results,
+            }, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Feature Frame Benchmark
+Compares per-batch time and memory of the shared FeatureFrame against the
+repeated pd.DataFrame + groupby conversions each ML function used to do.
+
+Usage:
+    python benchmarks/bench_feature_frame.py --sizes 1000 10000 100000 --repeat 5
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+
+import pandas as pd
+
+from common import synthetic_transactions
+from features import FeatureFrame
+
+
+def legacy_conversions(transactions_data):
+    """Per-function conversions as done before the shared builder"""
+    # Segmentation
+    df = pd.DataFrame(transactions_data)
+    df.groupby('customer_id').agg({
+        'price': ['sum', 'mean', 'count'], 'quantity': 'sum', 'age': 'first', 'gender': 'first'
+    }).reset_index()
+
+    # Churn
+    df = pd.DataFrame(transactions_data)
+    df.groupby('customer_id').agg({
+        'price': ['sum', 'mean', 'count'], 'quantity': 'sum', 'age': 'first', 'gender': 'first',
+        'invoice_date': ['min', 'max']
+    }).reset_index()
+
+    # Product affinity
+    df = pd.DataFrame(transactions_data)
+    df.groupby(['customer_id', 'category']).agg({'price': 'sum', 'quantity': 'sum'}).reset_index()
+
+    # Demand forecasting
+    df = pd.DataFrame(transactions_data)
+    df.groupby(['invoice_date', 'category']).agg({'price': 'sum', 'quantity': 'sum'}).reset_index()
+
+
+def shared_conversions(transactions_data):
+    """Same work through one FeatureFrame with cached customer aggregates"""
+    frame = FeatureFrame(transactions_data)
+    frame.customers.copy()
+    frame.customers.copy()
+    df = frame.transactions
+    df.groupby(['customer_id', 'category'], observed=True).agg({'price': 'sum', 'quantity': 'sum'}).reset_index()
+    df.groupby(['invoice_date', 'category'], observed=True).agg(gmv=('gmv', 'sum'), orders=('gmv', 'size')).reset_index()
+
+
+def measure(fn, transactions_data, repeat):
+    """Return (best seconds, peak traced bytes) for fn over the batch"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(transactions_data)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn(transactions_data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'rows':>8} {'path':>8} {'ms/batch':>10} {'peak MiB':>10} {'frame MiB':>10}")
+
+    for size in args.sizes:
+        transactions_data = synthetic_transactions(size)
+        frame_bytes = {
+            'legacy': pd.DataFrame(transactions_data).memory_usage(deep=True).sum(),
+            'shared': FeatureFrame(transactions_data).transactions.memory_usage(deep=True).sum(),
+        }
+
+        for name, fn in (('legacy', legacy_conversions), ('shared', shared_conversions)):
+            seconds, peak = measure(fn, transactions_data, args.repeat)
+            results.append({
+                'rows': size,
+                'path': name,
+                'ms_per_batch': round(seconds * 1000, 3),
+                'peak_bytes': peak,
+                'frame_bytes': int(frame_bytes[name]),
+            })
+            print(f"{size:>8} {name:>8} {seconds * 1000:>10.2f} {peak / 2**20:>10.2f} "
+                  f"{frame_bytes[name] / 2**20:>10.2f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Ingest Strategy Benchmark
+Reports rows/s for each TransactionWriter strategy against a scratch copy of
+the transactions table (created with CREATE TABLE ... LIKE and dropped after).
+
+Usage:
+    MYSQL_HOST=localhost python benchmarks/bench_ingest.py --rows 10000 100000 --batch-size 5000
+
+LOAD DATA requires local_infile=1 on the server.
+"""
+
+import argparse
+import json
+import time
+
+import mysql.connector
+
+from common import synthetic_transactions
+from database import MYSQL_CONFIG
+from ingest import INGEST_STRATEGIES, TransactionWriter
+
+SCRATCH_TABLE = 'transactions_ingest_bench'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--batch-size', type=int, default=5000, help='rows per statement / LOAD DATA file')
+    parser.add_argument('--strategies', nargs='+', default=list(INGEST_STRATEGIES), choices=INGEST_STRATEGIES)
+    parser.add_argument('--output', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    conn = mysql.connector.connect(allow_local_infile=True, **MYSQL_CONFIG)
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}")
+    cursor.execute(f"CREATE TABLE {SCRATCH_TABLE} LIKE transactions")
+
+    results = []
+    print(f"{'rows':>10} {'strategy':>12} {'seconds':>10} {'rows/s':>12}")
+
+    try:
+        for rows in args.rows:
+            transactions = synthetic_transactions(rows)
+            for strategy in args.strategies:
+                cursor.execute(f"TRUNCATE TABLE {SCRATCH_TABLE}")
+                writer = TransactionWriter(strategy=strategy, batch_size=args.batch_size, table=SCRATCH_TABLE)
+
+                start = time.perf_counter()
+                writer.write(conn, transactions)
+                seconds = time.perf_counter() - start
+
+                cursor.execute(f"SELECT COUNT(*) FROM {SCRATCH_TABLE}")
+                (loaded,) = cursor.fetchone()
+                if loaded != rows:
+                    raise Exception(f"{strategy}: expected {rows} rows, found {loaded}")
+
+                results.append({
+                    'rows': rows,
+                    'strategy': strategy,
+                    'batch_size': args.batch_size,
+                    'seconds': round(seconds, 4),
+                    'rows_per_second': round(rows / seconds, 1),
+                })
+                print(f"{rows:>10} {strategy:>12} {seconds:>10.3f} {rows / seconds:>12,.0f}")
+    finally:
+        cursor.execute(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}")
+        cursor.close()
+        conn.close()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""
+OLAP Backend Benchmark
+Generates synthetic transaction datasets with DuckDB and compares dashboard
+query latency on the Parquet/DuckDB backend (and optionally MySQL).
+
+Usage:
+    python benchmarks/bench_olap.py --sizes 1000000 10000000 100000000 --workdir /tmp/olap-bench
+
+    # Also load each dataset into MySQL and time the same endpoints there.
+    # This TRUNCATEs `transactions` in MYSQL_DATABASE, so point it at a scratch
+    # database created from init/mysql/init.sql with local_infile enabled.
+    python benchmarks/bench_olap.py --sizes 1000000 --mysql-scratch
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import time
+
+import duckdb
+
+from common import API_DIR  # noqa: F401  (puts the API modules on sys.path)
+
+CATEGORIES = ['电子产品', '服装鞋帽', '食品饮料', '家居用品', '美妆护肤', '运动户外', '图书音像', '母婴产品']
+PAYMENT_METHODS = ['信用卡', '数字钱包', '现金']
+DAYS = 730
+
+
+def generate_dataset(rows, target_dir):
+    """Write `rows` synthetic transactions as a month-partitioned Parquet dataset"""
+    if os.path.exists(target_dir):
+        shutil.rmtree(target_dir)
+    os.makedirs(target_dir)
+
+    categories = "[" + ", ".join(f"'{c}'" for c in CATEGORIES) + "]"
+    payments = "[" + ", ".join(f"'{p}'" for p in PAYMENT_METHODS) + "]"
+    con = duckdb.connect()
+    con.execute(f"""
+        COPY (
+            SELECT *, strftime(invoice_date, '%Y-%m') AS month
+            FROM (
+                SELECT
+                    'CUST_' || lpad(CAST(CAST(random() * {max(1, rows // 3)} AS BIGINT) AS VARCHAR), 9, '0') AS customer_id,
+                    CASE WHEN random() < 0.5 THEN 'Male' ELSE 'Female' END AS gender,
+                    CAST(18 + floor(random() * 57) AS INTEGER) AS age,
+                    {categories}[CAST(1 + floor(random() * {len(CATEGORIES)}) AS INTEGER)] AS category,
+                    CAST(1 + floor(random() * 3) AS INTEGER) AS quantity,
+                    round(10 + random() * 2000, 2) AS price,
+                    {payments}[CAST(1 + floor(random() * {len(PAYMENT_METHODS)}) AS INTEGER)] AS payment_method,
+                    CAST(DATE '2024-01-01' + CAST(i % {DAYS} AS INTEGER) AS DATE) AS invoice_date,
+                    CAST(NULL AS VARCHAR) AS invoice_time
+                FROM range({rows}) t(i)
+            )
+        ) TO '{os.path.join(target_dir, 'transactions')}' (FORMAT PARQUET, PARTITION_BY (month))
+    """)
+    con.close()
+
+
+def dashboard_queries(olap, range_start, range_end):
+    """(name, callable) pairs mirroring the /api/metrics and /api/analytics endpoints"""
+    return [
+        ('summary', lambda: olap.olap_summary()),
+        ('summary[30d]', lambda: olap.olap_summary(range_start, range_end)),
+        ('trends', lambda: olap.olap_trends()),
+        ('trends[30d]', lambda: olap.olap_trends(range_start, range_end)),
+        ('categories', lambda: olap.olap_categories()),
+        ('age-distribution', lambda: olap.olap_age_distribution()),
+        ('payment-methods', lambda: olap.olap_payment_methods()),
+    ]
+
+
+def mysql_queries(queries, cursor, range_start, range_end):
+    """(name, callable) pairs for the same endpoints on MySQL"""
+    def run(*query):
+        cursor.execute(*query)
+        return cursor.fetchall()
+
+    return [
+        ('summary', lambda: run(*queries.summary_query())),
+        ('summary[30d]', lambda: run(*queries.summary_query(range_start, range_end))),
+        ('trends', lambda: run(*queries.trends_query())),
+        ('trends[30d]', lambda: run(*queries.trends_query(range_start, range_end))),
+        ('categories', lambda: run(*queries.categories_query())),
+        ('age-distribution', lambda: run(*queries.age_distribution_query())),
+        ('payment-methods', lambda: run(*queries.payment_methods_query())),
+    ]
+
+
+def load_into_mysql(conn, dataset_dir, workdir):
+    """Replace the scratch transactions table contents with the dataset"""
+    csv_path = os.path.join(workdir, 'transactions.csv')
+    con = duckdb.connect()
+    con.execute(f"""
+        COPY (
+            SELECT customer_id, gender, age, category, quantity, price, payment_method, invoice_date
+            FROM read_parquet('{os.path.join(dataset_dir, 'transactions', '*', '*.parquet')}', hive_partitioning = true)
+        ) TO '{csv_path}' (HEADER false)
+    """)
+    con.close()
+
+    cursor = conn.cursor()
+    cursor.execute("TRUNCATE TABLE transactions")
+    cursor.execute(f"""
+        LOAD DATA LOCAL INFILE '{csv_path}' INTO TABLE transactions
+        FIELDS TERMINATED BY ','
+        (customer_id, gender, age, category, quantity, price, payment_method, invoice_date)
+    """)
+    conn.commit()
+    cursor.close()
+    os.remove(csv_path)
+
+
+def time_queries(named_queries, repeat):
+    """Median latency in milliseconds per query"""
+    results = {}
+    for name, fn in named_queries:
+        fn()  # warm-up (file metadata, buffer pool)
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - start) * 1000)
+        results[name] = round(statistics.median(samples), 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000_000, 10_000_000, 100_000_000])
+    parser.add_argument('--workdir', default='/tmp/olap-bench')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--mysql-scratch', action='store_true',
+                        help='also benchmark MySQL (truncates transactions in MYSQL_DATABASE)')
+    parser.add_argument('--output', help='Write results to this JSON file')
+    args = parser.parse_args()
+
+    dataset_dir = os.path.join(args.workdir, 'dataset')
+    os.environ['OLAP_DIR'] = dataset_dir
+    import olap
+    import queries
+
+    range_start, range_end = '2025-12-01', '2025-12-30'
+    results = []
+
+    for size in args.sizes:
+        start = time.perf_counter()
+        generate_dataset(size, dataset_dir)
+        print(f"\n[{size:,} rows] generated in {time.perf_counter() - start:.1f}s")
+
+        backends = {'duckdb': time_queries(dashboard_queries(olap, range_start, range_end), args.repeat)}
+
+        if args.mysql_scratch:
+            import mysql.connector
+            from database import MYSQL_CONFIG
+            conn = mysql.connector.connect(allow_local_infile=True, **MYSQL_CONFIG)
+            load_into_mysql(conn, dataset_dir, args.workdir)
+            cursor = conn.cursor(dictionary=True)
+            backends['mysql'] = time_queries(mysql_queries(queries, cursor, range_start, range_end), args.repeat)
+            cursor.close()
+            conn.close()
+
+        print(f"{'query':<20}" + ''.join(f"{name + ' ms':>14}" for name in backends))
+        for query_name in backends['duckdb']:
+            print(f"{query_name:<20}" + ''.join(f"{timings[query_name]:>14.2f}" for timings in backends.values()))
+            results.append({
+                'rows': size,
+                'query': query_name,
+                **{f"{name}_ms": timings[query_name] for name, timings in backends.items()},
+            })
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""
+Ingest Pipeline Benchmark
+Runs the producer -> Kafka -> consumer -> sinks path in process, with no
+services, and reports records/s and per-batch latency for every stage at
+several data sizes:
+
+    generate      producer.generate_transaction
+    kafka         JSON encode, fake broker round trip, json.loads
+    process       process_transaction
+    mysql         save_to_mysql against a statement-recording connection
+    redis         update_redis_cache against fakeredis
+    hbase         save_to_hbase against an in-memory happybase double
+    ml:*          model training functions on the whole dataset
+
+The MySQL and HBase stand-ins (fakes.py) measure client-side cost only:
+statement building, parameter marshalling and the number of round trips
+(reported as `calls`). Server time is covered by bench_ingest.py.
+
+Usage:
+    pip install fakeredis
+    python benchmarks/bench_pipeline.py --sizes 1000 10000 100000 --output results/$(git rev-parse --short HEAD).json
+    python benchmarks/bench_pipeline.py --compare results/<baseline>.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import time
+
+from common import git_revision, synthetic_transactions
+from fakes import FakeHBaseConnection, FakeKafka, FakeMySQLConnection
+
+import consumer
+
+try:
+    import fakeredis
+    FAKEREDIS_AVAILABLE = True
+except ImportError:
+    FAKEREDIS_AVAILABLE = False
+
+TOPIC = 'ecommerce-transactions'
+
+ML_STAGES = (
+    ('ml:segmentation', consumer.train_customer_segmentation_model),
+    ('ml:churn', consumer.train_churn_prediction_model),
+    ('ml:affinity', consumer.analyze_product_affinity),
+    ('ml:demand', consumer.train_demand_forecasting_model),
+)
+
+
+def result(rows, stage, durations, calls=None):
+    """Summarize per-batch durations for one stage"""
+    total = sum(durations)
+    ordered = sorted(durations)
+    return {
+        'rows': rows,
+        'stage': stage,
+        'records_per_s': round(rows / total) if total else None,
+        'total_s': round(total, 4),
+        'batches': len(durations),
+        'p50_ms': round(statistics.median(ordered) * 1000, 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 3),
+        'calls': calls,
+    }
+
+
+def timed(fn, *args):
+    """Seconds taken by fn(*args), with the consumer's progress prints silenced"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        fn(*args)
+        return time.perf_counter() - start
+
+
+def run_size(size, batch_size, with_ml):
+    results = []
+
+    start = time.perf_counter()
+    transactions = synthetic_transactions(size)
+    results.append(result(size, 'generate', [time.perf_counter() - start]))
+
+    # Kafka hop: serialize with the producer's encoding, read back as the consumer does
+    broker = FakeKafka()
+    producer = broker.producer()
+    start = time.perf_counter()
+    for t in transactions:
+        producer.send(TOPIC, t)
+    decoded = [json.loads(message.value) for message in broker.consumer(TOPIC)]
+    results.append(result(size, 'kafka', [time.perf_counter() - start]))
+
+    # Fresh consumer state per size so customer totals do not carry over
+    consumer.customer_state.clear()
+    consumer.category_bits.clear()
+    consumer.clear_batch_aggregators()
+
+    mysql_conn = FakeMySQLConnection()
+    hbase_conn = FakeHBaseConnection()
+    redis_conn = fakeredis.FakeRedis() if FAKEREDIS_AVAILABLE else None
+    durations = {'process': [], 'mysql': [], 'redis': [], 'hbase': []}
+
+    for offset in range(0, size, batch_size):
+        batch = decoded[offset:offset + batch_size]
+
+        start = time.perf_counter()
+        for t in batch:
+            consumer.process_transaction(t)
+        durations['process'].append(time.perf_counter() - start)
+
+        durations['hbase'].append(timed(consumer.save_to_hbase, hbase_conn, batch))
+        durations['mysql'].append(timed(consumer.save_to_mysql, mysql_conn, batch))
+        if redis_conn is not None:
+            durations['redis'].append(timed(consumer.update_redis_cache, redis_conn, batch))
+        consumer.clear_batch_aggregators()
+
+    calls = {'mysql': mysql_conn.statements, 'hbase': hbase_conn.mutate_calls}
+    for stage, stage_durations in durations.items():
+        if stage_durations:
+            results.append(result(size, stage, stage_durations, calls.get(stage)))
+
+    if with_ml:
+        for stage, fn in ML_STAGES:
+            results.append(result(size, stage, [timed(fn, decoded)]))
+
+    return results
+
+
+def compare(results, baseline_path):
+    """Print records/s change against a previous run's JSON"""
+    with open(baseline_path) as f:
+        baseline = {(r['rows'], r['stage']): r for r in json.load(f)['results']}
+
+    print(f"\nAgainst {baseline_path}:")
+    for r in results:
+        before = baseline.get((r['rows'], r['stage']))
+        if before and before['records_per_s'] and r['records_per_s']:
+            change = (r['records_per_s'] / before['records_per_s'] - 1) * 100
+            print(f"{r['rows']:>8} {r['stage']:>16} {before['records_per_s']:>12} -> {r['records_per_s']:>12} "
+                  f"({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--batch-size', type=int, default=consumer.BATCH_SIZE)
+    parser.add_argument('--skip-ml', action='store_true', help='Skip the model training stages')
+    parser.add_argument('--output', help='Write results to this JSON file')
+    parser.add_argument('--compare', help='Baseline JSON from an earlier run')
+    args = parser.parse_args()
+
+    if not FAKEREDIS_AVAILABLE:
+        print("fakeredis not installed; skipping the redis stage")
+    with_ml = consumer.ML_AVAILABLE and not args.skip_ml
+
+    results = []
+    print(f"{'rows':>8} {'stage':>16} {'records/s':>12} {'p50 ms':>10} {'p95 ms':>10} {'calls':>8}")
+    for size in args.sizes:
+        for r in run_size(size, args.batch_size, with_ml):
+            results.append(r)
+            print(f"{r['rows']:>8} {r['stage']:>16} {r['records_per_s'] or '-':>12} {r['p50_ms']:>10} "
+                  f"{r['p95_ms']:>10} {r['calls'] if r['calls'] is not None else '-':>8}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'batch_size': args.batch_size,
+                'results': results,
+            }, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
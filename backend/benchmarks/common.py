@@ -0,0 +1,36 @@
+"""
+Benchmark Helpers
+Shared path setup and synthetic data generation for the benchmark scripts
+"""
+
+import os
+import random
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONSUMER_DIR = os.path.join(BACKEND_DIR, 'spark', 'consumer')
+PRODUCER_DIR = os.path.join(BACKEND_DIR, 'kafka', 'producer')
+API_DIR = os.path.join(BACKEND_DIR, 'api')
+
+for path in (CONSUMER_DIR, PRODUCER_DIR, API_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def synthetic_transactions(count, seed=42):
+    """Generate `count` producer-shaped transactions deterministically"""
+    import producer
+
+    random.seed(seed)
+    producer.customer_counter = 0
+    producer.existing_customers = []
+    return [producer.generate_transaction() for _ in range(count)]
+
+
+def git_revision():
+    """Short commit hash of the tree being benchmarked, for comparing runs"""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
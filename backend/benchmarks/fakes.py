@@ -0,0 +1,213 @@
+"""
+In-process Stand-ins
+Minimal Kafka, MySQL and HBase doubles for running the consumer's sink
+functions without services. They keep just enough state to answer the
+queries the consumer issues, and count calls so round trips show up in
+benchmark results.
+"""
+
+import json
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+# ============================================
+# Kafka
+# ============================================
+
+class FakeMessage:
+    __slots__ = ('topic', 'partition', 'offset', 'value')
+
+    def __init__(self, topic, partition, offset, value):
+        self.topic = topic
+        self.partition = partition
+        self.offset = offset
+        self.value = value
+
+
+class FakeKafka:
+    """Topic -> list of encoded messages, shared by a producer and a consumer"""
+
+    def __init__(self):
+        self.topics = defaultdict(list)
+
+    def producer(self):
+        return FakeKafkaProducer(self)
+
+    def consumer(self, topic):
+        return FakeKafkaConsumer(self, topic)
+
+
+class FakeKafkaProducer:
+    """Serializes like the real producer (JSON, UTF-8)"""
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def send(self, topic, value):
+        messages = self.broker.topics[topic]
+        messages.append(FakeMessage(topic, 0, len(messages), json.dumps(value, ensure_ascii=False).encode('utf-8')))
+
+    def flush(self):
+        pass
+
+
+class FakeKafkaConsumer:
+    """Single-partition consumer supporting iteration and poll()"""
+
+    def __init__(self, broker, topic):
+        self.broker = broker
+        self.topic = topic
+        self.offset = 0
+
+    def poll(self, timeout_ms=0, max_records=500):
+        messages = self.broker.topics[self.topic][self.offset:self.offset + max_records]
+        self.offset += len(messages)
+        return {(self.topic, 0): messages} if messages else {}
+
+    def __iter__(self):
+        messages = self.broker.topics[self.topic]
+        while self.offset < len(messages):
+            self.offset += 1
+            yield messages[self.offset - 1]
+
+
+# ============================================
+# MySQL
+# ============================================
+
+class FakeMySQLCursor:
+    """Records statements; answers the handful of lookups the consumer makes"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._result = []
+
+    def execute(self, operation, params=None):
+        self.connection.statements += 1
+        self.connection.params += len(params or ())
+        statement = ' '.join(operation.split())
+        bits = self.connection.category_bits
+
+        if statement.startswith('SELECT @@max_allowed_packet'):
+            self._result = [(64 * 1024 * 1024,)]
+        elif statement.startswith('SELECT category, bit FROM category_bits'):
+            self._result = list(bits.items())
+        elif statement.startswith('INSERT IGNORE INTO category_bits'):
+            bits.setdefault(params[0], len(bits))
+            self._result = []
+        elif statement.startswith('SELECT bit FROM category_bits'):
+            self._result = [(bits[params[0]],)] if params[0] in bits else []
+        else:
+            self._result = []
+
+    def executemany(self, operation, seq_params):
+        seq_params = list(seq_params)
+        self.connection.statements += 1
+        self.connection.params += sum(len(p) for p in seq_params)
+
+    def fetchone(self):
+        return self._result.pop(0) if self._result else None
+
+    def fetchall(self):
+        result, self._result = self._result, []
+        return result
+
+    def close(self):
+        pass
+
+
+class FakeMySQLConnection:
+    """Measures the consumer's client-side SQL cost (statement building and parameter marshalling)"""
+
+    def __init__(self):
+        self.category_bits = {}
+        self.statements = 0
+        self.params = 0
+        self.commits = 0
+
+    def cursor(self, *args, **kwargs):
+        return FakeMySQLCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# ============================================
+# HBase
+# ============================================
+
+class FakeHBaseBatch:
+    def __init__(self, table, batch_size):
+        self.table = table
+        self.batch_size = batch_size
+        self.pending = 0
+
+    def put(self, row, data):
+        self.table.rows[row] = data
+        self.pending += 1
+        if self.batch_size and self.pending >= self.batch_size:
+            self.send()
+
+    def send(self):
+        if self.pending:
+            self.table.connection.mutate_calls += 1
+            self.pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.send()
+        return False
+
+
+class FakeHBaseTable:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = {}
+
+    def batch(self, batch_size=None):
+        return FakeHBaseBatch(self, batch_size)
+
+    def put(self, row, data):
+        self.rows[row] = data
+        self.connection.mutate_calls += 1
+
+    def scan(self, row_prefix=None, columns=None, batch_size=1000, limit=None):
+        """Rows in key order, like happybase's Table.scan"""
+        returned = 0
+        for key in sorted(self.rows):
+            if row_prefix is not None and not key.startswith(row_prefix):
+                continue
+            data = self.rows[key]
+            if columns:
+                data = {column: value for column, value in data.items() if column in columns}
+            yield key, data
+            returned += 1
+            if limit is not None and returned >= limit:
+                return
+
+
+class FakeHBaseConnection:
+    """happybase.Connection double (and ConnectionPool, via connection()); mutate_calls counts Thrift round trips"""
+
+    def __init__(self):
+        self.tables = defaultdict(lambda: FakeHBaseTable(self))
+        self.mutate_calls = 0
+
+    def table(self, name):
+        return self.tables[name]
+
+    @contextmanager
+    def connection(self):
+        yield self
+
+    def close(self):
+        pass
@@ -1,8 +1,10 @@
 -- MySQL Schema Initialization for E-commerce Analytics
 
 -- Create transactions table
+-- Partitioned by month on invoice_date; maintenance/partition_maintenance.py
+-- splits p_future into monthly partitions and archives old ones to Parquet
 CREATE TABLE IF NOT EXISTS transactions (
-    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    id BIGINT AUTO_INCREMENT,
     customer_id VARCHAR(50) NOT NULL,
     gender ENUM('Male', 'Female') NOT NULL,
     age INT NOT NULL,
@@ -13,10 +15,20 @@ CREATE TABLE IF NOT EXISTS transactions (
     invoice_date DATE NOT NULL,
     invoice_time TIME DEFAULT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    INDEX idx_customer (customer_id),
-    INDEX idx_date (invoice_date),
-    INDEX idx_category (category)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+    -- Composite indexes follow the API query shapes (see api/index_advisor.py):
+    -- equality filter first, then invoice_date for range and ORDER BY ... DESC,
+    -- then the aggregated columns so GROUP BY queries are index-only
+    INDEX idx_date_cover (invoice_date, category, customer_id, price, quantity),
+    INDEX idx_category_date (category, invoice_date),
+    INDEX idx_payment_date (payment_method, invoice_date, price, quantity),
+    INDEX idx_gender_date (gender, invoice_date),
+    INDEX idx_customer_date (customer_id, invoice_date),
+    INDEX idx_age_cover (age, customer_id, price, quantity),
+    PRIMARY KEY (id, invoice_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+PARTITION BY RANGE COLUMNS(invoice_date) (
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
 
 -- Create daily metrics aggregation table
 CREATE TABLE IF NOT EXISTS daily_metrics (
@@ -55,7 +67,31 @@ CREATE TABLE IF NOT EXISTS user_segments (
     last_order_date DATE DEFAULT NULL,
     predicted_churn_risk DECIMAL(5, 4) DEFAULT NULL,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    INDEX idx_segment (segment)
+    INDEX idx_segment_gmv (segment, total_gmv)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Create per-customer aggregates (additive upserts from the consumer)
+CREATE TABLE IF NOT EXISTS customer_stats (
+    customer_id VARCHAR(50) NOT NULL PRIMARY KEY,
+    gender ENUM('Male', 'Female') NOT NULL,
+    age INT NOT NULL,
+    first_order_date DATE NOT NULL,
+    last_order_date DATE NOT NULL,
+    order_count INT NOT NULL DEFAULT 0,
+    total_gmv DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    items_sold INT NOT NULL DEFAULT 0,
+    -- Bit n set when the customer bought from the category with bit n in category_bits
+    category_mask BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_total_gmv (total_gmv),
+    INDEX idx_order_count (order_count)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Create category bit assignments for customer_stats.category_mask
+CREATE TABLE IF NOT EXISTS category_bits (
+    category VARCHAR(50) NOT NULL PRIMARY KEY,
+    bit TINYINT UNSIGNED NOT NULL,
+    UNIQUE KEY uk_bit (bit)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 -- Create cohort analysis table
@@ -70,6 +106,44 @@ CREATE TABLE IF NOT EXISTS cohort_retention (
     INDEX idx_cohort (cohort_month)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+-- Create cohort membership table (first-order month and dense member number)
+CREATE TABLE IF NOT EXISTS customer_cohorts (
+    customer_id VARCHAR(50) NOT NULL PRIMARY KEY,
+    cohort_month VARCHAR(7) NOT NULL,
+    member_no INT NOT NULL,
+    UNIQUE KEY uk_cohort_member (cohort_month, member_no)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Create cohort activity bitmaps (bit member_no set when active in active_month)
+CREATE TABLE IF NOT EXISTS cohort_activity (
+    cohort_month VARCHAR(7) NOT NULL,
+    active_month VARCHAR(7) NOT NULL,
+    member_bitmap MEDIUMBLOB NOT NULL,
+    active_users INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (cohort_month, active_month)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Create demand forecast table (precomputed by the consumer)
+CREATE TABLE IF NOT EXISTS demand_forecasts (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    category VARCHAR(50) NOT NULL,
+    forecast_date DATE NOT NULL,
+    predicted_gmv DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    predicted_orders INT NOT NULL DEFAULT 0,
+    generated_at TIMESTAMP NOT NULL,
+    UNIQUE KEY uk_category_date (category, forecast_date),
+    INDEX idx_forecast_date (forecast_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Create backfill chunk ledger (chunk keys committed with their rows)
+CREATE TABLE IF NOT EXISTS backfill_chunks (
+    chunk_key VARCHAR(32) NOT NULL PRIMARY KEY,
+    row_count INT NOT NULL,
+    min_date DATE NOT NULL,
+    max_date DATE NOT NULL,
+    loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
 -- Create real-time metrics snapshot table
 CREATE TABLE IF NOT EXISTS realtime_snapshot (
     id INT PRIMARY KEY DEFAULT 1,
@@ -83,3 +157,8 @@ CREATE TABLE IF NOT EXISTS realtime_snapshot (
 INSERT INTO realtime_snapshot (id, total_gmv, total_orders, total_buyers) 
 VALUES (1, 0, 0, 0)
 ON DUPLICATE KEY UPDATE id=id;
+
+-- Seed category bits (the consumer appends unseen categories)
+INSERT IGNORE INTO category_bits (category, bit) VALUES
+    ('电子产品', 0), ('服装鞋帽', 1), ('食品饮料', 2), ('家居用品', 3),
+    ('美妆护肤', 4), ('运动户外', 5), ('图书音像', 6), ('母婴产品', 7);
@@ -0,0 +1,370 @@
+"""
+Partition Maintenance - Monthly Partitions & Parquet Archival
+Pre-creates future monthly partitions of `transactions`, exports partitions
+older than the retention window to compressed Parquet files and drops them
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import date
+
+import mysql.connector
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Configuration from environment
+MYSQL_HOST = os.getenv('MYSQL_HOST', 'localhost')
+MYSQL_PORT = int(os.getenv('MYSQL_PORT', '3306'))
+MYSQL_USER = os.getenv('MYSQL_USER', 'ecommerce_user')
+MYSQL_PASSWORD = os.getenv('MYSQL_PASSWORD', 'ecommerce_pass')
+MYSQL_DATABASE = os.getenv('MYSQL_DATABASE', 'ecommerce')
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', '/data/archive')
+
+# Maintenance settings
+PARTITION_MONTHS_AHEAD = int(os.getenv('PARTITION_MONTHS_AHEAD', '3'))
+ARCHIVE_RETENTION_MONTHS = int(os.getenv('ARCHIVE_RETENTION_MONTHS', '12'))
+MAINTENANCE_INTERVAL = int(os.getenv('MAINTENANCE_INTERVAL', '21600'))  # seconds
+EXPORT_CHUNK_ROWS = 50000
+
+TABLE = 'transactions'
+FUTURE_PARTITION = 'p_future'
+STAGING_TABLE = 'transactions_archive_staging'
+
+ARCHIVE_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('customer_id', pa.string()),
+    ('gender', pa.string()),
+    ('age', pa.int32()),
+    ('category', pa.string()),
+    ('quantity', pa.int32()),
+    ('price', pa.decimal128(10, 2)),
+    ('payment_method', pa.string()),
+    ('invoice_date', pa.date32()),
+    ('invoice_time', pa.string()),
+    ('created_at', pa.timestamp('s')),
+])
+
+
+def create_mysql_connection():
+    """Create MySQL connection with retry"""
+    max_retries = 30
+    for attempt in range(max_retries):
+        try:
+            conn = mysql.connector.connect(
+                host=MYSQL_HOST,
+                port=MYSQL_PORT,
+                user=MYSQL_USER,
+                password=MYSQL_PASSWORD,
+                database=MYSQL_DATABASE
+            )
+            print(f"[Maintenance] Connected to MySQL at {MYSQL_HOST}:{MYSQL_PORT}")
+            return conn
+        except Exception as e:
+            print(f"[Maintenance] MySQL connection attempt {attempt + 1}/{max_retries}: {e}")
+            time.sleep(2)
+    raise Exception("Failed to connect to MySQL")
+
+
+def add_months(month_start, months):
+    """Shift a first-of-month date by a number of months"""
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month_start):
+    """Partition name for a month, e.g. p202401"""
+    return f"p{month_start:%Y%m}"
+
+
+def list_partitions(cursor):
+    """Return [(name, upper bound date or None for MAXVALUE)] in order"""
+    cursor.execute("""
+        SELECT PARTITION_NAME, PARTITION_DESCRIPTION
+        FROM INFORMATION_SCHEMA.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """, (TABLE,))
+
+    partitions = []
+    for name, description in cursor.fetchall():
+        if description == 'MAXVALUE':
+            partitions.append((name, None))
+        else:
+            partitions.append((name, date.fromisoformat(description.strip("'"))))
+    return partitions
+
+
+def oldest_month(cursor, partition=None):
+    """First month with rows (in one partition, if given), or None if empty"""
+    source = f"{TABLE} PARTITION ({partition})" if partition else TABLE
+    cursor.execute(f"SELECT MIN(invoice_date) FROM {source}")
+    (oldest,) = cursor.fetchone()
+    return oldest.replace(day=1) if oldest is not None else None
+
+
+def ensure_future_partitions(conn, months_ahead=PARTITION_MONTHS_AHEAD):
+    """Split p_future so that monthly partitions exist up to `months_ahead` months out
+
+    The first split (right after migration 002) starts at the oldest month
+    in the table, so history gets one partition per month too.
+    """
+    cursor = conn.cursor()
+    try:
+        partitions = list_partitions(cursor)
+        bounds = [bound for _, bound in partitions if bound is not None]
+        highest = max(bounds) if bounds else None
+
+        current = date.today().replace(day=1)
+        first = current
+        if highest is None:
+            first = min(current, oldest_month(cursor) or current)
+        months = []
+        month = first
+        while month <= add_months(current, months_ahead):
+            months.append(month)
+            month = add_months(month, 1)
+        # Only months beyond the highest existing bound can be carved out of p_future
+        missing = [m for m in months if highest is None or add_months(m, 1) > highest]
+        if not missing:
+            return 0
+
+        definitions = [
+            f"PARTITION {partition_name(m)} VALUES LESS THAN ('{add_months(m, 1).isoformat()}')"
+            for m in missing
+        ]
+        definitions.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE)")
+
+        cursor.execute(
+            f"ALTER TABLE {TABLE} REORGANIZE PARTITION {FUTURE_PARTITION} INTO ({', '.join(definitions)})"
+        )
+        print(f"[Maintenance] Created partitions: {', '.join(partition_name(m) for m in missing)}")
+        return len(missing)
+    finally:
+        cursor.close()
+
+
+def split_lowest_partition(conn):
+    """Split the lowest partition into monthly ones if it holds older months
+
+    RANGE partitions have no lower bound, so the lowest one also takes every
+    earlier row (history from before partitioning, late or backfilled rows).
+    Archiving it as-is would export several months under one month's name.
+    """
+    cursor = conn.cursor()
+    try:
+        partitions = list_partitions(cursor)
+        if not partitions or partitions[0][1] is None:
+            return 0
+
+        name, bound = partitions[0]
+        month = oldest_month(cursor, name)
+        if month is None or add_months(month, 1) >= bound:
+            return 0
+
+        months = []
+        while month < bound:
+            months.append(month)
+            month = add_months(month, 1)
+        definitions = [
+            f"PARTITION {partition_name(m)} VALUES LESS THAN ('{add_months(m, 1).isoformat()}')"
+            for m in months
+        ]
+        cursor.execute(f"ALTER TABLE {TABLE} REORGANIZE PARTITION {name} INTO ({', '.join(definitions)})")
+        print(f"[Maintenance] Split {name} into: {', '.join(partition_name(m) for m in months)}")
+        return len(months)
+    finally:
+        cursor.close()
+
+
+def export_table(conn, source, path):
+    """Stream a table (or partition) into a zstd-compressed Parquet file, returning the row count"""
+    cursor = conn.cursor()
+    tmp_path = path + '.tmp'
+    rows_written = 0
+
+    try:
+        cursor.execute(f"""
+            SELECT id, customer_id, gender, age, category, quantity, price,
+                   payment_method, invoice_date, invoice_time, created_at
+            FROM {source}
+        """)
+
+        with pq.ParquetWriter(tmp_path, ARCHIVE_SCHEMA, compression='zstd') as writer:
+            while True:
+                rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+                if not rows:
+                    break
+                columns = list(zip(*rows))
+                # TIME columns arrive as timedelta; store them as HH:MM:SS text
+                columns[9] = [None if t is None else str(t) for t in columns[9]]
+                writer.write_batch(pa.record_batch(
+                    [pa.array(column, type=field.type) for column, field in zip(columns, ARCHIVE_SCHEMA)],
+                    schema=ARCHIVE_SCHEMA
+                ))
+                rows_written += len(rows)
+
+        os.replace(tmp_path, path)
+        return rows_written
+    finally:
+        cursor.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_manifest(archive_dir):
+    """Read the archive manifest (archived_before boundary and partition list)"""
+    path = os.path.join(archive_dir, TABLE, '_manifest.json')
+    if not os.path.exists(path):
+        return {'archived_before': None, 'partitions': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(archive_dir, manifest):
+    """Atomically write the archive manifest"""
+    path = os.path.join(archive_dir, TABLE, '_manifest.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def create_staging_table(cursor):
+    """Empty, unpartitioned copy of the table to exchange a partition into"""
+    cursor.execute(f"CREATE TABLE {STAGING_TABLE} LIKE {TABLE}")
+    cursor.execute(f"ALTER TABLE {STAGING_TABLE} REMOVE PARTITIONING")
+
+
+def staging_exists(cursor):
+    cursor.execute("""
+        SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (STAGING_TABLE,))
+    (found,) = cursor.fetchone()
+    return found > 0
+
+
+def archive_staging(conn, cursor, name, bound, manifest, archive_dir):
+    """Export the staging table to Parquet, publish it in the manifest and drop it"""
+    # Late rows for an already archived month get a file of their own
+    file_key = name if name not in manifest['partitions'] else f"{name}-{int(time.time())}"
+    path = os.path.join(archive_dir, TABLE, f"{file_key}.parquet")
+    exported = export_table(conn, STAGING_TABLE, path)
+
+    # Nothing else writes the staging table, so the count is stable
+    cursor.execute(f"SELECT COUNT(*) FROM {STAGING_TABLE}")
+    (expected,) = cursor.fetchone()
+    if exported != expected:
+        raise Exception(f"Row count mismatch for {name}: exported {exported}, expected {expected}")
+
+    if exported:
+        manifest['partitions'][file_key] = {'file': f"{file_key}.parquet", 'rows': exported, 'before': bound.isoformat()}
+        manifest['archived_before'] = max(bound.isoformat(), manifest['archived_before'] or '')
+        save_manifest(archive_dir, manifest)
+        print(f"[Maintenance] Archived {name} ({exported} rows) to {path}")
+    else:
+        os.remove(path)
+    cursor.execute(f"DROP TABLE {STAGING_TABLE}")
+    return exported
+
+
+def recover_staging(conn, cursor, manifest, archive_dir):
+    """Archive rows left in the staging table by an interrupted pass"""
+    if not staging_exists(cursor):
+        return
+    cursor.execute(f"SELECT MIN(invoice_date), MAX(invoice_date) FROM {STAGING_TABLE}")
+    oldest, newest = cursor.fetchone()
+    if oldest is None:
+        cursor.execute(f"DROP TABLE {STAGING_TABLE}")
+        return
+    month = oldest.replace(day=1)
+    print(f"[Maintenance] Recovering rows left in {STAGING_TABLE} by an interrupted pass")
+    archive_staging(conn, cursor, partition_name(month), add_months(newest.replace(day=1), 1),
+                    manifest, archive_dir)
+
+
+def drop_if_empty(cursor, name):
+    """Drop a partition unless rows arrived after its exchange; checked under a table lock"""
+    cursor.execute(f"LOCK TABLES {TABLE} WRITE")
+    try:
+        cursor.execute(f"SELECT COUNT(*) FROM {TABLE} PARTITION ({name})")
+        (late,) = cursor.fetchone()
+        if late:
+            # Kept (and served live); the next pass archives them to a file of their own
+            print(f"[Maintenance] {late} rows arrived in {name} while archiving, keeping it")
+            return False
+        cursor.execute(f"ALTER TABLE {TABLE} DROP PARTITION {name}")
+        return True
+    finally:
+        cursor.execute("UNLOCK TABLES")
+
+
+def archive_old_partitions(conn, retention_months=ARCHIVE_RETENTION_MONTHS, archive_dir=ARCHIVE_DIR):
+    """Export partitions entirely older than the retention window, then drop them
+
+    Each partition is swapped into an empty staging table with EXCHANGE
+    PARTITION, which is atomic, so rows written to it during the export
+    (late events, backfills) stay in MySQL instead of being dropped
+    unarchived. The staging table is exported and then dropped.
+    """
+    os.makedirs(os.path.join(archive_dir, TABLE), exist_ok=True)
+    cutoff = add_months(date.today().replace(day=1), -retention_months)
+    manifest = load_manifest(archive_dir)
+
+    cursor = conn.cursor()
+    archived = 0
+    try:
+        recover_staging(conn, cursor, manifest, archive_dir)
+
+        for name, bound in list_partitions(cursor):
+            if bound is None or bound > cutoff:
+                break
+
+            create_staging_table(cursor)
+            cursor.execute(f"ALTER TABLE {TABLE} EXCHANGE PARTITION {name} WITH TABLE {STAGING_TABLE}")
+            archive_staging(conn, cursor, name, bound, manifest, archive_dir)
+
+            if drop_if_empty(cursor, name):
+                archived += 1
+    finally:
+        cursor.close()
+
+    return archived
+
+
+def run_maintenance(conn, months_ahead, retention_months, archive_dir):
+    """Run one maintenance pass"""
+    ensure_future_partitions(conn, months_ahead)
+    split_lowest_partition(conn)
+    archive_old_partitions(conn, retention_months, archive_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partition maintenance for the transactions table")
+    parser.add_argument('--once', action='store_true', help='run one pass and exit')
+    parser.add_argument('--months-ahead', type=int, default=PARTITION_MONTHS_AHEAD)
+    parser.add_argument('--retention-months', type=int, default=ARCHIVE_RETENTION_MONTHS)
+    parser.add_argument('--archive-dir', default=ARCHIVE_DIR)
+    args = parser.parse_args()
+
+    conn = create_mysql_connection()
+    conn.autocommit = True
+
+    try:
+        while True:
+            try:
+                run_maintenance(conn, args.months_ahead, args.retention_months, args.archive_dir)
+            except Exception as e:
+                print(f"[Maintenance] Maintenance pass error: {e}")
+            if args.once:
+                break
+            time.sleep(MAINTENANCE_INTERVAL)
+    except KeyboardInterrupt:
+        print("\n[Maintenance] Shutting down")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
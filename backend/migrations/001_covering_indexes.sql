@@ -0,0 +1,24 @@
+-- Migration 001: covering composite indexes for the API filter queries
+-- Applies the index layout from init/mysql/init.sql to existing databases.
+-- Verify afterwards with: python api/index_advisor.py --check
+
+ALTER TABLE transactions
+    ADD INDEX idx_date_cover (invoice_date, category, customer_id, price, quantity),
+    ADD INDEX idx_category_date (category, invoice_date),
+    ADD INDEX idx_payment_date (payment_method, invoice_date, price, quantity),
+    ADD INDEX idx_gender_date (gender, invoice_date),
+    ADD INDEX idx_customer_date (customer_id, invoice_date),
+    ADD INDEX idx_age_cover (age, customer_id, price, quantity),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Single-column indexes are now left prefixes of the composites above
+ALTER TABLE transactions
+    DROP INDEX idx_customer,
+    DROP INDEX idx_date,
+    DROP INDEX idx_category,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE user_segments
+    ADD INDEX idx_segment_gmv (segment, total_gmv),
+    DROP INDEX idx_segment,
+    ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,15 @@
+-- Migration 002: monthly RANGE partitioning of transactions on invoice_date
+-- Every unique key must include the partitioning column, so the primary key
+-- becomes (id, invoice_date). Both statements rebuild the table.
+-- Afterwards run: python maintenance/partition_maintenance.py --once
+-- Its first pass splits p_future into one partition per month, from the
+-- oldest invoice_date in the table through PARTITION_MONTHS_AHEAD months out.
+
+ALTER TABLE transactions
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id, invoice_date);
+
+ALTER TABLE transactions
+    PARTITION BY RANGE COLUMNS(invoice_date) (
+        PARTITION p_future VALUES LESS THAN (MAXVALUE)
+    );
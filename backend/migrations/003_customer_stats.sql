@@ -0,0 +1,59 @@
+-- Migration 003: per-customer aggregates maintained by the consumer
+-- Creates customer_stats and category_bits (see init/mysql/init.sql) and
+-- fills customer_stats from the rows currently in `transactions`.
+-- Stop the consumer while this runs so no batch is counted twice.
+
+CREATE TABLE IF NOT EXISTS customer_stats (
+    customer_id VARCHAR(50) NOT NULL PRIMARY KEY,
+    gender ENUM('Male', 'Female') NOT NULL,
+    age INT NOT NULL,
+    first_order_date DATE NOT NULL,
+    last_order_date DATE NOT NULL,
+    order_count INT NOT NULL DEFAULT 0,
+    total_gmv DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    items_sold INT NOT NULL DEFAULT 0,
+    category_mask BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_total_gmv (total_gmv),
+    INDEX idx_order_count (order_count)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS category_bits (
+    category VARCHAR(50) NOT NULL PRIMARY KEY,
+    bit TINYINT UNSIGNED NOT NULL,
+    UNIQUE KEY uk_bit (bit)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT IGNORE INTO category_bits (category, bit) VALUES
+    ('电子产品', 0), ('服装鞋帽', 1), ('食品饮料', 2), ('家居用品', 3),
+    ('美妆护肤', 4), ('运动户外', 5), ('图书音像', 6), ('母婴产品', 7);
+
+-- Any other categories already in the data get the next free bits
+SET @next_bit = (SELECT COALESCE(MAX(bit) + 1, 0) FROM category_bits);
+INSERT INTO category_bits (category, bit)
+SELECT category, @next_bit + ROW_NUMBER() OVER (ORDER BY category) - 1
+FROM (
+    SELECT DISTINCT t.category
+    FROM transactions t
+    LEFT JOIN category_bits b ON b.category = t.category
+    WHERE b.category IS NULL
+) missing;
+
+INSERT INTO customer_stats
+    (customer_id, gender, age, first_order_date, last_order_date,
+     order_count, total_gmv, items_sold, category_mask)
+SELECT
+    t.customer_id,
+    -- Latest gender/age, matching what the consumer keeps
+    SUBSTRING_INDEX(GROUP_CONCAT(t.gender ORDER BY t.invoice_date DESC, t.id DESC), ',', 1),
+    CAST(SUBSTRING_INDEX(GROUP_CONCAT(t.age ORDER BY t.invoice_date DESC, t.id DESC), ',', 1) AS UNSIGNED),
+    MIN(t.invoice_date),
+    MAX(t.invoice_date),
+    COUNT(*),
+    SUM(t.price * t.quantity),
+    SUM(t.quantity),
+    BIT_OR(CASE WHEN b.bit < 64 THEN 1 << b.bit ELSE 0 END)
+FROM transactions t
+JOIN category_bits b ON b.category = t.category
+GROUP BY t.customer_id
+ON DUPLICATE KEY UPDATE customer_id = customer_id;
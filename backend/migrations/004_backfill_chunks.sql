@@ -0,0 +1,12 @@
+-- Migration 004: ledger of backfill chunks loaded into MySQL
+-- backfill.py inserts a chunk's key in the same transaction as its rows and
+-- rollups, and skips keys already present, so an interrupted run never
+-- loads a chunk twice even if the checkpoint file missed it.
+
+CREATE TABLE IF NOT EXISTS backfill_chunks (
+    chunk_key VARCHAR(32) NOT NULL PRIMARY KEY,
+    row_count INT NOT NULL,
+    min_date DATE NOT NULL,
+    max_date DATE NOT NULL,
+    loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
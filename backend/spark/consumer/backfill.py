@@ -0,0 +1,449 @@
+"""
+Historical Backfill
+Replays bulk CSV/Parquet exports through the consumer's aggregation and sink
+logic in large chunks on parallel worker processes, with resumable progress
+
+Each chunk is aggregated once and written through the same sinks as a live
+batch (raw rows, daily/category rollups, customer_stats, HBase, OLAP
+dataset). Redis realtime counters are not touched. Per-customer segments and
+the non-additive buyer counts are rebuilt once from MySQL after all files are
+loaded, followed by a full cohort rebuild, so stop the live consumer while
+the finalize step runs.
+
+Usage (inside the spark-consumer container):
+    python backfill.py /data/history/*.csv --workers 4
+    python backfill.py orders_2023.parquet --strategy load_data --chunk-size 50000
+
+Re-running the same command resumes from the checkpoint file; chunks that
+reached MySQL after the last checkpoint write are skipped via the
+backfill_chunks table (migrations/004_backfill_chunks.sql).
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date
+
+import pandas as pd
+
+try:
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+import consumer
+from cohort import CohortEngine
+from ingest import INGEST_STRATEGIES, TRANSACTION_COLUMNS, TransactionWriter
+from olap_sink import create_olap_sink
+
+# Configuration from environment
+BACKFILL_CHUNK_SIZE = int(os.getenv('BACKFILL_CHUNK_SIZE', '20000'))  # rows per worker task
+BACKFILL_WORKERS = int(os.getenv('BACKFILL_WORKERS', str(min(4, os.cpu_count() or 1))))
+BACKFILL_STRATEGY = os.getenv('BACKFILL_STRATEGY', 'multirow')
+BACKFILL_CHECKPOINT = os.getenv('BACKFILL_CHECKPOINT', 'backfill_checkpoint.json')
+
+# Rows per statement when rebuilding user_segments and cohorts
+FINALIZE_BATCH_SIZE = 5000
+
+REQUIRED_COLUMNS = set(TRANSACTION_COLUMNS) - {'invoice_time'}
+STRING_COLUMNS = ('customer_id', 'gender', 'category', 'payment_method', 'invoice_time')
+
+
+# ============================================
+# Input Files
+# ============================================
+
+def normalize_chunk(df, dayfirst=False):
+    """Convert a raw chunk into consumer transaction dicts"""
+    missing = REQUIRED_COLUMNS - set(df.columns)
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(sorted(missing))}")
+
+    df = df.reindex(columns=list(TRANSACTION_COLUMNS))
+    df['invoice_date'] = pd.to_datetime(df['invoice_date'], dayfirst=dayfirst).dt.strftime('%Y-%m-%d')
+    df['age'] = df['age'].astype('int64')
+    df['quantity'] = df['quantity'].astype('int64')
+    df['price'] = df['price'].astype('float64')
+
+    # Object dtype so missing values become None rather than NaN
+    df = df.astype(object).where(df.notna(), None)
+    for column in STRING_COLUMNS:
+        df[column] = df[column].map(lambda v: None if v is None else str(v))
+    return df.to_dict('records')
+
+
+def read_chunks(path, chunk_size, dayfirst=False):
+    """Yield (chunk_id, transactions) for a CSV or Parquet file"""
+    if path.endswith('.parquet'):
+        if not PYARROW_AVAILABLE:
+            raise RuntimeError("pyarrow is required to read Parquet files")
+        frames = (batch.to_pandas() for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size))
+    else:
+        frames = pd.read_csv(path, chunksize=chunk_size, dtype={c: str for c in STRING_COLUMNS})
+
+    for chunk_id, df in enumerate(frames):
+        yield chunk_id, normalize_chunk(df, dayfirst)
+
+
+# ============================================
+# Checkpoint
+# ============================================
+
+class Checkpoint:
+    """Completed chunk ids per file, rewritten atomically after every chunk"""
+
+    def __init__(self, path, chunk_size):
+        self.path = path
+        self.state = {'chunk_size': chunk_size, 'files': {}, 'date_range': None, 'finalized': False}
+
+        if os.path.exists(path):
+            with open(path) as f:
+                self.state = json.load(f)
+            if self.state['chunk_size'] != chunk_size:
+                raise ValueError(
+                    f"Checkpoint {path} was written with --chunk-size {self.state['chunk_size']}; "
+                    f"chunk ids are only stable with the same size"
+                )
+
+    def file_state(self, path):
+        return self.state['files'].setdefault(path, {'done': [], 'chunks': None, 'rows': 0})
+
+    def is_complete(self, path):
+        state = self.file_state(path)
+        return state['chunks'] is not None and len(state['done']) >= state['chunks']
+
+    def mark_done(self, path, chunk_id, rows, min_date, max_date):
+        state = self.file_state(path)
+        state['done'].append(chunk_id)
+        state['rows'] += rows
+
+        date_range = self.state['date_range']
+        if min_date is not None:
+            self.state['date_range'] = [
+                min(date_range[0], min_date) if date_range else min_date,
+                max(date_range[1], max_date) if date_range else max_date,
+            ]
+        self.state['finalized'] = False
+        self.save()
+
+    def mark_read(self, path, chunks):
+        """Record the total chunk count once a file has been read to the end"""
+        self.file_state(path)['chunks'] = chunks
+        self.save()
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+# ============================================
+# Chunk Workers
+# ============================================
+
+# Per-process connections, created once by init_worker
+worker_mysql = None
+worker_hbase = None
+worker_olap = None
+
+
+def init_worker(strategy, batch_size, use_hbase):
+    """Open this worker's connections and switch the consumer to a bulk writer"""
+    global worker_mysql, worker_hbase, worker_olap
+    consumer.transaction_writer = TransactionWriter(strategy=strategy, batch_size=batch_size)
+    worker_mysql = consumer.create_mysql_connection(allow_local_infile=(strategy == 'load_data'))
+    worker_hbase = consumer.create_hbase_connection() if use_hbase else None
+    worker_olap = create_olap_sink()
+
+
+def chunk_key(path, chunk_id):
+    """Stable id of one input chunk, used to name its HBase rows and OLAP files"""
+    return 'bf' + hashlib.sha1(f"{os.path.abspath(path)}:{chunk_id}".encode('utf-8')).hexdigest()[:16]
+
+
+def chunk_loaded(mysql_conn, key):
+    """Whether a chunk's MySQL transaction already committed"""
+    cursor = mysql_conn.cursor()
+    try:
+        cursor.execute("SELECT 1 FROM backfill_chunks WHERE chunk_key = %s", (key,))
+        return cursor.fetchone() is not None
+    finally:
+        cursor.close()
+
+
+def process_chunk(transactions, key):
+    """Aggregate one chunk and write it through the consumer sinks
+
+    Any sink error fails the chunk so it is retried. HBase rows and OLAP
+    files are named by the chunk key, so a retry overwrites them. MySQL
+    is written last, in one transaction that also records the key in
+    backfill_chunks; a chunk already recorded there (loaded before the
+    checkpoint file caught up) is skipped, so it is only ever loaded once.
+    """
+    dates = [t['invoice_date'] for t in transactions]
+    if chunk_loaded(worker_mysql, key):
+        print(f"[Backfill] Chunk {key} already in MySQL, skipping")
+        return len(transactions), min(dates), max(dates)
+
+    try:
+        for t in transactions:
+            consumer.process_transaction(t)
+
+        consumer.save_to_hbase(worker_hbase, transactions, batch_id=key, bulk=True)
+        if worker_olap is not None:
+            worker_olap.append(transactions, autoflush=False)
+            worker_olap.flush(tag=key)
+        consumer.save_to_mysql(worker_mysql, transactions, bulk=True, chunk_key=key)
+    finally:
+        consumer.clear_batch_aggregators()
+        consumer.customer_state.clear()
+        if worker_olap is not None:
+            worker_olap.clear()
+
+    return len(transactions), min(dates), max(dates)
+
+
+def run_backfill(paths, args, checkpoint):
+    """Feed chunks to the worker pool; returns the number of failed chunks"""
+    failed = 0
+    loaded = 0
+    start = time.time()
+
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=init_worker,
+        initargs=(args.strategy, args.chunk_size, not args.skip_hbase)
+    ) as pool:
+        pending = {}
+
+        def collect(futures):
+            nonlocal failed, loaded
+            for future in futures:
+                path, chunk_id = pending.pop(future)
+                try:
+                    rows, min_date, max_date = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"[Backfill] Chunk {chunk_id} of {path} failed: {e}")
+                    continue
+                checkpoint.mark_done(path, chunk_id, rows, min_date, max_date)
+                loaded += rows
+                print(f"[Backfill] {path} chunk {chunk_id}: {rows} rows "
+                      f"({loaded / max(1e-9, time.time() - start):.0f} rows/s)")
+
+        for path in paths:
+            if checkpoint.is_complete(path):
+                print(f"[Backfill] Skipping {path} (already loaded)")
+                continue
+
+            done = set(checkpoint.file_state(path)['done'])
+            chunks = 0
+            for chunk_id, transactions in read_chunks(path, args.chunk_size, args.dayfirst):
+                chunks = chunk_id + 1
+                if chunk_id in done:
+                    continue
+                if not transactions:
+                    checkpoint.mark_done(path, chunk_id, 0, None, None)
+                    continue
+
+                # Checkpoint every finished chunk before submitting more, and
+                # bound the chunks held in memory while workers are busy
+                collect([future for future in pending if future.done()])
+                if len(pending) >= args.workers * 2:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+
+                pending[pool.submit(process_chunk, transactions, chunk_key(path, chunk_id))] = (path, chunk_id)
+
+            checkpoint.mark_read(path, chunks)
+
+        collect(wait(pending).done)
+
+    print(f"[Backfill] Loaded {loaded} rows in {time.time() - start:.1f}s, {failed} chunks failed")
+    return failed
+
+
+# ============================================
+# Finalize
+# ============================================
+
+def refresh_buyer_counts(mysql_conn, start_date, end_date):
+    """Recompute distinct buyers and AOV for the backfilled dates"""
+    cursor = mysql_conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE daily_metrics d
+            JOIN (
+                SELECT invoice_date, COUNT(DISTINCT customer_id) as buyers
+                FROM transactions
+                WHERE invoice_date BETWEEN %s AND %s
+                GROUP BY invoice_date
+            ) t ON d.metric_date = t.invoice_date
+            SET d.unique_buyers = t.buyers,
+                d.aov = d.gmv / GREATEST(d.order_count, 1)
+        """, (start_date, end_date))
+
+        cursor.execute("""
+            UPDATE category_metrics c
+            JOIN (
+                SELECT invoice_date, category, COUNT(DISTINCT customer_id) as buyers
+                FROM transactions
+                WHERE invoice_date BETWEEN %s AND %s
+                GROUP BY invoice_date, category
+            ) t ON c.metric_date = t.invoice_date AND c.category = t.category
+            SET c.unique_buyers = t.buyers
+        """, (start_date, end_date))
+        mysql_conn.commit()
+    finally:
+        cursor.close()
+
+
+def rebuild_user_segments(mysql_conn, read_conn):
+    """Recompute every customer's segment from customer_stats"""
+    read_cursor = read_conn.cursor()
+    write_cursor = mysql_conn.cursor()
+    today = date.today()
+    total = 0
+
+    try:
+        read_cursor.execute("""
+            SELECT customer_id, order_count, total_gmv, last_order_date
+            FROM customer_stats
+        """)
+        while True:
+            rows = read_cursor.fetchmany(FINALIZE_BATCH_SIZE)
+            if not rows:
+                break
+
+            values = []
+            for customer_id, orders, gmv, last_date in rows:
+                gmv = float(gmv)
+                values.append((
+                    customer_id,
+                    consumer.segment_customer(orders, gmv),
+                    orders,
+                    gmv,
+                    last_date,
+                    consumer.predict_churn_risk(orders, (today - last_date).days)
+                ))
+
+            write_cursor.executemany("""
+                INSERT INTO user_segments
+                (customer_id, segment, total_orders, total_gmv, last_order_date, predicted_churn_risk)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    segment = VALUES(segment),
+                    total_orders = VALUES(total_orders),
+                    total_gmv = VALUES(total_gmv),
+                    last_order_date = VALUES(last_order_date),
+                    predicted_churn_risk = VALUES(predicted_churn_risk)
+            """, values)
+            mysql_conn.commit()
+            total += len(values)
+    finally:
+        read_cursor.close()
+        write_cursor.close()
+
+    return total
+
+
+def rebuild_cohorts(mysql_conn, read_conn):
+    """Rebuild cohort tables by replaying (customer, month) activity in month order
+
+    Historical orders usually predate the live cohorts, so incremental
+    updates would leave customers in the wrong cohort; rebuild from scratch.
+    """
+    cursor = mysql_conn.cursor()
+    read_cursor = read_conn.cursor()
+    engine = CohortEngine()
+
+    try:
+        for table in ('cohort_retention', 'cohort_activity', 'customer_cohorts'):
+            cursor.execute(f"TRUNCATE TABLE {table}")
+
+        read_cursor.execute("""
+            SELECT customer_id, DATE_FORMAT(invoice_date, '%Y-%m') as active_month
+            FROM transactions
+            GROUP BY customer_id, active_month
+            ORDER BY active_month
+        """)
+        while True:
+            rows = read_cursor.fetchmany(FINALIZE_BATCH_SIZE)
+            if not rows:
+                break
+            # The engine only looks at the month prefix of invoice_date
+            engine.update(cursor, [{'customer_id': c, 'invoice_date': m} for c, m in rows])
+            engine.flush(cursor)
+            mysql_conn.commit()
+    finally:
+        read_cursor.close()
+        cursor.close()
+
+    return len(engine.bitmaps)
+
+
+def finalize(checkpoint, args):
+    """Rebuild the non-additive aggregates once all chunks are loaded"""
+    date_range = checkpoint.state['date_range']
+    if not date_range:
+        print("[Backfill] Nothing loaded, skipping finalize")
+        return
+
+    mysql_conn = consumer.create_mysql_connection(allow_local_infile=False)
+    # Second connection streams the GROUP BY results while the first one writes
+    read_conn = consumer.create_mysql_connection(allow_local_infile=False)
+
+    try:
+        start = time.time()
+        refresh_buyer_counts(mysql_conn, *date_range)
+        print(f"[Backfill] Refreshed buyer counts for {date_range[0]}..{date_range[1]}")
+
+        segments = rebuild_user_segments(mysql_conn, read_conn)
+        print(f"[Backfill] Rebuilt {segments} user segments")
+
+        if not args.skip_cohorts:
+            cohorts = rebuild_cohorts(mysql_conn, read_conn)
+            print(f"[Backfill] Rebuilt {cohorts} cohorts")
+
+        checkpoint.state['finalized'] = True
+        checkpoint.save()
+        print(f"[Backfill] Finalize done in {time.time() - start:.1f}s")
+    finally:
+        read_conn.close()
+        mysql_conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', help='CSV or Parquet files to load')
+    parser.add_argument('--chunk-size', type=int, default=BACKFILL_CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=BACKFILL_WORKERS)
+    parser.add_argument('--strategy', choices=INGEST_STRATEGIES, default=BACKFILL_STRATEGY)
+    parser.add_argument('--checkpoint', default=BACKFILL_CHECKPOINT)
+    parser.add_argument('--dayfirst', action='store_true', help='parse invoice dates as DD/MM/YYYY')
+    parser.add_argument('--skip-hbase', action='store_true', help='do not write raw rows to HBase')
+    parser.add_argument('--skip-cohorts', action='store_true', help='do not rebuild cohort tables')
+    parser.add_argument('--no-finalize', action='store_true', help='load chunks only')
+    args = parser.parse_args()
+
+    paths = [os.path.abspath(p) for p in args.files]
+    checkpoint = Checkpoint(args.checkpoint, args.chunk_size)
+
+    failed = run_backfill(paths, args, checkpoint) if paths else 0
+    if failed:
+        print("[Backfill] Re-run the same command to retry failed chunks")
+        raise SystemExit(1)
+
+    if not args.no_finalize and not checkpoint.state['finalized']:
+        finalize(checkpoint, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Adaptive Batching
+Chooses the consumer's batch size and timeout from the observed arrival
+rate, sink flush latency and Kafka lag, so records become visible within a
+target freshness without paying per-batch overhead on every few rows
+"""
+
+import os
+
+# Configuration from environment
+ADAPTIVE_BATCHING = os.getenv('ADAPTIVE_BATCHING', 'true').lower() == 'true'
+TARGET_FRESHNESS = float(os.getenv('TARGET_FRESHNESS', '5'))  # seconds from arrival to visible
+BATCH_MIN_SIZE = int(os.getenv('BATCH_MIN_SIZE', '10'))
+BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', '5000'))
+BATCH_MIN_TIMEOUT = float(os.getenv('BATCH_MIN_TIMEOUT', '0.5'))  # seconds
+BATCH_MAX_TIMEOUT = float(os.getenv('BATCH_MAX_TIMEOUT', '10'))  # seconds
+
+# Smoothing for the rate and flush latency estimates
+EWMA_ALPHA = 0.3
+# Lag above this many batches of rows means we are behind, not just busy
+BACKLOG_BATCHES = 2
+# Per-flush growth while behind and decay once above the rate ceiling
+GROW_FACTOR = 2.0
+SHRINK_FACTOR = 0.75
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+class BatchController:
+    """Fixed batch size and timeout"""
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+
+    def should_flush(self, rows, age):
+        """Whether a batch of `rows` that started `age` seconds ago is due"""
+        return rows >= self.size or (rows > 0 and age >= self.timeout)
+
+    def observe(self, rows, age, flush_seconds, lag):
+        """Feedback after a flush (no-op for fixed batching)"""
+
+
+class AdaptiveBatchController(BatchController):
+    """Sizes batches so fill time plus flush time stays within the target freshness
+
+    When Kafka lag builds up the size grows per flush, up to the maximum, so
+    per-batch overhead is amortized while the backlog drains. While lag stays
+    within the band the size holds; it only decays when it exceeds what the
+    arrival rate fills within the freshness budget, so steady load settles
+    instead of oscillating. Under light load the timeout (target minus
+    expected flush time) bounds freshness. The controller never reads a
+    clock; callers pass ages and durations, which keeps it deterministic to
+    simulate.
+    """
+
+    def __init__(self, target_freshness=TARGET_FRESHNESS, min_size=BATCH_MIN_SIZE, max_size=BATCH_MAX_SIZE,
+                 min_timeout=BATCH_MIN_TIMEOUT, max_timeout=BATCH_MAX_TIMEOUT):
+        super().__init__(min_size, _clamp(target_freshness, min_timeout, max_timeout))
+        self.target_freshness = target_freshness
+        self.min_size = min_size
+        self.max_size = max_size
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.rate = None           # rows per second
+        self.flush_seconds = None  # seconds per flush
+
+    def _ewma(self, current, sample):
+        return sample if current is None else current + EWMA_ALPHA * (sample - current)
+
+    def observe(self, rows, age, flush_seconds, lag):
+        """Update estimates from one flush and pick the next size and timeout"""
+        if rows:
+            self.rate = self._ewma(self.rate, rows / max(age, 1e-3))
+        self.flush_seconds = self._ewma(self.flush_seconds, flush_seconds)
+
+        # Time a record may wait in the batch before its flush starts
+        budget = self.target_freshness - self.flush_seconds
+
+        # Rows that arrive within the budget; a larger size only waits for the timeout
+        ceiling = (self.rate or 0) * budget
+        if lag > BACKLOG_BATCHES * self.size:
+            size = self.size * GROW_FACTOR
+        elif self.size > ceiling:
+            # Caught up after a burst: drift down toward the ceiling
+            size = max(self.size * SHRINK_FACTOR, ceiling)
+        else:
+            # Lag inside the band: hold, so steady load does not oscillate
+            size = self.size
+
+        self.size = int(_clamp(size, self.min_size, self.max_size))
+        self.timeout = _clamp(budget, self.min_timeout, self.max_timeout)
+
+
+def create_batch_controller(size, timeout):
+    """Adaptive controller unless ADAPTIVE_BATCHING is off"""
+    if ADAPTIVE_BATCHING:
+        return AdaptiveBatchController()
+    return BatchController(size, timeout)
+
+
+def kafka_lag(kafka_consumer):
+    """Total lag over assigned partitions from cached high watermarks (no network call)"""
+    lag = 0
+    for tp in kafka_consumer.assignment():
+        highwater = kafka_consumer.highwater(tp)
+        if highwater is not None:
+            lag += max(0, highwater - kafka_consumer.position(tp))
+    return lag
@@ -0,0 +1,234 @@
+"""
+Incremental Cohort Engine
+Maintains per-(cohort, active month) member bitmaps and rematerializes
+cohort_retention rows only for the cohorts touched by a batch
+"""
+
+import metrics
+
+# Keep IN (...) lookups well below max_allowed_packet
+LOOKUP_CHUNK_SIZE = 500
+
+
+def month_offset(cohort_month, active_month):
+    """Number of months between two 'YYYY-MM' strings"""
+    cohort_year, cohort_mon = int(cohort_month[:4]), int(cohort_month[5:7])
+    active_year, active_mon = int(active_month[:4]), int(active_month[5:7])
+    return (active_year - cohort_year) * 12 + (active_mon - cohort_mon)
+
+
+def bitmap_to_bytes(bitmap):
+    """Serialize an int bitmap for a BLOB column"""
+    return bitmap.to_bytes(max(1, (bitmap.bit_length() + 7) // 8), 'little')
+
+
+class CohortEngine:
+    """Cohort retention state backed by customer_cohorts and cohort_activity
+
+    Each customer gets a dense member number within its cohort (the month of
+    its first order), so activity per (cohort, active month) is one bitmap.
+    Cohort size is the number of bits in the cohort's own first month.
+    Bitmaps are cached per cohort once loaded; customer assignments are only
+    looked up for the customers in the current batch.
+
+    Several writers may share the tables (the live consumer, a backfill, a
+    second consumer instance): member numbers are allocated under a lock on
+    the cohort's key range, and bitmaps are OR-ed with the stored ones under
+    row locks before they are written, so no writer's bits are lost.
+    """
+
+    def __init__(self):
+        self.bitmaps = {}        # cohort_month -> {active_month: int bitmap}
+        self.dirty = set()       # (cohort_month, active_month) pending upsert
+        self.pending = set()     # (customer_id, month) of batches not yet saved
+
+    def defer(self, transactions):
+        """Keep a batch's activity to retry with the next batch"""
+        self.pending.update((t['customer_id'], t['invoice_date'][:7]) for t in transactions)
+
+    def with_pending(self, transactions):
+        """The batch plus activity deferred from earlier batches"""
+        # update() only reads the month prefix of invoice_date
+        return [{'customer_id': c, 'invoice_date': m} for c, m in sorted(self.pending)] + list(transactions)
+
+    def reset(self):
+        """Drop cached state so it is reloaded from MySQL (e.g. after a rollback)"""
+        self.bitmaps.clear()
+        self.dirty.clear()
+
+    def _load_cohort(self, cursor, cohort_month):
+        """Load all activity bitmaps for a cohort on first use"""
+        if cohort_month in self.bitmaps:
+            return
+
+        cursor.execute("""
+            SELECT active_month, member_bitmap
+            FROM cohort_activity
+            WHERE cohort_month = %s
+        """, (cohort_month,))
+        self.bitmaps[cohort_month] = {month: int.from_bytes(blob, 'little') for month, blob in cursor.fetchall()}
+
+    def _load_assignments(self, cursor, customer_ids, lock=False):
+        """Look up existing cohort assignments for a set of customers
+
+        A locking read sees rows other writers committed after this
+        transaction's snapshot was taken.
+        """
+        assignments = {}
+        customer_ids = list(customer_ids)
+        for i in range(0, len(customer_ids), LOOKUP_CHUNK_SIZE):
+            chunk = customer_ids[i:i + LOOKUP_CHUNK_SIZE]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(f"""
+                SELECT customer_id, cohort_month, member_no
+                FROM customer_cohorts
+                WHERE customer_id IN ({placeholders})
+                {'FOR SHARE' if lock else ''}
+            """, chunk)
+            for customer_id, cohort_month, member_no in cursor.fetchall():
+                assignments[customer_id] = (cohort_month, member_no)
+        return assignments
+
+    def _allocate(self, cursor, cohort_month, customer_ids):
+        """Insert new members with the cohort's next member numbers
+
+        The locking MAX() read holds the cohort's range of uk_cohort_member
+        until commit, so concurrent writers number members one after another.
+        A customer another writer assigned first is ignored here and keeps
+        that assignment (its number here is left unused).
+        """
+        cursor.execute("""
+            SELECT COALESCE(MAX(member_no) + 1, 0)
+            FROM customer_cohorts
+            WHERE cohort_month = %s
+            FOR UPDATE
+        """, (cohort_month,))
+        (next_no,) = cursor.fetchone()
+        cursor.executemany("""
+            INSERT IGNORE INTO customer_cohorts (customer_id, cohort_month, member_no)
+            VALUES (%s, %s, %s)
+        """, [(customer_id, cohort_month, next_no + i) for i, customer_id in enumerate(customer_ids)])
+
+    def update(self, cursor, transactions):
+        """Assign new customers and record the batch's activity in the cached bitmaps
+
+        Returns the number of orders dated before their customer's recorded
+        cohort month; those cannot be placed in a bitmap and are skipped.
+        """
+        active_months = {}
+        for t in transactions:
+            active_months.setdefault(t['customer_id'], set()).add(t['invoice_date'][:7])
+
+        assignments = self._load_assignments(cursor, active_months.keys())
+
+        # New customers by cohort, in first-month order for stable member numbers
+        new_members = {}
+        for customer_id, months in sorted(active_months.items(), key=lambda item: (min(item[1]), item[0])):
+            if customer_id not in assignments:
+                new_members.setdefault(min(months), []).append(customer_id)
+        for cohort_month in sorted(new_members):
+            self._allocate(cursor, cohort_month, new_members[cohort_month])
+        if new_members:
+            new_ids = [customer_id for ids in new_members.values() for customer_id in ids]
+            assignments.update(self._load_assignments(cursor, new_ids, lock=True))
+
+        early = 0
+        for customer_id, months in active_months.items():
+            cohort_month, member_no = assignments[customer_id]
+            self._load_cohort(cursor, cohort_month)
+            bit = 1 << member_no
+            cohort_bitmaps = self.bitmaps[cohort_month]
+            for month in months:
+                # Orders dated before the recorded first month cannot be placed
+                if month < cohort_month:
+                    early += 1
+                    continue
+                bitmap = cohort_bitmaps.get(month, 0)
+                if not bitmap & bit:
+                    cohort_bitmaps[month] = bitmap | bit
+                    self.dirty.add((cohort_month, month))
+
+        if early:
+            metrics.COHORT_EARLY_ORDERS.inc(early)
+            print(f"[Consumer] Skipped {early} customer-months dated before the customer's cohort")
+        return early
+
+    def flush(self, cursor):
+        """Persist dirty bitmaps, then rematerialize affected cohorts"""
+        if not self.dirty:
+            return 0
+
+        # Merge in bits other writers committed since the cohort was cached;
+        # the row locks keep them from writing in between (sorted lock order)
+        affected = sorted({cohort for cohort, _ in self.dirty})
+        for cohort in affected:
+            cursor.execute("""
+                SELECT active_month, member_bitmap
+                FROM cohort_activity
+                WHERE cohort_month = %s
+                FOR UPDATE
+            """, (cohort,))
+            bitmaps = self.bitmaps[cohort]
+            for month, blob in cursor.fetchall():
+                bitmaps[month] = bitmaps.get(month, 0) | int.from_bytes(blob, 'little')
+
+        cursor.executemany("""
+            INSERT INTO cohort_activity (cohort_month, active_month, member_bitmap, active_users)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                member_bitmap = VALUES(member_bitmap),
+                active_users = VALUES(active_users)
+        """, [
+            (cohort, month, bitmap_to_bytes(self.bitmaps[cohort][month]), self.bitmaps[cohort][month].bit_count())
+            for cohort, month in sorted(self.dirty)
+        ])
+
+        # A new member changes every rate in its cohort, so rewrite whole cohorts
+        rows = []
+        for cohort in affected:
+            size = self.bitmaps[cohort].get(cohort, 0).bit_count()
+            for month, bitmap in self.bitmaps[cohort].items():
+                retained = bitmap.bit_count()
+                rows.append((cohort, size, month_offset(cohort, month), retained, retained / max(1, size)))
+
+        cursor.executemany("""
+            INSERT INTO cohort_retention (cohort_month, cohort_size, month_offset, retained_users, retention_rate)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                cohort_size = VALUES(cohort_size),
+                retained_users = VALUES(retained_users),
+                retention_rate = VALUES(retention_rate)
+        """, rows)
+
+        self.dirty.clear()
+        return len(affected)
+
+
+def save_cohorts(mysql_conn, engine, transactions, attempts=2):
+    """Apply a batch to the cohort engine and commit the affected cohort rows
+
+    A lock conflict with another writer (deadlock or lock wait timeout) is
+    retried from freshly loaded state. If every attempt fails the batch's
+    activity is deferred and saved together with the next batch.
+    """
+    work = engine.with_pending(transactions)
+    for attempt in range(attempts):
+        cursor = mysql_conn.cursor()
+        try:
+            engine.update(cursor, work)
+            affected = engine.flush(cursor)
+            mysql_conn.commit()
+            engine.pending.clear()
+            if affected:
+                print(f"[Consumer] Rematerialized retention for {affected} cohorts")
+            return
+        except Exception as e:
+            print(f"[Consumer] Cohort update error: {e}")
+            mysql_conn.rollback()
+            engine.reset()
+        finally:
+            cursor.close()
+
+    engine.defer(transactions)
+    print(f"[Consumer] Deferred cohort activity for {len(engine.pending)} customer-months")
+    return False
@@ -0,0 +1,159 @@
+"""
+Sink Connections
+Health-checked sink connections that reconnect on failure, exponential
+backoff with jitter for (re)connecting, and a circuit breaker per sink so a
+failing store is skipped instead of slowing every batch for the others
+"""
+
+import os
+import random
+import time
+
+import metrics
+
+# Configuration from environment
+CONNECT_ATTEMPTS = int(os.getenv('CONNECT_ATTEMPTS', '12'))
+BACKOFF_BASE = float(os.getenv('BACKOFF_BASE', '0.5'))  # seconds
+BACKOFF_MAX = float(os.getenv('BACKOFF_MAX', '30'))  # seconds
+HEALTH_CHECK_INTERVAL = float(os.getenv('HEALTH_CHECK_INTERVAL', '30'))  # idle seconds before a ping
+BREAKER_FAILURES = int(os.getenv('BREAKER_FAILURES', '3'))  # consecutive failures that open a breaker
+BREAKER_RESET = float(os.getenv('BREAKER_RESET', '30'))  # seconds open before a trial write
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)]"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def connect_with_backoff(name, connect, attempts=CONNECT_ATTEMPTS):
+    """Call connect() until it succeeds, sleeping with jittered backoff between attempts"""
+    for attempt in range(attempts):
+        try:
+            return connect()
+        except Exception as e:
+            if attempt == attempts - 1:
+                raise Exception(f"Failed to connect to {name}") from e
+            delay = backoff_delay(attempt)
+            print(f"[Consumer] {name} connection attempt {attempt + 1}/{attempts}: {e} (retry in {delay:.1f}s)")
+            time.sleep(delay)
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; after a cool-down lets one trial write through
+
+    A successful trial closes it again, a failed one reopens it for another
+    cool-down.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, name, failures=BREAKER_FAILURES, reset_after=BREAKER_RESET, clock=time.monotonic):
+        self.name = name
+        self.threshold = failures
+        self.reset_after = reset_after
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.gauge = metrics.SINK_CIRCUIT_OPEN.labels(name.lower())
+
+    def allow(self):
+        if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_after:
+            self.state = self.HALF_OPEN
+        return self.state != self.OPEN
+
+    def retry_after(self):
+        """Seconds until an open circuit lets a trial write through (0 if it would now)"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_after - self.clock())
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            print(f"[Consumer] {self.name} circuit closed")
+            self.gauge.set(0)
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+            if self.state != self.OPEN:
+                print(f"[Consumer] {self.name} circuit open for {self.reset_after:.0f}s "
+                      f"after {self.failures} failures")
+            self.state = self.OPEN
+            self.opened_at = self.clock()
+            self.gauge.set(1)
+
+
+class SinkConnection:
+    """One live connection to a sink, pinged when idle and reopened after failures
+
+    The consumer flushes batches sequentially, so each sink needs exactly one
+    healthy connection rather than a pool. connect() should make a single
+    attempt; retrying happens across batches under the circuit breaker
+    instead of blocking the loop.
+    """
+
+    def __init__(self, name, connect, ping, connection=None):
+        self.name = name
+        self._connect = connect
+        self._ping = ping
+        self.connection = connection
+        self.last_used = time.monotonic()
+        self.breaker = CircuitBreaker(name)
+        self.skipped = metrics.SINK_SKIPPED.labels(name.lower())
+
+    def get(self):
+        """Healthy connection, reconnecting if the idle ping fails"""
+        if self.connection is not None and time.monotonic() - self.last_used >= HEALTH_CHECK_INTERVAL:
+            if not self._healthy():
+                print(f"[Consumer] {self.name} connection failed health check, reconnecting")
+                self.invalidate()
+        if self.connection is None:
+            self.connection = self._connect()
+        self.last_used = time.monotonic()
+        return self.connection
+
+    def _healthy(self):
+        try:
+            self._ping(self.connection)
+            return True
+        except Exception:
+            return False
+
+    def write(self, sink_fn, *args):
+        """sink_fn(connection, *args) unless the circuit is open
+
+        Sink functions report handled errors by returning False. Returns
+        whether the write succeeded.
+        """
+        if not self.breaker.allow():
+            self.skipped.inc()
+            return False
+
+        try:
+            ok = sink_fn(self.get(), *args) is not False
+        except Exception as e:
+            print(f"[Consumer] {self.name} write error: {e}")
+            ok = False
+
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+            # Query errors keep the connection; a dead one is reopened next time
+            if self.connection is not None and not self._healthy():
+                self.invalidate()
+        return ok
+
+    def invalidate(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+
+    def close(self):
+        self.invalidate()
@@ -5,20 +5,36 @@ Consumes transactions from Kafka, runs ML models, stores results in MySQL and Re
 
 import json
 import os
+import threading
 import time
-from datetime import datetime
-from collections import defaultdict
+from datetime import datetime, timedelta
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 
 import mysql.connector
 import redis
-from kafka import KafkaConsumer
+from kafka import ConsumerRebalanceListener, KafkaConsumer, TopicPartition
+from kafka.structs import OffsetAndMetadata
 import numpy as np
 import pandas as pd
 
+from batching import create_batch_controller, kafka_lag
+from cohort import CohortEngine, save_cohorts
+from connections import HEALTH_CHECK_INTERVAL, SinkConnection, backoff_delay, connect_with_backoff
+from feature_store import load_customer_features, write_features, write_predictions
+from features import FeatureFrame, as_feature_frame
+from ingest import INGEST_STRATEGY, TransactionWriter
+import metrics
+from olap_sink import create_olap_sink, save_to_olap
+from state import STATE_SNAPSHOT_INTERVAL, CustomerState
+
 # PySpark imports
 try:
     from pyspark.sql import SparkSession
-    from pyspark.sql.functions import col, sum as spark_sum, count, avg, max as spark_max, min as spark_min
+    from pyspark.sql.functions import (
+        col, sum as spark_sum, count, avg, max as spark_max, min as spark_min,
+        from_json, to_timestamp, to_date, approx_count_distinct
+    )
     from pyspark.sql.types import StructType, StructField, StringType, IntegerType, DoubleType, DateType
     PYSPARK_AVAILABLE = True
 except ImportError:
@@ -27,9 +43,9 @@ except ImportError:
 
 # Machine Learning imports
 try:
-    from sklearn.preprocessing import StandardScaler, LabelEncoder
+    from sklearn.preprocessing import StandardScaler
     from sklearn.cluster import KMeans
-    from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor, GradientBoostingClassifier
     from sklearn.linear_model import LogisticRegression
     from sklearn.metrics import silhouette_score, roc_auc_score
     ML_AVAILABLE = True
@@ -56,72 +72,137 @@ REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
 REDIS_PORT = int(os.getenv('REDIS_PORT', '6379'))
 HBASE_HOST = os.getenv('HBASE_HOST', 'localhost')
 HBASE_PORT = int(os.getenv('HBASE_PORT', '9090'))
-
-# Batch settings
-BATCH_SIZE = 50
-BATCH_TIMEOUT = 10  # seconds
-
-# In-memory aggregators
+HBASE_BATCH_SIZE = int(os.getenv('HBASE_BATCH_SIZE', '1000'))  # puts per Thrift mutateRows call
+SINK_TIMEOUT = float(os.getenv('SINK_TIMEOUT', '10'))  # seconds per connect/request, so a hung sink fails fast
+
+# Batch settings (fixed batching; see batching.py for the adaptive bounds)
+BATCH_SIZE = int(os.getenv('BATCH_SIZE', '50'))
+BATCH_TIMEOUT = float(os.getenv('BATCH_TIMEOUT', '10'))  # seconds
+
+# Real-time buckets stay readable for this long after they close (24h windows)
+REALTIME_RETENTION = int(os.getenv('REALTIME_RETENTION', '86400'))  # seconds
+REALTIME_CHANNEL = 'realtime:updates'  # pub/sub channel read by the API's SSE hub
+REALTIME_DAY_TTL = 2 * 86400  # seconds; per-day totals only serve "today"
+FRESHNESS_SAMPLE_SIZE = int(os.getenv('FRESHNESS_SAMPLE_SIZE', '1000'))  # records behind the published percentiles
+
+# Demand forecasting settings
+FORECAST_HORIZON_DAYS = int(os.getenv('FORECAST_HORIZON_DAYS', '7'))
+FORECAST_HISTORY_DAYS = int(os.getenv('FORECAST_HISTORY_DAYS', '180'))
+FORECAST_INTERVAL = int(os.getenv('FORECAST_INTERVAL', '3600'))  # seconds
+MODEL_INTERVAL = int(os.getenv('MODEL_INTERVAL', '3600'))  # seconds between feature-store retrains; 0 disables
+FORECAST_WORKERS = int(os.getenv('FORECAST_WORKERS', str(os.cpu_count() or 1)))
+FORECAST_LAGS = (1, 2, 7)
+FORECAST_WINDOWS = (7, 28)
+FORECAST_MIN_SAMPLES = 5
+DEMAND_FEATURES = (
+    [f'gmv_lag{lag}' for lag in FORECAST_LAGS]
+    + ['orders_lag1']
+    + [f'gmv_roll{window}' for window in FORECAST_WINDOWS]
+    + ['day_of_week']
+)
+
+# Processing mode: 'python' (Kafka loop) or 'streaming' (Spark Structured Streaming)
+CONSUMER_MODE = os.getenv('CONSUMER_MODE', 'python')
+SPARK_KAFKA_PACKAGE = os.getenv('SPARK_KAFKA_PACKAGE', 'org.apache.spark:spark-sql-kafka-0-10_2.12:3.5.0')
+SPARK_CHECKPOINT_DIR = os.getenv('SPARK_CHECKPOINT_DIR', '/tmp/spark-checkpoints')
+STREAMING_TRIGGER = os.getenv('STREAMING_TRIGGER', '10 seconds')
+STREAMING_WRITE_ATTEMPTS = int(os.getenv('STREAMING_WRITE_ATTEMPTS', '12'))  # per micro-batch sink write
+STREAMING_WATERMARK = os.getenv('STREAMING_WATERMARK', '1 day')  # on invoice dates, so at least a day
+
+# Per-batch aggregators (cleared after every flush)
 transaction_batch = []
 daily_metrics = defaultdict(lambda: {'gmv': 0, 'orders': 0, 'buyers': set(), 'items': 0})
 category_metrics = defaultdict(lambda: defaultdict(lambda: {'gmv': 0, 'orders': 0, 'buyers': set()}))
-customer_data = defaultdict(lambda: {'orders': 0, 'gmv': 0, 'last_date': None})
+
+# Per-customer running totals; main() attaches the on-disk store
+customer_state = CustomerState()
+
+# Raw transaction writer (strategy and rows per statement from INGEST_* settings)
+transaction_writer = TransactionWriter()
+
+
+def connect_mysql(allow_local_infile=(INGEST_STRATEGY == 'load_data')):
+    """Open one MySQL connection (single attempt)"""
+    return mysql.connector.connect(
+        host=MYSQL_HOST,
+        port=MYSQL_PORT,
+        user=MYSQL_USER,
+        password=MYSQL_PASSWORD,
+        database=MYSQL_DATABASE,
+        allow_local_infile=allow_local_infile,
+        connection_timeout=SINK_TIMEOUT
+    )
 
 
-def create_mysql_connection():
+def connect_redis():
+    """Open one Redis client and check it responds (single attempt)"""
+    r = redis.Redis(
+        host=REDIS_HOST, port=REDIS_PORT, decode_responses=True,
+        socket_timeout=SINK_TIMEOUT, socket_connect_timeout=SINK_TIMEOUT,
+        health_check_interval=HEALTH_CHECK_INTERVAL
+    )
+    r.ping()
+    return r
+
+
+def connect_hbase():
+    """Open one HBase Thrift connection (single attempt)"""
+    return happybase.Connection(HBASE_HOST, HBASE_PORT, timeout=int(SINK_TIMEOUT * 1000))
+
+
+def create_mysql_connection(allow_local_infile=(INGEST_STRATEGY == 'load_data')):
     """Create MySQL connection with retry"""
-    max_retries = 30
-    for attempt in range(max_retries):
-        try:
-            conn = mysql.connector.connect(
-                host=MYSQL_HOST,
-                port=MYSQL_PORT,
-                user=MYSQL_USER,
-                password=MYSQL_PASSWORD,
-                database=MYSQL_DATABASE
-            )
-            print(f"[Consumer] Connected to MySQL at {MYSQL_HOST}:{MYSQL_PORT}")
-            return conn
-        except Exception as e:
-            print(f"[Consumer] MySQL connection attempt {attempt + 1}/{max_retries}: {e}")
-            time.sleep(2)
-    raise Exception("Failed to connect to MySQL")
+    conn = connect_with_backoff('MySQL', lambda: connect_mysql(allow_local_infile))
+    print(f"[Consumer] Connected to MySQL at {MYSQL_HOST}:{MYSQL_PORT}")
+    return conn
 
 
 def create_redis_connection():
     """Create Redis connection with retry"""
-    max_retries = 30
-    for attempt in range(max_retries):
-        try:
-            r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
-            r.ping()
-            print(f"[Consumer] Connected to Redis at {REDIS_HOST}:{REDIS_PORT}")
-            return r
-        except Exception as e:
-            print(f"[Consumer] Redis connection attempt {attempt + 1}/{max_retries}: {e}")
-            time.sleep(2)
-    raise Exception("Failed to connect to Redis")
+    r = connect_with_backoff('Redis', connect_redis)
+    print(f"[Consumer] Connected to Redis at {REDIS_HOST}:{REDIS_PORT}")
+    return r
 
 
 def create_kafka_consumer():
     """Create Kafka consumer with retry"""
-    max_retries = 30
-    for attempt in range(max_retries):
-        try:
-            consumer = KafkaConsumer(
-                KAFKA_TOPIC,
-                bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
-                value_deserializer=lambda m: json.loads(m.decode('utf-8')),
-                auto_offset_reset='latest',
-                enable_auto_commit=True,
-                group_id='ecommerce-consumer-group'
-            )
-            print(f"[Consumer] Connected to Kafka, subscribed to {KAFKA_TOPIC}")
-            return consumer
-        except Exception as e:
-            print(f"[Consumer] Kafka connection attempt {attempt + 1}/{max_retries}: {e}")
-            time.sleep(2)
-    raise Exception("Failed to connect to Kafka")
+    def connect():
+        # Offsets are committed after each flush, not on a timer, so a
+        # restart never skips records that were polled but not yet written
+        consumer = KafkaConsumer(
+            bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
+            auto_offset_reset='latest',
+            enable_auto_commit=False,
+            group_id='ecommerce-consumer-group'
+        )
+        consumer.subscribe([KAFKA_TOPIC], listener=ResumeFromState(consumer))
+        return consumer
+
+    consumer = connect_with_backoff('Kafka', connect)
+    print(f"[Consumer] Connected to Kafka, subscribed to {KAFKA_TOPIC}")
+    return consumer
+
+
+class ResumeFromState(ConsumerRebalanceListener):
+    """Seeks assigned partitions to the offsets stored with the customer state
+
+    Customer totals and the offsets they cover are written in one SQLite
+    transaction, so resuming there applies every record to the state exactly
+    once even if the group's committed offsets are older or newer.
+    """
+
+    def __init__(self, kafka_consumer):
+        self.kafka_consumer = kafka_consumer
+
+    def on_partitions_revoked(self, revoked):
+        pass
+
+    def on_partitions_assigned(self, assigned):
+        for tp in assigned:
+            offset = customer_state.offsets.get((tp.topic, tp.partition))
+            if offset is not None:
+                self.kafka_consumer.seek(tp, offset)
+                print(f"[Consumer] Resuming {tp.topic}[{tp.partition}] at offset {offset}")
 
 
 def create_hbase_connection():
@@ -130,17 +211,13 @@ def create_hbase_connection():
         print("[Consumer] HBase support disabled (happybase not installed)")
         return None
 
-    max_retries = 30
-    for attempt in range(max_retries):
-        try:
-            conn = happybase.Connection(HBASE_HOST, HBASE_PORT)
-            print(f"[Consumer] Connected to HBase at {HBASE_HOST}:{HBASE_PORT}")
-            return conn
-        except Exception as e:
-            print(f"[Consumer] HBase connection attempt {attempt + 1}/{max_retries}: {e}")
-            time.sleep(2)
-    print("[Consumer] Warning: Failed to connect to HBase. Continuing without HBase support.")
-    return None
+    try:
+        conn = connect_with_backoff('HBase', connect_hbase)
+    except Exception:
+        print("[Consumer] Warning: Failed to connect to HBase. Continuing without HBase support.")
+        return None
+    print(f"[Consumer] Connected to HBase at {HBASE_HOST}:{HBASE_PORT}")
+    return conn
 
 
 def segment_customer(orders, gmv):
@@ -166,7 +243,7 @@ def predict_churn_risk(orders, days_since_last):
 
 def process_transaction(transaction):
     """Process a single transaction and update aggregators"""
-    global daily_metrics, category_metrics, customer_data
+    global daily_metrics, category_metrics
     
     date = transaction['invoice_date']
     category = transaction['category']
@@ -185,69 +262,207 @@ def process_transaction(transaction):
     category_metrics[date][category]['buyers'].add(customer_id)
     
     # Update customer data
-    customer_data[customer_id]['orders'] += 1
-    customer_data[customer_id]['gmv'] += gmv
-    customer_data[customer_id]['last_date'] = date
-    customer_data[customer_id]['gender'] = transaction['gender']
-    customer_data[customer_id]['age'] = transaction['age']
-
-
-def save_to_hbase(hbase_conn, transactions):
-    """Save batch of transactions to HBase"""
+    customer = customer_state.get(customer_id)
+    customer.orders += 1
+    customer.gmv += gmv
+    customer.items += transaction['quantity']
+    customer.price_sum += transaction['price']
+    customer.last_date = date
+    if customer.first_date is None or date < customer.first_date:
+        customer.first_date = date
+    customer.gender = transaction['gender']
+    customer.age = transaction['age']
+
+
+def save_to_hbase(hbase_conn, transactions, batch_id=None, bulk=False):
+    """Save batch of transactions to HBase
+
+    A stable batch_id (backfill chunk key) makes the row keys, and so a
+    retried write, idempotent. In bulk mode errors are raised.
+    """
     if hbase_conn is None:
         return
 
     try:
         table = hbase_conn.table('transactions')
-
-        for t in transactions:
-            # Row Key: invoice_date#customer_id#timestamp
-            row_key = f"{t['invoice_date']}#{t['customer_id']}#{int(time.time()*1000)}"
-
-            data = {
-                b'cf:customer_id': t['customer_id'].encode('utf-8'),
-                b'cf:gender': t['gender'].encode('utf-8'),
-                b'cf:age': str(t['age']).encode('utf-8'),
-                b'cf:category': t['category'].encode('utf-8'),
-                b'cf:quantity': str(t['quantity']).encode('utf-8'),
-                b'cf:price': str(t['price']).encode('utf-8'),
-                b'cf:payment_method': t['payment_method'].encode('utf-8'),
-                b'cf:invoice_time': t.get('invoice_time', '').encode('utf-8'),
-            }
-
-            table.put(row_key.encode('utf-8'), data)
+        batch_ms = batch_id if batch_id is not None else int(time.time() * 1000)
+
+        with table.batch(batch_size=HBASE_BATCH_SIZE) as batch:
+            for seq, t in enumerate(transactions):
+                # Row Key: invoice_date#customer_id#timestamp-seq (seq keeps
+                # same-millisecond orders of one customer from overwriting)
+                row_key = f"{t['invoice_date']}#{t['customer_id']}#{batch_ms}-{seq:06d}"
+
+                data = {
+                    b'cf:customer_id': t['customer_id'].encode('utf-8'),
+                    b'cf:gender': t['gender'].encode('utf-8'),
+                    b'cf:age': str(t['age']).encode('utf-8'),
+                    b'cf:category': t['category'].encode('utf-8'),
+                    b'cf:quantity': str(t['quantity']).encode('utf-8'),
+                    b'cf:price': str(t['price']).encode('utf-8'),
+                    b'cf:payment_method': t['payment_method'].encode('utf-8'),
+                    b'cf:invoice_time': (t.get('invoice_time') or '').encode('utf-8'),
+                }
+
+                batch.put(row_key.encode('utf-8'), data)
 
         print(f"[Consumer] Saved {len(transactions)} transactions to HBase")
 
     except Exception as e:
+        metrics.HBASE_ERRORS.inc()
+        if bulk:
+            raise
         print(f"[Consumer] HBase save error: {e}")
+        return False
+
+
+# category -> bit in customer_stats.category_mask, mirrored from category_bits
+category_bits = {}
+MAX_CATEGORY_BITS = 64
+
+
+def category_bit(cursor, category):
+    """Bit for a category, assigning the next free one to unseen categories"""
+    if category not in category_bits:
+        cursor.execute("SELECT category, bit FROM category_bits")
+        category_bits.update(cursor.fetchall())
+
+    if category not in category_bits:
+        cursor.execute("""
+            INSERT IGNORE INTO category_bits (category, bit)
+            SELECT %s, COALESCE(MAX(bit) + 1, 0) FROM category_bits
+        """, (category,))
+        cursor.execute("SELECT bit FROM category_bits WHERE category = %s", (category,))
+        row = cursor.fetchone()
+        if row is None:
+            # Another writer took the same bit; retried on the next batch
+            return None
+        category_bits[category] = row[0]
+
+    return category_bits[category]
+
+
+def customer_stats_rows(cursor, transactions):
+    """Per-customer deltas of a batch for customer_stats, in customer_id order"""
+    stats = {}
+    for t in transactions:
+        bit = category_bit(cursor, t['category'])
+        mask = 1 << bit if bit is not None and bit < MAX_CATEGORY_BITS else 0
+        date = t['invoice_date']
+        gmv = t['price'] * t['quantity']
+
+        row = stats.get(t['customer_id'])
+        if row is None:
+            stats[t['customer_id']] = [t['gender'], t['age'], date, date, 1, gmv, t['quantity'], mask]
+        else:
+            row[0], row[1] = t['gender'], t['age']
+            row[2] = min(row[2], date)
+            row[3] = max(row[3], date)
+            row[4] += 1
+            row[5] += gmv
+            row[6] += t['quantity']
+            row[7] |= mask
+
+    # Sorted keys keep lock order stable across writers
+    return [(customer_id, *stats[customer_id]) for customer_id in sorted(stats)]
+
+
+def upsert_customer_stats(cursor, transactions):
+    """Merge a batch into customer_stats
+
+    Every column merges additively or monotonically, so batches from
+    parallel backfill workers commute.
+    """
+    cursor.executemany("""
+        INSERT INTO customer_stats
+        (customer_id, gender, age, first_order_date, last_order_date,
+         order_count, total_gmv, items_sold, category_mask)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            gender = VALUES(gender),
+            age = VALUES(age),
+            first_order_date = LEAST(first_order_date, VALUES(first_order_date)),
+            last_order_date = GREATEST(last_order_date, VALUES(last_order_date)),
+            order_count = order_count + VALUES(order_count),
+            total_gmv = total_gmv + VALUES(total_gmv),
+            items_sold = items_sold + VALUES(items_sold),
+            category_mask = category_mask | VALUES(category_mask)
+    """, customer_stats_rows(cursor, transactions))
+
+
+def upsert_user_segments(cursor, customer_ids):
+    """Re-score customers' segments from their customer_stats totals
+
+    customer_stats covers the full history (backfills included), unlike the
+    consumer's own state, so a returning customer keeps lifetime totals.
+    Call after upsert_customer_stats in the same transaction.
+    """
+    if not customer_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(customer_ids))
+    cursor.execute(f"""
+        SELECT customer_id, order_count, total_gmv, last_order_date
+        FROM customer_stats
+        WHERE customer_id IN ({placeholders})
+    """, list(customer_ids))
+
+    values = []
+    for customer_id, orders, gmv, last_date in cursor.fetchall():
+        gmv = float(gmv)
+        days_since = 0  # Simplified for real-time
+        values.append((customer_id, segment_customer(orders, gmv), orders, gmv, last_date,
+                       predict_churn_risk(orders, days_since)))
+    if not values:
+        return
 
-
-def save_to_mysql(mysql_conn, transactions):
-    """Save batch of transactions to MySQL"""
+    cursor.executemany("""
+        INSERT INTO user_segments 
+        (customer_id, segment, total_orders, total_gmv, last_order_date, predicted_churn_risk)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE 
+            segment = VALUES(segment),
+            total_orders = VALUES(total_orders),
+            total_gmv = VALUES(total_gmv),
+            last_order_date = VALUES(last_order_date),
+            predicted_churn_risk = VALUES(predicted_churn_risk)
+    """, values)
+
+
+def save_to_mysql(mysql_conn, transactions, bulk=False, committed=None, chunk_key=None):
+    """Save batch of transactions to MySQL
+
+    In bulk mode (historical backfill) per-customer segment upserts are
+    skipped, since the backfill rebuilds user_segments once at the end, and
+    errors are raised so the chunk is not checkpointed as done. A backfill
+    chunk_key is recorded in backfill_chunks in the same transaction as the
+    rows, so a chunk is never loaded twice.
+
+    `committed` is a set the caller keeps across retries of one live batch;
+    'raw' is added once the raw rows are committed, and a retry then skips
+    them instead of inserting them twice.
+    """
+    # Live batches commit raw rows on their own so the bulk insert does not
+    # share a transaction (and its locks) with the rollup upserts below. A
+    # backfill chunk is retried as a whole, so there raw rows and rollups
+    # commit together and a failed chunk leaves nothing behind.
+    try:
+        if committed is None or 'raw' not in committed:
+            transaction_writer.write(mysql_conn, transactions, commit=not bulk)
+            if committed is not None and not bulk:
+                committed.add('raw')
+    except Exception as e:
+        metrics.MYSQL_ERRORS.inc()
+        if bulk:
+            mysql_conn.rollback()
+            raise
+        print(f"[Consumer] MySQL insert error: {e}")
+        return False
+    
     cursor = mysql_conn.cursor()
     
     try:
-        # Insert transactions
-        insert_sql = """
-            INSERT INTO transactions 
-            (customer_id, gender, age, category, quantity, price, payment_method, invoice_date, invoice_time)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        
-        values = [
-            (
-                t['customer_id'], t['gender'], t['age'], t['category'],
-                t['quantity'], t['price'], t['payment_method'],
-                t['invoice_date'], t.get('invoice_time')
-            )
-            for t in transactions
-        ]
-        
-        cursor.executemany(insert_sql, values)
-        
-        # Update daily metrics
-        for date, metrics in daily_metrics.items():
+        # Update daily metrics (sorted keys keep lock order stable across writers)
+        for day, totals in sorted(daily_metrics.items()):
             cursor.execute("""
                 INSERT INTO daily_metrics (metric_date, gmv, order_count, unique_buyers, items_sold, aov)
                 VALUES (%s, %s, %s, %s, %s, %s)
@@ -258,17 +473,17 @@ def save_to_mysql(mysql_conn, transactions):
                     items_sold = items_sold + VALUES(items_sold),
                     aov = (gmv + VALUES(gmv)) / (order_count + VALUES(order_count))
             """, (
-                date, 
-                metrics['gmv'], 
-                metrics['orders'], 
-                len(metrics['buyers']),
-                metrics['items'],
-                metrics['gmv'] / max(1, metrics['orders'])
+                day, 
+                totals['gmv'], 
+                totals['orders'], 
+                len(totals['buyers']),
+                totals['items'],
+                totals['gmv'] / max(1, totals['orders'])
             ))
         
         # Update category metrics
-        for date, categories in category_metrics.items():
-            for category, metrics in categories.items():
+        for day, categories in sorted(category_metrics.items()):
+            for category, totals in sorted(categories.items()):
                 cursor.execute("""
                     INSERT INTO category_metrics (metric_date, category, gmv, order_count, unique_buyers)
                     VALUES (%s, %s, %s, %s, %s)
@@ -276,69 +491,111 @@ def save_to_mysql(mysql_conn, transactions):
                         gmv = gmv + VALUES(gmv),
                         order_count = order_count + VALUES(order_count),
                         unique_buyers = VALUES(unique_buyers)
-                """, (date, category, metrics['gmv'], metrics['orders'], len(metrics['buyers'])))
+                """, (day, category, totals['gmv'], totals['orders'], len(totals['buyers'])))
         
-        # Update user segments with ML predictions
-        for customer_id, data in customer_data.items():
-            segment = segment_customer(data['orders'], data['gmv'])
-            days_since = 0  # Simplified for real-time
-            churn_risk = predict_churn_risk(data['orders'], days_since)
-            
+        # Update per-customer aggregates
+        upsert_customer_stats(cursor, transactions)
+        
+        # Update user segments (customers in this batch only)
+        if not bulk:
+            upsert_user_segments(cursor, sorted({t['customer_id'] for t in transactions}))
+        
+        if chunk_key is not None:
+            dates = [t['invoice_date'] for t in transactions]
             cursor.execute("""
-                INSERT INTO user_segments 
-                (customer_id, segment, total_orders, total_gmv, last_order_date, predicted_churn_risk)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE 
-                    segment = VALUES(segment),
-                    total_orders = VALUES(total_orders),
-                    total_gmv = VALUES(total_gmv),
-                    last_order_date = VALUES(last_order_date),
-                    predicted_churn_risk = VALUES(predicted_churn_risk)
-            """, (customer_id, segment, data['orders'], data['gmv'], data['last_date'], churn_risk))
+                INSERT INTO backfill_chunks (chunk_key, row_count, min_date, max_date)
+                VALUES (%s, %s, %s, %s)
+            """, (chunk_key, len(transactions), min(dates), max(dates)))
         
         mysql_conn.commit()
+        if not bulk:
+            customer_state.flush()
         print(f"[Consumer] Saved {len(transactions)} transactions to MySQL")
         
     except Exception as e:
-        print(f"[Consumer] MySQL save error: {e}")
         mysql_conn.rollback()
+        metrics.MYSQL_ERRORS.inc()
+        # Bits assigned inside the rolled-back transaction are gone
+        category_bits.clear()
+        if bulk:
+            raise
+        print(f"[Consumer] MySQL save error: {e}")
+        return False
     finally:
         cursor.close()
 
 
 def update_redis_cache(redis_conn, transactions):
-    """Update Redis with real-time metrics"""
+    """Update Redis with real-time metrics
+
+    Batch totals go into per-minute and per-hour hash buckets keyed by
+    arrival time, each with a fixed EXPIREAT, so the API can sum any
+    sliding window up to 24 hours. All writes share one pipeline round trip.
+    """
     try:
         # Calculate batch totals
-        batch_gmv = sum(t['price'] * t['quantity'] for t in transactions)
+        batch_gmv = 0.0
+        category_totals = defaultdict(lambda: [0.0, 0])
+        day_totals = defaultdict(lambda: [0.0, 0, 0])
+        for t in transactions:
+            gmv = t['price'] * t['quantity']
+            batch_gmv += gmv
+            category_totals[t['category']][0] += gmv
+            category_totals[t['category']][1] += 1
+            day = day_totals[t['invoice_date']]
+            day[0] += gmv
+            day[1] += 1
+            day[2] += t['quantity']
         batch_orders = len(transactions)
-        batch_buyers = len(set(t['customer_id'] for t in transactions))
-        
+
+        now = time.time()
+        minute = int(now // 60)
+        hour = minute // 60
+        buckets = (
+            (f"realtime:m:{minute}", (minute + 1) * 60 + REALTIME_RETENTION),
+            (f"realtime:h:{hour}", (hour + 1) * 3600 + REALTIME_RETENTION),
+        )
+
+        pipe = redis_conn.pipeline(transaction=False)
+
         # Update counters
-        redis_conn.incrbyfloat('realtime:total_gmv', batch_gmv)
-        redis_conn.incrby('realtime:total_orders', batch_orders)
-        
+        pipe.incrbyfloat('realtime:total_gmv', batch_gmv)
+        pipe.incrby('realtime:total_orders', batch_orders)
+
+        # Time buckets with per-category breakdown
+        for key, expire_at in buckets:
+            pipe.hincrbyfloat(key, 'gmv', batch_gmv)
+            pipe.hincrby(key, 'orders', batch_orders)
+            for category, (gmv, orders) in category_totals.items():
+                pipe.hincrbyfloat(key, f"gmv:{category}", gmv)
+                pipe.hincrby(key, f"orders:{category}", orders)
+            pipe.expireat(key, int(expire_at))
+
+        # Per invoice date totals, merged with MySQL history by the summary API
+        for invoice_date, (gmv, orders, items) in day_totals.items():
+            key = f"realtime:day:{invoice_date}"
+            pipe.hincrbyfloat(key, 'gmv', gmv)
+            pipe.hincrby(key, 'orders', orders)
+            pipe.hincrby(key, 'items', items)
+            pipe.expire(key, REALTIME_DAY_TTL)
+
         # Store latest transactions for real-time display
         for t in transactions[-10:]:
-            redis_conn.lpush('realtime:latest_transactions', json.dumps(t, ensure_ascii=False))
-        redis_conn.ltrim('realtime:latest_transactions', 0, 99)
-        
-        # Category breakdown (last hour approximation)
-        for t in transactions:
-            category_gmv = t['price'] * t['quantity']
-            redis_conn.incrbyfloat(f"realtime:category:{t['category']}", category_gmv)
-        
-        # Set TTL for category keys (1 hour)
-        for category in set(t['category'] for t in transactions):
-            redis_conn.expire(f"realtime:category:{category}", 3600)
-        
-        # Update timestamp
-        redis_conn.set('realtime:last_updated', datetime.now().isoformat())
-        
+            pipe.lpush('realtime:latest_transactions', json.dumps(t, ensure_ascii=False))
+        pipe.ltrim('realtime:latest_transactions', 0, 99)
+
+        # Update timestamp and notify API push subscribers
+        last_updated = datetime.now().isoformat()
+        pipe.set('realtime:last_updated', last_updated)
+        pipe.publish(REALTIME_CHANNEL, last_updated)
+        pipe.execute()
+
         print(f"[Consumer] Updated Redis cache with {batch_orders} orders, GMV: ¥{batch_gmv:.2f}")
         
     except Exception as e:
+        metrics.REDIS_ERRORS.inc()
         print(f"[Consumer] Redis update error: {e}")
+        return False
 
 
 def clear_batch_aggregators():
@@ -352,23 +609,55 @@ def clear_batch_aggregators():
 # PySpark Processing Functions
 # ============================================
 
-def create_spark_session():
-    """Create and return a Spark session for distributed processing"""
+# Shared transaction schema, built once and reused by batch and streaming jobs
+if PYSPARK_AVAILABLE:
+    TRANSACTION_SCHEMA = StructType([
+        StructField("customer_id", StringType(), True),
+        StructField("gender", StringType(), True),
+        StructField("age", IntegerType(), True),
+        StructField("category", StringType(), True),
+        StructField("quantity", IntegerType(), True),
+        StructField("price", DoubleType(), True),
+        StructField("payment_method", StringType(), True),
+        StructField("invoice_date", StringType(), True),
+        StructField("invoice_time", StringType(), True),
+        StructField("timestamp", StringType(), True),
+    ])
+else:
+    TRANSACTION_SCHEMA = None
+
+# Long-lived Spark session (created on first use)
+spark_session = None
+
+
+def create_spark_session(streaming=False):
+    """Create (or reuse) the Spark session for distributed processing"""
+    global spark_session
     if not PYSPARK_AVAILABLE:
         print("[Consumer] PySpark not available, skipping Spark session creation")
         return None
 
+    if spark_session is not None:
+        return spark_session
+
     try:
-        spark = SparkSession.builder \
+        builder = SparkSession.builder \
             .appName("EcommerceAnalytics") \
             .master("local[*]") \
             .config("spark.sql.shuffle.partitions", "4") \
             .config("spark.driver.memory", "2g") \
             .config("spark.executor.memory", "2g") \
-            .getOrCreate()
+            .config("spark.sql.session.timeZone", "UTC") \
+            .config("spark.sql.execution.arrow.pyspark.enabled", "true") \
+            .config("spark.sql.execution.arrow.pyspark.fallback.enabled", "true")
+
+        if streaming:
+            builder = builder.config("spark.jars.packages", SPARK_KAFKA_PACKAGE)
+
+        spark_session = builder.getOrCreate()
 
         print("[Consumer] Spark session created successfully")
-        return spark
+        return spark_session
     except Exception as e:
         print(f"[Consumer] Failed to create Spark session: {e}")
         return None
@@ -380,20 +669,9 @@ def process_with_spark(spark, transactions_data):
         return None
 
     try:
-        # Define schema for transactions
-        schema = StructType([
-            StructField("customer_id", StringType(), True),
-            StructField("gender", StringType(), True),
-            StructField("age", IntegerType(), True),
-            StructField("category", StringType(), True),
-            StructField("quantity", IntegerType(), True),
-            StructField("price", DoubleType(), True),
-            StructField("payment_method", StringType(), True),
-            StructField("invoice_date", StringType(), True),
-        ])
-
-        # Create DataFrame from transactions
-        df = spark.createDataFrame(transactions_data, schema=schema)
+        # Columnar handoff via Arrow instead of row-by-row serialization
+        frame = as_feature_frame(transactions_data)
+        df = frame.to_spark(spark, TRANSACTION_SCHEMA)
 
         # Calculate aggregations using Spark
         agg_result = df.groupBy("category").agg(
@@ -404,7 +682,8 @@ def process_with_spark(spark, transactions_data):
             spark_min("price").alias("min_price")
         )
 
-        print(f"[Consumer] Spark processing completed for {len(transactions_data)} transactions")
+        # len(frame), not df.count(), which would run a Spark job just for the log line
+        print(f"[Consumer] Spark processing completed for {len(frame)} transactions")
         return agg_result
 
     except Exception as e:
@@ -418,18 +697,7 @@ def spark_customer_analytics(spark, transactions_data):
         return None
 
     try:
-        schema = StructType([
-            StructField("customer_id", StringType(), True),
-            StructField("gender", StringType(), True),
-            StructField("age", IntegerType(), True),
-            StructField("category", StringType(), True),
-            StructField("quantity", IntegerType(), True),
-            StructField("price", DoubleType(), True),
-            StructField("payment_method", StringType(), True),
-            StructField("invoice_date", StringType(), True),
-        ])
-
-        df = spark.createDataFrame(transactions_data, schema=schema)
+        df = as_feature_frame(transactions_data).to_spark(spark, TRANSACTION_SCHEMA)
         df.createOrReplaceTempView("transactions")
 
         # Customer lifetime value analysis
@@ -453,6 +721,177 @@ def spark_customer_analytics(spark, transactions_data):
         return None
 
 
+# ============================================
+# Spark Structured Streaming Mode
+# ============================================
+
+def open_mysql_sink(connection=None):
+    return SinkConnection('MySQL', connect_mysql, lambda c: c.ping(reconnect=False), connection)
+
+
+def open_redis_sink(connection=None):
+    return SinkConnection('Redis', connect_redis, lambda c: c.ping(), connection)
+
+
+def open_hbase_sink(connection=None):
+    return SinkConnection('HBase', connect_hbase, lambda c: c.tables(), connection)
+
+
+def read_transaction_stream(spark):
+    """Read the Kafka topic as a parsed, watermarked transaction stream
+
+    The watermark is on the invoice date, the same event time the batch
+    path aggregates on, so closed days can be dropped from state.
+    """
+    raw = spark.readStream \
+        .format("kafka") \
+        .option("kafka.bootstrap.servers", KAFKA_BOOTSTRAP_SERVERS) \
+        .option("subscribe", KAFKA_TOPIC) \
+        .option("startingOffsets", "latest") \
+        .load()
+
+    return raw \
+        .select(from_json(col("value").cast("string"), TRANSACTION_SCHEMA).alias("t")) \
+        .select("t.*") \
+        .withColumn("invoice_day", to_timestamp(col("invoice_date"), "yyyy-MM-dd")) \
+        .withColumn("gmv", col("price") * col("quantity")) \
+        .withWatermark("invoice_day", STREAMING_WATERMARK)
+
+
+def save_stream_transactions(mysql_conn, transactions):
+    """Raw rows, customer stats and segments of one micro-batch in a single transaction"""
+    cursor = mysql_conn.cursor()
+    try:
+        transaction_writer.write(mysql_conn, transactions, commit=False)
+        upsert_customer_stats(cursor, transactions)
+        upsert_user_segments(cursor, sorted({t['customer_id'] for t in transactions}))
+        mysql_conn.commit()
+    except Exception:
+        mysql_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def write_with_retry(sink, sink_fn, batch_id, *args, attempts=STREAMING_WRITE_ATTEMPTS):
+    """sink.write() with jittered backoff between attempts, raising once they run out
+
+    A foreachBatch error stops the query for good, so a MySQL outage or an
+    open circuit is waited out here rather than failing the first attempt.
+    """
+    for attempt in range(attempts):
+        if sink.write(sink_fn, *args):
+            return
+        if attempt < attempts - 1:
+            delay = max(backoff_delay(attempt), sink.breaker.retry_after())
+            print(f"[Consumer] {sink.name} write for streaming batch {batch_id} failed, "
+                  f"attempt {attempt + 1}/{attempts} (retry in {delay:.1f}s)")
+            time.sleep(delay)
+    raise Exception(f"{sink.name} write failed for streaming batch {batch_id} after {attempts} attempts")
+
+
+def write_raw_batch(batch_df, batch_id, mysql_sink, redis_sink, hbase_sink):
+    """foreachBatch sink: append raw rows to MySQL, HBase and Redis
+
+    MySQL is retried with backoff; only if that runs out does the
+    micro-batch fail. The other sinks are best effort, as in the Kafka loop.
+    """
+    transactions = [row.asDict() for row in batch_df.drop("invoice_day", "gmv").collect()]
+    if not transactions:
+        return
+
+    write_with_retry(mysql_sink, save_stream_transactions, batch_id, transactions)
+    if hbase_sink is not None:
+        hbase_sink.write(save_to_hbase, transactions)
+    redis_sink.write(update_redis_cache, transactions)
+
+    print(f"[Consumer] Streaming batch {batch_id}: {len(transactions)} raw transactions")
+
+
+def upsert_category_metrics(mysql_conn, rows):
+    cursor = mysql_conn.cursor()
+    try:
+        # Update mode emits the full running aggregate, so values replace
+        cursor.executemany("""
+            INSERT INTO category_metrics (metric_date, category, gmv, order_count, unique_buyers)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE 
+                gmv = VALUES(gmv),
+                order_count = VALUES(order_count),
+                unique_buyers = VALUES(unique_buyers)
+        """, [
+            (r['metric_date'], r['category'], float(r['gmv']), int(r['order_count']), int(r['unique_buyers']))
+            for r in rows
+        ])
+        mysql_conn.commit()
+    except Exception:
+        mysql_conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def write_category_batch(batch_df, batch_id, mysql_sink):
+    """foreachBatch sink: upsert updated daily category aggregates"""
+    rows = batch_df.collect()
+    if not rows:
+        return
+
+    write_with_retry(mysql_sink, upsert_category_metrics, batch_id, rows)
+
+    print(f"[Consumer] Streaming batch {batch_id}: {len(rows)} category aggregates")
+
+
+def run_structured_streaming(spark):
+    """Run raw ingestion and the stateful category aggregation as streaming queries
+
+    Segments are scored from customer_stats as raw rows are written, since
+    stream state only covers events since the query first started.
+    """
+    events = read_transaction_stream(spark)
+
+    # Daily category aggregates keyed by invoice date, like the batch path;
+    # grouping on the watermarked column lets Spark drop closed days
+    category_daily = events \
+        .groupBy(col("invoice_day"), col("category")) \
+        .agg(
+            spark_sum("gmv").alias("gmv"),
+            count("*").alias("order_count"),
+            approx_count_distinct("customer_id").alias("unique_buyers")
+        ) \
+        .withColumn("metric_date", to_date(col("invoice_day")))
+
+    # Queries run their batches on concurrent driver threads, so each gets
+    # its own connections; they stay open across micro-batches
+    raw_sinks = (open_mysql_sink(), open_redis_sink(), open_hbase_sink() if HBASE_AVAILABLE else None)
+    category_sink = open_mysql_sink()
+    sinks = [*raw_sinks, category_sink]
+
+    queries = [
+        events.writeStream
+            .queryName("raw_transactions")
+            .foreachBatch(lambda df, batch_id: write_raw_batch(df, batch_id, *raw_sinks))
+            .option("checkpointLocation", os.path.join(SPARK_CHECKPOINT_DIR, "raw"))
+            .trigger(processingTime=STREAMING_TRIGGER)
+            .start(),
+        category_daily.writeStream
+            .queryName("category_metrics")
+            .outputMode("update")
+            .foreachBatch(lambda df, batch_id: write_category_batch(df, batch_id, category_sink))
+            .option("checkpointLocation", os.path.join(SPARK_CHECKPOINT_DIR, "category"))
+            .trigger(processingTime=STREAMING_TRIGGER)
+            .start(),
+    ]
+
+    print(f"[Consumer] Structured Streaming started with {len(queries)} queries")
+    try:
+        spark.streams.awaitAnyTermination()
+    finally:
+        for sink in sinks:
+            if sink is not None:
+                sink.close()
+
+
 # ============================================
 # Machine Learning Functions
 # ============================================
@@ -464,23 +903,8 @@ def train_customer_segmentation_model(transactions_data):
         return None
 
     try:
-        # Prepare data for clustering
-        df = pd.DataFrame(transactions_data)
-
-        # Aggregate by customer
-        customer_features = df.groupby('customer_id').agg({
-            'price': ['sum', 'mean', 'count'],
-            'quantity': 'sum',
-            'age': 'first',
-            'gender': 'first'
-        }).reset_index()
-
-        customer_features.columns = ['customer_id', 'total_gmv', 'avg_price', 'order_count',
-                                     'total_quantity', 'age', 'gender']
-
-        # Encode categorical features
-        le = LabelEncoder()
-        customer_features['gender_encoded'] = le.fit_transform(customer_features['gender'])
+        # Customer aggregates are shared across models for the batch
+        customer_features = as_feature_frame(transactions_data).customers.copy()
 
         # Select features for clustering
         features = customer_features[['total_gmv', 'avg_price', 'order_count', 'age', 'gender_encoded']]
@@ -511,27 +935,12 @@ def train_churn_prediction_model(transactions_data):
         return None
 
     try:
-        df = pd.DataFrame(transactions_data)
-
-        # Aggregate customer features
-        customer_data = df.groupby('customer_id').agg({
-            'price': ['sum', 'mean', 'count'],
-            'quantity': 'sum',
-            'age': 'first',
-            'gender': 'first',
-            'invoice_date': ['min', 'max']
-        }).reset_index()
-
-        customer_data.columns = ['customer_id', 'total_gmv', 'avg_price', 'order_count',
-                                 'total_quantity', 'age', 'gender', 'first_date', 'last_date']
+        # Customer aggregates are shared across models for the batch
+        customer_data = as_feature_frame(transactions_data).customers.copy()
 
         # Create churn label (simplified: customers with only 1 order are at risk)
         customer_data['churn_risk'] = (customer_data['order_count'] == 1).astype(int)
 
-        # Encode categorical features
-        le = LabelEncoder()
-        customer_data['gender_encoded'] = le.fit_transform(customer_data['gender'])
-
         # Select features
         features = customer_data[['total_gmv', 'avg_price', 'order_count', 'age', 'gender_encoded']]
         target = customer_data['churn_risk']
@@ -594,10 +1003,10 @@ def analyze_product_affinity(transactions_data):
         return None
 
     try:
-        df = pd.DataFrame(transactions_data)
+        df = as_feature_frame(transactions_data).transactions
 
         # Create customer-category matrix
-        customer_category = df.groupby(['customer_id', 'category']).agg({
+        customer_category = df.groupby(['customer_id', 'category'], observed=True).agg({
             'price': 'sum',
             'quantity': 'sum'
         }).reset_index()
@@ -626,108 +1035,544 @@ def analyze_product_affinity(transactions_data):
         return None
 
 
+def build_demand_features(daily_category):
+    """Build lag and rolling-window features for all categories in one pass
+
+    Expects one row per (invoice_date, category) with 'gmv' and 'orders'.
+    Missing days are filled with zero so that shifts are calendar-based.
+    """
+    df = daily_category[['invoice_date', 'category', 'gmv', 'orders']].copy()
+    df['invoice_date'] = pd.to_datetime(df['invoice_date'].astype(str))
+    df['category'] = df['category'].astype(str)
+
+    # Complete calendar per category, sorted by (category, date)
+    calendar = pd.MultiIndex.from_product(
+        [sorted(df['category'].unique()),
+         pd.date_range(df['invoice_date'].min(), df['invoice_date'].max(), freq='D')],
+        names=['category', 'invoice_date']
+    )
+    df = (df.groupby(['category', 'invoice_date'])[['gmv', 'orders']].sum()
+            .reindex(calendar, fill_value=0)
+            .reset_index())
+    df['gmv'] = df['gmv'].astype(np.float64)
+    df['orders'] = df['orders'].astype(np.float64)
+
+    grouped = df.groupby('category', sort=False)
+    for lag in FORECAST_LAGS:
+        df[f'gmv_lag{lag}'] = grouped['gmv'].shift(lag)
+    df['orders_lag1'] = grouped['orders'].shift(1)
+
+    # Rolling means over the days strictly before the target day
+    lagged = df.groupby('category', sort=False)['gmv_lag1']
+    for window in FORECAST_WINDOWS:
+        df[f'gmv_roll{window}'] = (lagged.rolling(window, min_periods=1).mean()
+                                         .reset_index(level=0, drop=True))
+
+    df['day_of_week'] = df['invoice_date'].dt.dayofweek
+    return df
+
+
+def _fit_category_regressor(category, category_features):
+    """Fit the demand regressor for a single category"""
+    model = RandomForestRegressor(n_estimators=100, min_samples_leaf=2, random_state=42)
+    model.fit(category_features[DEMAND_FEATURES].to_numpy(dtype=np.float64),
+              category_features['gmv'].to_numpy(dtype=np.float64))
+    return category, model
+
+
+def train_demand_models(features):
+    """Train one GMV regressor per category in parallel"""
+    training = features.dropna(subset=DEMAND_FEATURES)
+    category_frames = [
+        (category, frame)
+        for category, frame in training.groupby('category', sort=False)
+        if len(frame) >= FORECAST_MIN_SAMPLES
+    ]
+    if not category_frames:
+        return {}
+
+    # Forest fitting releases the GIL, so threads give real parallelism here
+    with ThreadPoolExecutor(max_workers=max(1, FORECAST_WORKERS)) as executor:
+        results = executor.map(lambda item: _fit_category_regressor(*item), category_frames)
+        return dict(results)
+
+
 def train_demand_forecasting_model(transactions_data):
     """Train time series forecasting model for demand prediction"""
     if not ML_AVAILABLE:
         return None
 
     try:
-        df = pd.DataFrame(transactions_data)
+        df = as_feature_frame(transactions_data).transactions
 
         # Aggregate by date and category
-        daily_category = df.groupby(['invoice_date', 'category']).agg({
-            'price': 'sum',
-            'quantity': 'sum'
-        }).reset_index()
+        daily_category = df.groupby(['invoice_date', 'category'], observed=True).agg(
+            gmv=('gmv', 'sum'),
+            orders=('gmv', 'size')
+        ).reset_index()
 
-        # For each category, train a simple model
-        models = {}
+        models = train_demand_models(build_demand_features(daily_category))
 
-        for category in daily_category['category'].unique():
-            category_data = daily_category[daily_category['category'] == category].sort_values('invoice_date')
+        print(f"[Consumer] Demand forecasting models trained for {len(models)} categories")
+        return models
 
-            if len(category_data) < 5:
-                continue
+    except Exception as e:
+        print(f"[Consumer] Demand forecasting model training error: {e}")
+        return None
+
+
+def forecast_demand(models, features, horizon=FORECAST_HORIZON_DAYS, start=None):
+    """Recursively forecast daily GMV and orders for `horizon` days from `start` (default today)
+
+    If the history ends more than a day before `start` (a stale rollup),
+    the missing days are predicted too, to feed the lags, but not returned.
+    """
+    start = pd.Timestamp(start or datetime.now().date())
+    forecasts = []
+
+    for category, history in features.groupby('category', sort=False):
+        model = models.get(category)
+        if model is None:
+            continue
+
+        gmv_history = history['gmv'].tolist()
+        orders_history = history['orders'].tolist()
+        last_date = history['invoice_date'].iloc[-1]
 
-            # Create features (lag features)
-            category_data['gmv'] = category_data['price']
-            category_data['gmv_lag1'] = category_data['gmv'].shift(1)
-            category_data['gmv_lag2'] = category_data['gmv'].shift(2)
-            category_data['quantity_lag1'] = category_data['quantity'].shift(1)
+        # Convert GMV back to orders using the recent average order value
+        recent_gmv = sum(gmv_history[-max(FORECAST_WINDOWS):])
+        recent_orders = sum(orders_history[-max(FORECAST_WINDOWS):])
+        aov = recent_gmv / recent_orders if recent_orders else 0.0
 
-            # Remove NaN rows
-            category_data = category_data.dropna()
+        steps = max(0, (start - last_date).days - 1) + horizon
+        for step in range(1, steps + 1):
+            target_date = last_date + timedelta(days=step)
+            row = [gmv_history[-lag] if len(gmv_history) >= lag else 0.0 for lag in FORECAST_LAGS]
+            row.append(orders_history[-1])
+            row.extend(float(np.mean(gmv_history[-window:])) for window in FORECAST_WINDOWS)
+            row.append(target_date.dayofweek)
 
-            if len(category_data) < 3:
+            predicted_gmv = max(0.0, float(model.predict(np.array([row], dtype=np.float64))[0]))
+            predicted_orders = predicted_gmv / aov if aov else 0.0
+
+            gmv_history.append(predicted_gmv)
+            orders_history.append(predicted_orders)
+            if target_date < start:
                 continue
+            forecasts.append({
+                'category': category,
+                'forecast_date': target_date.strftime('%Y-%m-%d'),
+                'predicted_gmv': round(predicted_gmv, 2),
+                'predicted_orders': int(round(predicted_orders))
+            })
 
-            # Train model
-            X = category_data[['gmv_lag1', 'gmv_lag2', 'quantity_lag1']]
-            y = category_data['gmv']
+    return forecasts
 
-            model = RandomForestClassifier(n_estimators=50, random_state=42)
-            # Note: Using classifier for demonstration, in production use regression
-            model.fit(X.astype(int), (y > y.median()).astype(int))
 
-            models[category] = model
+def load_category_history(mysql_conn, days=FORECAST_HISTORY_DAYS):
+    """Load daily per-category GMV and orders from the category_metrics rollup
+
+    Today is left out: its partial totals would be the most recent lag and
+    drag every forecast down.
+    """
+    cursor = mysql_conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT metric_date, category, gmv, order_count
+            FROM category_metrics
+            WHERE metric_date >= CURDATE() - INTERVAL %s DAY
+              AND metric_date < CURDATE()
+        """, (days,))
+        rows = cursor.fetchall()
+        mysql_conn.commit()
+    finally:
+        cursor.close()
+
+    return pd.DataFrame(
+        [(date, category, float(gmv), int(orders)) for date, category, gmv, orders in rows],
+        columns=['invoice_date', 'category', 'gmv', 'orders']
+    )
+
+
+def save_forecasts_to_mysql(mysql_conn, forecasts):
+    """Replace the upcoming forecasts in demand_forecasts
+
+    Rows from today on are deleted in the same transaction, so categories
+    dropped from the model do not keep serving old forecasts; past rows
+    are kept.
+    """
+    cursor = mysql_conn.cursor()
+    try:
+        generated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        cursor.execute("DELETE FROM demand_forecasts WHERE forecast_date >= CURDATE()")
+        cursor.executemany("""
+            INSERT INTO demand_forecasts
+            (category, forecast_date, predicted_gmv, predicted_orders, generated_at)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                predicted_gmv = VALUES(predicted_gmv),
+                predicted_orders = VALUES(predicted_orders),
+                generated_at = VALUES(generated_at)
+        """, [
+            (f['category'], f['forecast_date'], f['predicted_gmv'], f['predicted_orders'], generated_at)
+            for f in forecasts
+        ])
+        mysql_conn.commit()
+    except Exception:
+        mysql_conn.rollback()
+        raise
+    finally:
+        cursor.close()
 
-        print(f"[Consumer] Demand forecasting models trained for {len(models)} categories")
-        return models
+
+def refresh_demand_forecasts():
+    """Retrain demand models from rollup history and store the next forecasts
+
+    Runs on its own thread and MySQL connection (see start_forecast_refresh),
+    so training does not stall the poll loop or delay a consumer heartbeat.
+    """
+    if not ML_AVAILABLE:
+        return
+
+    mysql_conn = None
+    try:
+        mysql_conn = connect_mysql(allow_local_infile=False)
+        history = load_category_history(mysql_conn)
+        if history.empty:
+            return
+
+        features = build_demand_features(history)
+        models = train_demand_models(features)
+        forecasts = forecast_demand(models, features)
+        save_forecasts_to_mysql(mysql_conn, forecasts)
+
+        print(f"[Consumer] Stored {len(forecasts)} demand forecasts for {len(models)} categories")
 
     except Exception as e:
-        print(f"[Consumer] Demand forecasting model training error: {e}")
-        return None
+        print(f"[Consumer] Demand forecast refresh error: {e}")
+    finally:
+        if mysql_conn is not None:
+            mysql_conn.close()
+
+
+def refresh_customer_models():
+    """Retrain segmentation and churn on the feature store and write predictions back
+
+    Runs on its own thread and HBase connections (see start_model_refresh),
+    outside the sink circuit breaker, so a slow fit does not stall the poll
+    loop and a model error does not count as an HBase failure.
+    """
+    if not ML_AVAILABLE:
+        return
+
+    hbase_conn = None
+    try:
+        customers = load_customer_features(connect_hbase)
+        if customers.empty:
+            return
+        frame = FeatureFrame.from_customers(customers)
+        predictions = {}
+
+        segmentation = train_customer_segmentation_model(frame)
+        if segmentation is not None:
+            _, _, segmented = segmentation
+            predictions['segment_cluster'] = dict(zip(segmented['customer_id'], segmented['segment']))
+
+        churn = train_churn_prediction_model(frame)
+        if churn is not None:
+            model, scaler, churn_data = churn
+            features = scaler.transform(churn_data[['total_gmv', 'avg_price', 'order_count', 'age', 'gender_encoded']])
+            probability = model.predict_proba(features)[:, 1].round(4)
+            predictions['churn_probability'] = dict(zip(churn_data['customer_id'], probability))
+
+        hbase_conn = connect_hbase()
+        write_predictions(hbase_conn, predictions)
+
+    except Exception as e:
+        print(f"[Consumer] Customer model refresh error: {e}")
+    finally:
+        if hbase_conn is not None:
+            hbase_conn.close()
+
+
+# Background retrain threads by name
+refresh_threads = {}
+
+
+def start_refresh(name, target):
+    """Run target on a daemon thread unless its previous run is still going"""
+    thread = refresh_threads.get(name)
+    if thread is not None and thread.is_alive():
+        print(f"[Consumer] {name} refresh still running, skipping this interval")
+        return
+    refresh_threads[name] = thread = threading.Thread(target=target, name=name, daemon=True)
+    thread.start()
+
+
+def start_model_refresh():
+    """Start a background customer model retrain"""
+    start_refresh('customer-models', refresh_customer_models)
+
+
+def start_forecast_refresh():
+    """Start a background demand forecast retrain"""
+    start_refresh('demand-forecasts', refresh_demand_forecasts)
+
+
+# Recent produce-to-visible latencies behind the published percentiles
+recent_latencies = deque(maxlen=FRESHNESS_SAMPLE_SIZE)
+
+
+def record_freshness(redis_conn, batch, mysql_done, redis_done):
+    """Track producer-to-sink latency per record and publish freshness for the API"""
+    produced = []
+    for t in batch:
+        try:
+            produced.append(datetime.fromisoformat(t['timestamp']).timestamp())
+        except (KeyError, TypeError, ValueError):
+            continue
+    if not produced:
+        return
+
+    # Visible on the dashboard once both MySQL and Redis have the batch
+    visible = max(mysql_done, redis_done)
+    for ts in produced:
+        metrics.MYSQL_END_TO_END.observe(mysql_done - ts)
+        metrics.REDIS_END_TO_END.observe(redis_done - ts)
+        recent_latencies.append(visible - ts)
+
+    p50, p95, p99 = np.percentile(recent_latencies, [50, 95, 99])
+    try:
+        redis_conn.hset('realtime:freshness', mapping={
+            'newest_event': max(produced),
+            'visible_at': visible,
+            'p50': round(p50, 3),
+            'p95': round(p95, 3),
+            'p99': round(p99, 3),
+            'samples': len(recent_latencies),
+        })
+    except Exception as e:
+        metrics.REDIS_ERRORS.inc()
+        print(f"[Consumer] Freshness update error: {e}")
+        return False
+
+
+def flush_batch(batch, mysql_sink, redis_sink, hbase_sink, cohort_engine, olap_sink, committed):
+    """Write a batch through every sink, timing each one
+
+    MySQL goes first: its commit checkpoints the customer state and the
+    Kafka offsets. If it fails (or its circuit is open) nothing else is
+    written and False is returned, so the caller holds the batch and
+    retries it; the other sinks are not idempotent and must see a batch
+    only once. Other sinks whose circuit is open are skipped.
+    """
+    # Captured before save_to_mysql, which clears the changed-customer set
+    changed = customer_state.dirty_items()
+    with metrics.MYSQL_FLUSH.time():
+        if not mysql_sink.write(save_to_mysql, batch, False, committed):
+            return False
+    mysql_done = time.time()
+    metrics.BATCH_ROWS.observe(len(batch))
+
+    if hbase_sink is not None:
+        with metrics.HBASE_FLUSH.time():
+            hbase_sink.write(save_to_hbase, batch)
+            hbase_sink.write(write_features, changed)
+    with metrics.COHORT_FLUSH.time():
+        # Skipped by an open circuit: keep the activity for the next batch
+        if not mysql_sink.write(save_cohorts, cohort_engine, batch):
+            cohort_engine.defer(batch)
+    with metrics.REDIS_FLUSH.time():
+        redis_sink.write(update_redis_cache, batch)
+    redis_done = time.time()
+    with metrics.OLAP_FLUSH.time():
+        save_to_olap(olap_sink, batch)
+
+    redis_sink.write(record_freshness, batch, mysql_done, redis_done)
+    metrics.FLUSHED.inc(len(batch))
+    metrics.STATE_HOT_CUSTOMERS.set(len(customer_state))
+    return True
+
+
+def commit_offsets(kafka_consumer, sync=False):
+    """Commit only the offsets checkpointed with the customer state
+
+    Offsets of batches not yet in MySQL stay uncommitted, so the group
+    never gets ahead of the state it would resume from.
+    """
+    assigned = kafka_consumer.assignment()
+    offsets = {
+        TopicPartition(topic, partition): OffsetAndMetadata(offset, '')
+        for (topic, partition), offset in customer_state.offsets.items()
+        if TopicPartition(topic, partition) in assigned
+    }
+    if not offsets:
+        return
+    if sync:
+        kafka_consumer.commit(offsets)
+    else:
+        kafka_consumer.commit_async(offsets)
 
 
 def main():
     print("[Consumer] Starting Spark Consumer...")
 
+    if CONSUMER_MODE == 'streaming':
+        spark = create_spark_session(streaming=True)
+        if spark is None:
+            raise Exception("Structured Streaming mode requires PySpark")
+        try:
+            run_structured_streaming(spark)
+        except KeyboardInterrupt:
+            print("\n[Consumer] Shutting down streaming queries")
+        finally:
+            spark.stop()
+        return
+
     # Connect to services
-    mysql_conn = create_mysql_connection()
-    redis_conn = create_redis_connection()
-    hbase_conn = create_hbase_connection()
+    mysql_sink = open_mysql_sink(create_mysql_connection())
+    redis_sink = open_redis_sink(create_redis_connection())
+    hbase_sink = None
+    if HBASE_AVAILABLE:
+        # Starts without a connection if HBase is down; reconnects under its breaker
+        hbase_sink = open_hbase_sink(create_hbase_connection())
+    customer_state.open()
     consumer = create_kafka_consumer()
-
+    cohort_engine = CohortEngine()
+    olap_sink = create_olap_sink()
+    metrics.start_metrics_server()
+
+    # Bound once; the loop runs for every message
+    perf_counter = time.perf_counter
+    decode_seconds = metrics.DECODE_SECONDS
+    process_seconds = metrics.PROCESS_SECONDS
+    messages_total = metrics.MESSAGES
+
+    batcher = create_batch_controller(BATCH_SIZE, BATCH_TIMEOUT)
+    batch_offsets = {}  # (topic, partition) -> next offset of the open batch
+    committed = set()  # MySQL stages already committed for the held batch
+    paused = False  # consumption is paused while a batch waits for MySQL
     batch_start_time = time.time()
+    last_snapshot_time = time.time()
+    last_forecast_time = 0.0
+    last_model_time = time.time()
+    last_lag_time = 0.0
     processed_count = 0
     
     try:
         print("[Consumer] Waiting for messages...")
         
-        for message in consumer:
-            transaction = message.value
-            transaction_batch.append(transaction)
-            process_transaction(transaction)
+        while True:
+            # Poll rather than iterate so the batch timeout fires even when no messages arrive
+            remaining = batcher.timeout - (time.time() - batch_start_time) if transaction_batch else batcher.timeout
+            records = consumer.poll(
+                timeout_ms=max(1, int(remaining * 1000)),
+                max_records=max(1, batcher.size - len(transaction_batch))
+            )
+
+            for tp, partition_messages in records.items():
+                batch_offsets[tp.topic, tp.partition] = partition_messages[-1].offset + 1
+                for message in partition_messages:
+                    messages_total.inc()
+
+                    # Decoded here rather than in a value_deserializer so it can be timed
+                    start = perf_counter()
+                    try:
+                        transaction = json.loads(message.value)
+                    except ValueError:
+                        metrics.DECODE_ERRORS.inc()
+                        continue
+                    decoded = perf_counter()
+                    decode_seconds.observe(decoded - start)
+
+                    if not transaction_batch:
+                        batch_start_time = time.time()
+                    transaction_batch.append(transaction)
+                    process_transaction(transaction)
+                    process_seconds.observe(perf_counter() - decoded)
             
             # Check if batch should be processed
             batch_elapsed = time.time() - batch_start_time
             
-            if len(transaction_batch) >= BATCH_SIZE or batch_elapsed >= BATCH_TIMEOUT:
-                if transaction_batch:
-                    save_to_hbase(hbase_conn, transaction_batch)
-                    save_to_mysql(mysql_conn, transaction_batch)
-                    update_redis_cache(redis_conn, transaction_batch)
-
-                    processed_count += len(transaction_batch)
-                    print(f"[Consumer] Total processed: {processed_count}")
-
-                    transaction_batch.clear()
-                    clear_batch_aggregators()
+            if batcher.should_flush(len(transaction_batch), batch_elapsed):
+                rows = len(transaction_batch)
+                customer_state.track_offsets(batch_offsets)
+                batch_offsets.clear()
+                flush_start = perf_counter()
+                if not flush_batch(transaction_batch, mysql_sink, redis_sink, hbase_sink, cohort_engine, olap_sink, committed):
+                    # Backpressure: hold the batch (and its pinned state) and
+                    # stop fetching until MySQL takes it, retrying each timeout
+                    # Re-paused every time, as a rebalance resumes new assignments
+                    consumer.pause(*consumer.assignment())
+                    if not paused:
+                        paused = True
+                        print(f"[Consumer] MySQL unavailable, holding {rows} transactions and pausing consumption")
                     batch_start_time = time.time()
+                    continue
+                flush_seconds = perf_counter() - flush_start
+                committed.clear()
+                if paused:
+                    consumer.resume(*consumer.paused())
+                    paused = False
+                    print("[Consumer] MySQL recovered, resuming consumption")
+                commit_offsets(consumer)
+
+                processed_count += rows
+                print(f"[Consumer] Total processed: {processed_count}")
+
+                transaction_batch.clear()
+                clear_batch_aggregators()
+
+                batcher.observe(rows, batch_elapsed, flush_seconds, kafka_lag(consumer))
+                metrics.BATCH_TARGET_ROWS.set(batcher.size)
+                metrics.BATCH_TIMEOUT_SECONDS.set(batcher.timeout)
+                batch_start_time = time.time()
+
+                if STATE_SNAPSHOT_INTERVAL and time.time() - last_snapshot_time >= STATE_SNAPSHOT_INTERVAL:
+                    customer_state.snapshot()
+                    last_snapshot_time = time.time()
+
+            if time.time() - last_lag_time >= metrics.KAFKA_LAG_INTERVAL:
+                try:
+                    metrics.record_kafka_lag(consumer)
+                except Exception as e:
+                    print(f"[Consumer] Kafka lag check error: {e}")
+                last_lag_time = time.time()
+
+            # Forecasts are precomputed here so the API only reads them
+            if time.time() - last_forecast_time >= FORECAST_INTERVAL:
+                start_forecast_refresh()
+                last_forecast_time = time.time()
+
+            # Customer models train on the feature store, not on raw transactions
+            if hbase_sink is not None and MODEL_INTERVAL and time.time() - last_model_time >= MODEL_INTERVAL:
+                start_model_refresh()
+                last_model_time = time.time()
                     
     except KeyboardInterrupt:
         print(f"\n[Consumer] Shutting down. Total processed: {processed_count}")
     finally:
         # Process remaining batch
         if transaction_batch:
-            save_to_hbase(hbase_conn, transaction_batch)
-            save_to_mysql(mysql_conn, transaction_batch)
-            update_redis_cache(redis_conn, transaction_batch)
-
-        mysql_conn.close()
-        redis_conn.close()
-        if hbase_conn is not None:
-            hbase_conn.close()
+            customer_state.track_offsets(batch_offsets)
+            if flush_batch(transaction_batch, mysql_sink, redis_sink, hbase_sink, cohort_engine, olap_sink, committed):
+                try:
+                    commit_offsets(consumer, sync=True)
+                except Exception as e:
+                    print(f"[Consumer] Kafka offset commit error: {e}")
+        if olap_sink is not None:
+            olap_sink.flush()
+        if cohort_engine.pending:
+            mysql_sink.write(save_cohorts, cohort_engine, [])
+
+        # A batch MySQL never took must be replayed on restart, so its
+        # offsets and customer totals are not persisted
+        customer_state.discard()
+        customer_state.close()
+        mysql_sink.close()
+        redis_sink.close()
+        if hbase_sink is not None:
+            hbase_sink.close()
         consumer.close()
 
 
@@ -0,0 +1,129 @@
+"""
+Customer Feature Store
+Per-customer feature vectors in the HBase `customer_features` table and
+model outputs in `ml_predictions`, both keyed by customer_id, so training
+reads maintained aggregates instead of recomputing them from raw
+transactions, and the API can serve point lookups
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+FEATURE_TABLE = 'customer_features'
+PREDICTION_TABLE = 'ml_predictions'
+
+# Feature columns, with the meaning of FeatureFrame.customers. Its total_gmv
+# is the sum of unit prices, so it is stored as price_sum, distinct from
+# customer_stats.total_gmv (price x quantity), and renamed back on load
+FEATURE_TYPES = {
+    'price_sum': float,
+    'avg_price': float,
+    'order_count': int,
+    'total_quantity': int,
+    'age': int,
+    'gender': str,
+    'first_date': str,
+    'last_date': str,
+}
+# Columns written under an earlier name, read until the row is rewritten
+LEGACY_COLUMNS = {'price_sum': b'cf:total_gmv'}
+FEATURE_COLUMNS = [f"cf:{name}".encode() for name in FEATURE_TYPES] + list(LEGACY_COLUMNS.values())
+
+FEATURE_BATCH_SIZE = int(os.getenv('FEATURE_BATCH_SIZE', '1000'))  # puts per Thrift mutateRows call
+FEATURE_SCAN_WORKERS = int(os.getenv('FEATURE_SCAN_WORKERS', '4'))
+FEATURE_SCAN_BATCH = 1000  # rows per scanner round trip
+
+
+def feature_vector(record):
+    """HBase cells for one CustomerRecord"""
+    values = {
+        'price_sum': round(record.price_sum, 2),
+        'avg_price': round(record.price_sum / max(1, record.orders), 2),
+        'order_count': record.orders,
+        'total_quantity': record.items,
+        'age': record.age,
+        'gender': record.gender,
+        'first_date': record.first_date,
+        'last_date': record.last_date,
+    }
+    return {f"cf:{name}".encode(): str(value).encode('utf-8') for name, value in values.items() if value is not None}
+
+
+def write_features(hbase_conn, customers):
+    """Put the feature vectors of (customer_id, CustomerRecord) pairs in batched mutations"""
+    if hbase_conn is None or not customers:
+        return
+
+    try:
+        table = hbase_conn.table(FEATURE_TABLE)
+        with table.batch(batch_size=FEATURE_BATCH_SIZE) as batch:
+            for customer_id, record in customers:
+                batch.put(customer_id.encode('utf-8'), feature_vector(record))
+    except Exception as e:
+        print(f"[Consumer] Feature store write error: {e}")
+        return False
+
+
+def _decode_features(key, data):
+    row = {'customer_id': key.decode('utf-8')}
+    for name, cast in FEATURE_TYPES.items():
+        value = data.get(f"cf:{name}".encode(), data.get(LEGACY_COLUMNS.get(name)))
+        row[name] = cast(value.decode('utf-8')) if value is not None else None
+    return row
+
+
+def _scan_range(connect, start, stop):
+    """Scan one region's key range on a dedicated connection"""
+    connection = connect()
+    try:
+        table = connection.table(FEATURE_TABLE)
+        return [_decode_features(key, data) for key, data in table.scan(
+            row_start=start or None, row_stop=stop or None,
+            columns=FEATURE_COLUMNS, batch_size=FEATURE_SCAN_BATCH
+        )]
+    finally:
+        connection.close()
+
+
+def load_customer_features(connect, workers=FEATURE_SCAN_WORKERS):
+    """All feature vectors as a DataFrame, one parallel scan per table region
+
+    happybase connections are not thread-safe, so each scan opens its own
+    through connect().
+    """
+    connection = connect()
+    try:
+        regions = connection.table(FEATURE_TABLE).regions()
+    finally:
+        connection.close()
+
+    ranges = [(region['start_key'], region['end_key']) for region in regions] or [(b'', b'')]
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(ranges)))) as executor:
+        rows = [row for chunk in executor.map(lambda r: _scan_range(connect, *r), ranges) for row in chunk]
+
+    print(f"[Consumer] Loaded {len(rows)} feature vectors from {len(ranges)} regions in {time.time() - start:.1f}s")
+    frame = pd.DataFrame(rows, columns=['customer_id', *FEATURE_TYPES])
+    return frame.rename(columns={'price_sum': 'total_gmv'})
+
+
+def write_predictions(hbase_conn, predictions):
+    """Store {column: {customer_id: value}} in ml_predictions with an update time"""
+    if hbase_conn is None or not predictions:
+        return
+
+    updated_at = str(int(time.time())).encode()
+    rows = {}
+    for column, values in predictions.items():
+        cell = f"cf:{column}".encode()
+        for customer_id, value in values.items():
+            rows.setdefault(customer_id, {b'cf:updated_at': updated_at})[cell] = str(value).encode('utf-8')
+
+    table = hbase_conn.table(PREDICTION_TABLE)
+    with table.batch(batch_size=FEATURE_BATCH_SIZE) as batch:
+        for customer_id, data in rows.items():
+            batch.put(customer_id.encode('utf-8'), data)
+    print(f"[Consumer] Wrote {', '.join(predictions)} predictions for {len(rows)} customers")
@@ -0,0 +1,93 @@
+"""
+Feature Frame Builder
+Converts a transaction batch into typed columns once and shares it across ML and Spark functions
+"""
+
+import numpy as np
+import pandas as pd
+
+# Low-cardinality string columns stored as pandas categoricals
+CATEGORICAL_COLUMNS = ('gender', 'category', 'payment_method')
+
+# Column order matches the Spark TRANSACTION_SCHEMA
+TRANSACTION_COLUMNS = [
+    'customer_id', 'gender', 'age', 'category', 'quantity', 'price',
+    'payment_method', 'invoice_date', 'invoice_time', 'timestamp'
+]
+
+
+def transactions_to_frame(transactions_data):
+    """Convert a list of transaction dicts into a compact, typed DataFrame"""
+    df = pd.DataFrame.from_records(transactions_data, columns=TRANSACTION_COLUMNS)
+
+    for column in CATEGORICAL_COLUMNS:
+        df[column] = df[column].astype('category')
+
+    # ISO dates sort lexically, so an ordered categorical keeps min/max working
+    df['invoice_date'] = pd.Categorical(
+        df['invoice_date'], categories=sorted(df['invoice_date'].dropna().unique()), ordered=True
+    )
+
+    # Optional string columns: missing values must be None for Spark's StringType
+    for column in ('invoice_time', 'timestamp'):
+        df[column] = df[column].astype(object).where(df[column].notna(), None)
+
+    df['age'] = df['age'].astype(np.int16)
+    df['quantity'] = df['quantity'].astype(np.int16)
+    df['price'] = df['price'].astype(np.float32)
+    df['gmv'] = df['price'] * df['quantity'].astype(np.float32)
+    return df
+
+
+class FeatureFrame:
+    """Columnar view of one transaction batch with cached customer aggregates"""
+
+    def __init__(self, transactions_data):
+        self.transactions = transactions_to_frame(transactions_data)
+        self._customers = None
+
+    @classmethod
+    def from_customers(cls, customers):
+        """Frame over precomputed customer aggregates (e.g. from the feature store), without transactions"""
+        frame = cls.__new__(cls)
+        frame.transactions = None
+        customers = customers.copy()
+        gender = pd.Categorical(customers['gender'], categories=sorted(customers['gender'].dropna().unique()))
+        customers['gender_encoded'] = gender.codes.astype(np.int8)
+        frame._customers = customers
+        return frame
+
+    def __len__(self):
+        return len(self.transactions) if self.transactions is not None else len(self._customers)
+
+    @property
+    def customers(self):
+        """Per-customer aggregates, computed once per batch (treat as read-only)"""
+        if self._customers is None:
+            customers = self.transactions.groupby('customer_id', observed=True).agg(
+                total_gmv=('price', 'sum'),
+                avg_price=('price', 'mean'),
+                order_count=('price', 'size'),
+                total_quantity=('quantity', 'sum'),
+                age=('age', 'first'),
+                gender=('gender', 'first'),
+                first_date=('invoice_date', 'min'),
+                last_date=('invoice_date', 'max')
+            ).reset_index()
+
+            # Category codes are sorted, matching LabelEncoder's encoding
+            gender = pd.Categorical(customers['gender'], categories=self.transactions['gender'].cat.categories)
+            customers['gender_encoded'] = gender.codes.astype(np.int8)
+            self._customers = customers
+        return self._customers
+
+    def to_spark(self, spark, schema):
+        """Hand the batch to Spark (Arrow-accelerated when enabled on the session)"""
+        return spark.createDataFrame(self.transactions[schema.fieldNames()], schema=schema)
+
+
+def as_feature_frame(transactions_data):
+    """Return a FeatureFrame, building one only if needed"""
+    if isinstance(transactions_data, FeatureFrame):
+        return transactions_data
+    return FeatureFrame(transactions_data)
@@ -0,0 +1,140 @@
+"""
+Transaction Ingest Writer
+Bulk-loads raw transaction rows into MySQL with a selectable strategy:
+explicit multi-row INSERTs sized to max_allowed_packet, LOAD DATA LOCAL
+INFILE from a CSV spooled to memory-backed storage, or plain executemany
+"""
+
+import csv
+import os
+import tempfile
+
+# Configuration from environment
+INGEST_STRATEGY = os.getenv('INGEST_STRATEGY', 'multirow')  # 'multirow', 'load_data' or 'executemany'
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', '5000'))  # max rows per statement / file
+INGEST_STRATEGIES = ('multirow', 'load_data', 'executemany')
+
+# Leave headroom below max_allowed_packet for the statement text and protocol overhead
+PACKET_SAFETY_RATIO = 0.8
+ROW_OVERHEAD_BYTES = 40
+
+# tmpfs keeps the LOAD DATA file in memory where available
+SPOOL_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+TRANSACTION_COLUMNS = (
+    'customer_id', 'gender', 'age', 'category', 'quantity', 'price',
+    'payment_method', 'invoice_date', 'invoice_time'
+)
+
+
+def transaction_values(t):
+    """Column values for one transaction in TRANSACTION_COLUMNS order"""
+    return (
+        t['customer_id'], t['gender'], t['age'], t['category'],
+        t['quantity'], t['price'], t['payment_method'],
+        t['invoice_date'], t.get('invoice_time')
+    )
+
+
+class TransactionWriter:
+    """Writes raw transactions, by default in their own MySQL transaction"""
+
+    def __init__(self, strategy=INGEST_STRATEGY, batch_size=INGEST_BATCH_SIZE, table='transactions'):
+        if strategy not in INGEST_STRATEGIES:
+            raise ValueError(f"Unknown ingest strategy: {strategy}")
+        self.strategy = strategy
+        self.batch_size = max(1, batch_size)
+        self.table = table
+        self.columns = ', '.join(TRANSACTION_COLUMNS)
+        self.row_placeholder = '(' + ', '.join(['%s'] * len(TRANSACTION_COLUMNS)) + ')'
+        self.max_packet = None
+
+    def write(self, mysql_conn, transactions, commit=True):
+        """Insert all rows and commit; returns the number of rows written
+
+        With commit=False the rows join the caller's open transaction, and
+        the caller commits or rolls back.
+        """
+        if not transactions:
+            return 0
+
+        cursor = mysql_conn.cursor()
+        try:
+            rows = [transaction_values(t) for t in transactions]
+            if self.strategy == 'multirow':
+                self._write_multirow(cursor, rows)
+            elif self.strategy == 'load_data':
+                self._write_load_data(cursor, rows)
+            else:
+                self._write_executemany(cursor, rows)
+            if commit:
+                mysql_conn.commit()
+            return len(rows)
+        except Exception:
+            if commit:
+                mysql_conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def _packet_budget(self, cursor):
+        """Usable bytes per statement, read once from the server"""
+        if self.max_packet is None:
+            cursor.execute("SELECT @@max_allowed_packet")
+            (max_allowed,) = cursor.fetchone()
+            self.max_packet = int(int(max_allowed) * PACKET_SAFETY_RATIO)
+        return self.max_packet
+
+    def _write_multirow(self, cursor, rows):
+        """One INSERT ... VALUES (...), (...) per chunk, bounded by rows and packet size"""
+        budget = self._packet_budget(cursor)
+        prefix = f"INSERT INTO {self.table} ({self.columns}) VALUES "
+
+        chunk = []
+        chunk_bytes = len(prefix)
+        for row in rows:
+            row_bytes = ROW_OVERHEAD_BYTES + sum(len(str(v).encode('utf-8')) for v in row)
+            if chunk and (len(chunk) >= self.batch_size or chunk_bytes + row_bytes > budget):
+                self._execute_multirow(cursor, prefix, chunk)
+                chunk = []
+                chunk_bytes = len(prefix)
+            chunk.append(row)
+            chunk_bytes += row_bytes
+
+        if chunk:
+            self._execute_multirow(cursor, prefix, chunk)
+
+    def _execute_multirow(self, cursor, prefix, chunk):
+        """Execute a single multi-row INSERT"""
+        sql = prefix + ', '.join([self.row_placeholder] * len(chunk))
+        cursor.execute(sql, [value for row in chunk for value in row])
+
+    def _write_load_data(self, cursor, rows):
+        """LOAD DATA LOCAL INFILE from a CSV spooled to memory-backed storage
+
+        The connector only loads from a file path, so the CSV buffer is
+        written to /dev/shm (tmpfs) rather than an in-process buffer.
+        Requires allow_local_infile on the client and local_infile on the server.
+        """
+        for start in range(0, len(rows), self.batch_size):
+            with tempfile.NamedTemporaryFile('w', suffix='.csv', dir=SPOOL_DIR,
+                                             newline='', encoding='utf-8') as spool:
+                writer = csv.writer(spool, lineterminator='\n')
+                for row in rows[start:start + self.batch_size]:
+                    # With an empty ESCAPED BY, an unquoted NULL is read as SQL NULL
+                    writer.writerow(['NULL' if v is None else v for v in row])
+                spool.flush()
+
+                cursor.execute(f"""
+                    LOAD DATA LOCAL INFILE '{spool.name}' INTO TABLE {self.table}
+                    CHARACTER SET utf8mb4
+                    FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+                    LINES TERMINATED BY '\\n'
+                    ({self.columns})
+                """)
+
+    def _write_executemany(self, cursor, rows):
+        """Parameterized executemany (connector-dependent batching)"""
+        sql = f"INSERT INTO {self.table} ({self.columns}) VALUES {self.row_placeholder}"
+        for start in range(0, len(rows), self.batch_size):
+            cursor.executemany(sql, rows[start:start + self.batch_size])
@@ -0,0 +1,127 @@
+"""
+Consumer Metrics
+Prometheus counters and histograms for the consumer loop, served over HTTP
+on METRICS_PORT. Label values are bound once at import so the hot loop only
+calls observe()/inc() on ready objects.
+"""
+
+import os
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram, start_http_server
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+# Configuration from environment (0 disables the endpoint)
+METRICS_PORT = int(os.getenv('METRICS_PORT', '8001'))
+KAFKA_LAG_INTERVAL = int(os.getenv('KAFKA_LAG_INTERVAL', '15'))  # seconds
+
+# Per-record stages take microseconds, sink flushes milliseconds to seconds
+RECORD_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01)
+FLUSH_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+# Producer timestamp to sink commit
+FRESHNESS_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0, 60.0, 120.0, 300.0)
+
+
+class _NoopMetric:
+    """Stand-in when prometheus_client is not installed"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, value):
+        pass
+
+    def time(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+if not PROMETHEUS_AVAILABLE:
+    def Counter(*args, **kwargs):
+        return _NoopMetric()
+
+    Gauge = Histogram = Counter
+
+
+STAGE_SECONDS = Histogram(
+    'consumer_record_stage_seconds', 'Per-record processing time by stage',
+    ['stage'], buckets=RECORD_BUCKETS
+)
+FLUSH_SECONDS = Histogram(
+    'consumer_sink_flush_seconds', 'Batch flush time by sink',
+    ['sink'], buckets=FLUSH_BUCKETS
+)
+SINK_ERRORS = Counter('consumer_sink_errors_total', 'Failed batch writes by sink', ['sink'])
+SINK_SKIPPED = Counter('consumer_sink_skipped_total', 'Writes skipped because the sink circuit was open', ['sink'])
+SINK_CIRCUIT_OPEN = Gauge('consumer_sink_circuit_open', 'Whether the sink circuit breaker is open', ['sink'])
+END_TO_END_SECONDS = Histogram(
+    'consumer_end_to_end_seconds', 'Producer timestamp to sink commit, per record',
+    ['sink'], buckets=FRESHNESS_BUCKETS
+)
+KAFKA_LAG = Gauge('consumer_kafka_lag', 'Messages behind the partition end offset', ['topic', 'partition'])
+
+MESSAGES = Counter('consumer_messages_total', 'Kafka messages received')
+DECODE_ERRORS = Counter('consumer_decode_errors_total', 'Messages skipped because they are not valid JSON')
+BATCH_ROWS = Histogram('consumer_batch_rows', 'Transactions per flushed batch', buckets=BATCH_SIZE_BUCKETS)
+FLUSHED = Counter('consumer_transactions_flushed_total', 'Transactions written through the sinks')
+BATCH_TARGET_ROWS = Gauge('consumer_batch_target_rows', 'Batch size the controller currently flushes at')
+BATCH_TIMEOUT_SECONDS = Gauge('consumer_batch_timeout_seconds', 'Batch age the controller currently flushes at')
+COHORT_EARLY_ORDERS = Counter(
+    'consumer_cohort_early_orders_total',
+    "Customer-months skipped by the cohort engine because they predate the customer's cohort"
+)
+STATE_HOT_CUSTOMERS = Gauge('consumer_state_hot_customers', 'Customer records held in the in-memory hot tier')
+
+# Pre-bound children used on the hot path
+DECODE_SECONDS = STAGE_SECONDS.labels('decode')
+PROCESS_SECONDS = STAGE_SECONDS.labels('process_transaction')
+
+HBASE_FLUSH = FLUSH_SECONDS.labels('hbase')
+MYSQL_FLUSH = FLUSH_SECONDS.labels('mysql')
+COHORT_FLUSH = FLUSH_SECONDS.labels('cohort')
+REDIS_FLUSH = FLUSH_SECONDS.labels('redis')
+OLAP_FLUSH = FLUSH_SECONDS.labels('olap')
+
+MYSQL_END_TO_END = END_TO_END_SECONDS.labels('mysql')
+REDIS_END_TO_END = END_TO_END_SECONDS.labels('redis')
+
+HBASE_ERRORS = SINK_ERRORS.labels('hbase')
+MYSQL_ERRORS = SINK_ERRORS.labels('mysql')
+REDIS_ERRORS = SINK_ERRORS.labels('redis')
+
+
+def start_metrics_server():
+    """Serve /metrics in a background thread"""
+    if not METRICS_PORT:
+        return
+    if not PROMETHEUS_AVAILABLE:
+        print("[Consumer] Warning: prometheus_client not installed. Metrics disabled.")
+        return
+    start_http_server(METRICS_PORT)
+    print(f"[Consumer] Serving Prometheus metrics on :{METRICS_PORT}/metrics")
+
+
+def record_kafka_lag(kafka_consumer):
+    """Set the lag gauge for every assigned partition (one end-offset request)"""
+    partitions = list(kafka_consumer.assignment())
+    if not partitions:
+        return
+
+    end_offsets = kafka_consumer.end_offsets(partitions)
+    for tp in partitions:
+        lag = end_offsets[tp] - kafka_consumer.position(tp)
+        KAFKA_LAG.labels(tp.topic, str(tp.partition)).set(max(0, lag))
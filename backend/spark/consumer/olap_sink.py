@@ -0,0 +1,137 @@
+"""
+OLAP Sink
+Appends consumer batches as Arrow record batches and flushes them into a
+month-partitioned Parquet dataset that the API queries through DuckDB
+"""
+
+import os
+import shutil
+import time
+import uuid
+from datetime import date
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Configuration from environment (empty OLAP_DIR disables the sink)
+OLAP_DIR = os.getenv('OLAP_DIR', '')
+OLAP_FLUSH_ROWS = int(os.getenv('OLAP_FLUSH_ROWS', '5000'))
+OLAP_FLUSH_INTERVAL = int(os.getenv('OLAP_FLUSH_INTERVAL', '60'))  # seconds
+
+if PYARROW_AVAILABLE:
+    OLAP_SCHEMA = pa.schema([
+        ('customer_id', pa.string()),
+        ('gender', pa.string()),
+        ('age', pa.int32()),
+        ('category', pa.string()),
+        ('quantity', pa.int32()),
+        ('price', pa.float64()),
+        ('payment_method', pa.string()),
+        ('invoice_date', pa.date32()),
+        ('invoice_time', pa.string()),
+        ('month', pa.string()),
+    ])
+
+
+class OlapSink:
+    """Buffers record batches and writes one Parquet file per month on flush
+
+    Files are only written every OLAP_FLUSH_ROWS rows or OLAP_FLUSH_INTERVAL
+    seconds so the dataset is not fragmented into one tiny file per batch.
+    """
+
+    def __init__(self, base_dir=OLAP_DIR, flush_rows=OLAP_FLUSH_ROWS, flush_interval=OLAP_FLUSH_INTERVAL):
+        self.base_dir = os.path.join(base_dir, 'transactions')
+        # Outside the dataset (same filesystem), so readers never see partial files
+        self.staging_dir = os.path.join(base_dir, '.staging')
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.batches = []
+        self.buffered_rows = 0
+        self.last_flush = time.time()
+
+    def append(self, transactions, autoflush=True):
+        """Convert a batch to an Arrow record batch and buffer it"""
+        self.batches.append(pa.RecordBatch.from_pydict({
+            'customer_id': [t['customer_id'] for t in transactions],
+            'gender': [t['gender'] for t in transactions],
+            'age': [t['age'] for t in transactions],
+            'category': [t['category'] for t in transactions],
+            'quantity': [t['quantity'] for t in transactions],
+            'price': [float(t['price']) for t in transactions],
+            'payment_method': [t['payment_method'] for t in transactions],
+            'invoice_date': [date.fromisoformat(t['invoice_date']) for t in transactions],
+            'invoice_time': [t.get('invoice_time') for t in transactions],
+            'month': [t['invoice_date'][:7] for t in transactions],
+        }, schema=OLAP_SCHEMA))
+        self.buffered_rows += len(transactions)
+
+        if autoflush and (self.buffered_rows >= self.flush_rows or time.time() - self.last_flush >= self.flush_interval):
+            self.flush()
+
+    def clear(self):
+        """Drop buffered rows without writing them"""
+        self.batches = []
+        self.buffered_rows = 0
+
+    def flush(self, tag=None):
+        """Write buffered rows into the hive-partitioned dataset
+
+        With a stable tag (backfill chunk key) the file names are fixed, so
+        a retried flush overwrites its earlier files instead of adding more.
+        """
+        self.last_flush = time.time()
+        if not self.batches:
+            return 0
+
+        table = pa.Table.from_batches(self.batches, schema=OLAP_SCHEMA)
+        staging = os.path.join(self.staging_dir, uuid.uuid4().hex)
+        try:
+            ds.write_dataset(
+                table,
+                staging,
+                format='parquet',
+                partitioning=ds.partitioning(pa.schema([('month', pa.string())]), flavor='hive'),
+                basename_template=f"part-{tag or f'{int(self.last_flush)}-{uuid.uuid4().hex[:8]}'}-{{i}}.parquet"
+            )
+            self._publish(staging)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        written = self.buffered_rows
+        self.clear()
+        print(f"[Consumer] Flushed {written} rows to OLAP dataset")
+        return written
+
+    def _publish(self, staging):
+        """Move complete files from staging into the dataset, one atomic rename each"""
+        for partition in sorted(os.listdir(staging)):
+            target = os.path.join(self.base_dir, partition)
+            os.makedirs(target, exist_ok=True)
+            for name in sorted(os.listdir(os.path.join(staging, partition))):
+                os.replace(os.path.join(staging, partition, name), os.path.join(target, name))
+
+
+def create_olap_sink():
+    """Create the OLAP sink if it is configured"""
+    if not OLAP_DIR:
+        return None
+    if not PYARROW_AVAILABLE:
+        print("[Consumer] Warning: pyarrow not installed. OLAP sink disabled.")
+        return None
+    return OlapSink()
+
+
+def save_to_olap(olap_sink, transactions):
+    """Append a batch to the OLAP sink"""
+    if olap_sink is None:
+        return
+
+    try:
+        olap_sink.append(transactions)
+    except Exception as e:
+        print(f"[Consumer] OLAP sink error: {e}")
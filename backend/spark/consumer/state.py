@@ -0,0 +1,264 @@
+"""
+Consumer State
+Per-customer running totals used for segmentation and churn scoring. A
+bounded in-memory hot tier of __slots__ records sits in front of an embedded
+SQLite store, so memory stays within STATE_MEMORY_MB and counts survive
+restarts. The Kafka offsets each flush covers are stored in the same SQLite
+transaction, and a periodic msgpack snapshot of the hot tier lets a
+restarted consumer start warm.
+"""
+
+import os
+import sqlite3
+import sys
+import time
+from collections import OrderedDict
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+# Configuration from environment ('' keeps state in memory only, unbounded)
+STATE_PATH = os.getenv('STATE_PATH', '/tmp/consumer-state/customers.db')
+STATE_MEMORY_MB = int(os.getenv('STATE_MEMORY_MB', '256'))
+STATE_SNAPSHOT_INTERVAL = int(os.getenv('STATE_SNAPSHOT_INTERVAL', '300'))  # seconds; 0 disables
+
+SNAPSHOT_VERSION = 2
+
+
+class CustomerRecord:
+    """Running totals for one customer"""
+
+    __slots__ = ('orders', 'gmv', 'last_date', 'gender', 'age', 'items', 'price_sum', 'first_date')
+
+    def __init__(self, orders=0, gmv=0.0, last_date=None, gender=None, age=None,
+                 items=0, price_sum=0.0, first_date=None):
+        self.orders = orders
+        self.gmv = gmv
+        self.last_date = last_date
+        self.gender = gender
+        self.age = age
+        self.items = items
+        self.price_sum = price_sum
+        self.first_date = first_date
+
+    def values(self):
+        """Fields in storage column order"""
+        return (self.orders, self.gmv, self.last_date, self.gender, self.age,
+                self.items, self.price_sum, self.first_date)
+
+
+# Columns added after the first release of the store, with their definitions
+ADDED_COLUMNS = (
+    ('items', 'INTEGER NOT NULL DEFAULT 0'),
+    ('price_sum', 'REAL NOT NULL DEFAULT 0'),
+    ('first_date', 'TEXT'),
+)
+
+# Approximate resident bytes per hot entry: record, key, gmv float and the OrderedDict node
+ENTRY_BYTES = sys.getsizeof(CustomerRecord()) + sys.getsizeof('C00000000') + sys.getsizeof(0.0) + 100
+
+
+class CustomerState:
+    """LRU hot tier over SQLite
+
+    get() marks a customer dirty; flush() writes dirty records and the Kafka
+    offsets they cover to disk in one transaction and then evicts the least
+    recently used clean records beyond the memory budget. flush() is only
+    called after the MySQL commit for those records; changes that never
+    reached MySQL are discard()ed instead. Only dirty records
+    are pinned, and the consumer stops fetching while a batch cannot be
+    flushed, so the hot tier exceeds its budget by at most one batch of
+    customers.
+    """
+
+    def __init__(self, memory_mb=STATE_MEMORY_MB):
+        self.capacity = max(1, memory_mb * 2**20 // ENTRY_BYTES)
+        self.hot = OrderedDict()    # customer_id -> CustomerRecord, least recently used first
+        self.dirty = set()          # customer_ids changed since the last flush
+        self.offsets = {}           # (topic, partition) -> next offset, as stored
+        self.pending_offsets = {}   # offsets of records applied since the last flush
+        self.db = None
+        self.snapshot_path = None
+
+    def open(self, path=STATE_PATH):
+        """Attach the on-disk store; without one nothing is evicted"""
+        if not path:
+            return
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS customers (
+                customer_id TEXT PRIMARY KEY,
+                orders INTEGER NOT NULL,
+                gmv REAL NOT NULL,
+                last_date TEXT,
+                gender TEXT,
+                age INTEGER,
+                items INTEGER NOT NULL DEFAULT 0,
+                price_sum REAL NOT NULL DEFAULT 0,
+                first_date TEXT
+            ) WITHOUT ROWID
+        """)
+        # Stores created before the feature columns existed
+        existing = {row[1] for row in self.db.execute("PRAGMA table_info(customers)")}
+        for column, definition in ADDED_COLUMNS:
+            if column not in existing:
+                self.db.execute(f"ALTER TABLE customers ADD COLUMN {column} {definition}")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS kafka_offsets (
+                topic TEXT NOT NULL,
+                partition INTEGER NOT NULL,
+                next_offset INTEGER NOT NULL,
+                PRIMARY KEY (topic, partition)
+            ) WITHOUT ROWID
+        """)
+        self.offsets = {(topic, partition): offset for topic, partition, offset
+                        in self.db.execute("SELECT topic, partition, next_offset FROM kafka_offsets")}
+        self.snapshot_path = path + '.snapshot'
+        print(f"[Consumer] Customer state at {path} (hot tier {self.capacity} customers)")
+        self._load_snapshot()
+
+    def _load(self, customer_id):
+        if self.db is not None:
+            row = self.db.execute(
+                "SELECT orders, gmv, last_date, gender, age, items, price_sum, first_date "
+                "FROM customers WHERE customer_id = ?",
+                (customer_id,)
+            ).fetchone()
+            if row is not None:
+                return CustomerRecord(*row)
+        return CustomerRecord()
+
+    def get(self, customer_id):
+        """Record for a customer (loaded from disk on a miss), marked dirty"""
+        record = self.hot.get(customer_id)
+        if record is None:
+            record = self.hot[customer_id] = self._load(customer_id)
+        else:
+            self.hot.move_to_end(customer_id)
+        self.dirty.add(customer_id)
+        return record
+
+    def dirty_items(self):
+        """(customer_id, record) changed since the last flush, in customer_id order"""
+        return [(customer_id, self.hot[customer_id]) for customer_id in sorted(self.dirty)]
+
+    def track_offsets(self, offsets):
+        """Record {(topic, partition): next offset} for records applied to the state"""
+        self.pending_offsets.update(offsets)
+
+    def flush(self):
+        """Persist dirty records and offsets, then shrink the hot tier to the budget"""
+        if self.db is None:
+            self.dirty.clear()
+            self.offsets.update(self.pending_offsets)
+            self.pending_offsets.clear()
+            return
+
+        if self.dirty or self.pending_offsets:
+            with self.db:
+                self.db.executemany("""
+                    INSERT INTO customers
+                    (customer_id, orders, gmv, last_date, gender, age, items, price_sum, first_date)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (customer_id) DO UPDATE SET
+                        orders = excluded.orders,
+                        gmv = excluded.gmv,
+                        last_date = excluded.last_date,
+                        gender = excluded.gender,
+                        age = excluded.age,
+                        items = excluded.items,
+                        price_sum = excluded.price_sum,
+                        first_date = excluded.first_date
+                """, [(customer_id, *r.values()) for customer_id, r in self.dirty_items()])
+                self.db.executemany("""
+                    INSERT INTO kafka_offsets (topic, partition, next_offset) VALUES (?, ?, ?)
+                    ON CONFLICT (topic, partition) DO UPDATE SET next_offset = excluded.next_offset
+                """, [(topic, partition, offset) for (topic, partition), offset in self.pending_offsets.items()])
+            self.dirty.clear()
+            self.offsets.update(self.pending_offsets)
+            self.pending_offsets.clear()
+
+        while len(self.hot) > self.capacity:
+            self.hot.popitem(last=False)
+
+    def snapshot(self):
+        """Write the hot tier and stored offsets to a msgpack file, atomically
+
+        Only taken right after a successful flush, so every record in the
+        file matches the SQLite store at the recorded offsets.
+        """
+        if self.db is None or not MSGPACK_AVAILABLE or self.dirty or self.pending_offsets:
+            return False
+
+        start = time.time()
+        payload = msgpack.packb({
+            'version': SNAPSHOT_VERSION,
+            'created': start,
+            'offsets': [[topic, partition, offset] for (topic, partition), offset in self.offsets.items()],
+            'customers': [[customer_id, *r.values()] for customer_id, r in self.hot.items()],
+        })
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        print(f"[Consumer] State snapshot: {len(self.hot)} customers, "
+              f"{len(payload) / 2**20:.1f} MiB in {time.time() - start:.2f}s")
+        return True
+
+    def _load_snapshot(self):
+        """Warm the hot tier from the snapshot if it matches the stored offsets"""
+        if not MSGPACK_AVAILABLE or not os.path.exists(self.snapshot_path):
+            return
+
+        start = time.time()
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                data = msgpack.unpackb(f.read(), use_list=False)
+        except (OSError, ValueError) as e:
+            print(f"[Consumer] Ignoring unreadable state snapshot: {e}")
+            return
+
+        offsets = {(topic, partition): offset for topic, partition, offset in data['offsets']}
+        if data.get('version') != SNAPSHOT_VERSION or offsets != self.offsets:
+            # Older than the store (e.g. a crash after later flushes); records load lazily instead
+            print("[Consumer] State snapshot is stale, starting cold")
+            return
+
+        for customer_id, *fields in data['customers'][-self.capacity:]:
+            self.hot[customer_id] = CustomerRecord(*fields)
+        print(f"[Consumer] Loaded {len(self.hot)} customers from snapshot in {time.time() - start:.2f}s")
+
+    def clear(self):
+        """Drop in-memory records (the on-disk store is kept)"""
+        self.hot.clear()
+        self.dirty.clear()
+        self.pending_offsets.clear()
+
+    def discard(self):
+        """Forget changes not checkpointed by a MySQL commit
+
+        Dirty records are dropped from the hot tier so they reload from the
+        store, and pending offsets are dropped so a restart replays them.
+        """
+        for customer_id in self.dirty:
+            self.hot.pop(customer_id, None)
+        self.dirty.clear()
+        self.pending_offsets.clear()
+
+    def close(self):
+        """Close the store; unflushed changes are never persisted here"""
+        if self.db is not None:
+            self.snapshot()
+            self.db.close()
+            self.db = None
+
+    def __len__(self):
+        return len(self.hot)
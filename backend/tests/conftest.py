@@ -0,0 +1,12 @@
+"""
+Shared test setup: the consumer, producer and API directories are put on
+sys.path the same way the benchmarks do, and the benchmark fakes stand in
+for Kafka, MySQL and HBase
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import common  # noqa: E402,F401  (path setup)
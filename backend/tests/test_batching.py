@@ -0,0 +1,43 @@
+"""Adaptive batch controller against the simulated load curves"""
+
+import pytest
+
+from batching import AdaptiveBatchController
+from sim_batching import LOAD_CURVES, simulate
+
+TARGET = 5.0
+FLUSH_FIXED = 0.05
+FLUSH_PER_ROW = 0.0002
+# A record that arrives mid-flush also waits for that flush before polling
+IN_FLIGHT_SLACK = 0.25
+
+
+class RecordingController(AdaptiveBatchController):
+    """Keeps the size chosen after every flush"""
+
+    def __init__(self):
+        super().__init__(target_freshness=TARGET)
+        self.sizes = []
+
+    def observe(self, rows, age, flush_seconds, lag):
+        super().observe(rows, age, flush_seconds, lag)
+        self.sizes.append(self.size)
+
+
+@pytest.mark.parametrize('curve', ['steady', 'burst'])
+def test_freshness_bound(curve):
+    result = simulate(curve, RecordingController(), FLUSH_FIXED, FLUSH_PER_ROW)
+
+    assert result['unflushed'] == 0
+    assert result['p95'] <= TARGET
+    assert result['max'] <= TARGET + IN_FLIGHT_SLACK
+
+
+def test_size_holds_under_steady_high_load(monkeypatch):
+    monkeypatch.setitem(LOAD_CURVES, 'busy', lambda t: 2000.0)
+    controller = RecordingController()
+    result = simulate('busy', controller, FLUSH_FIXED, FLUSH_PER_ROW)
+
+    settled = controller.sizes[len(controller.sizes) // 2:]
+    assert len(set(settled)) <= 2
+    assert result['max'] <= TARGET + IN_FLIGHT_SLACK
@@ -0,0 +1,29 @@
+"""save_cohorts retries"""
+
+from cohort import CohortEngine, save_cohorts
+from fakes import FakeMySQLConnection
+
+
+def order(customer_id, invoice_date):
+    return {'customer_id': customer_id, 'invoice_date': invoice_date}
+
+
+def test_failed_batch_is_retried_with_the_next_one():
+    engine = CohortEngine()
+    seen = []
+
+    def update(cursor, transactions):
+        seen.append([(t['customer_id'], t['invoice_date'][:7]) for t in transactions])
+        if len(seen) <= 2:
+            raise RuntimeError('lock wait timeout')
+        return 0
+
+    engine.update = update
+    engine.flush = lambda cursor: 0
+
+    assert save_cohorts(FakeMySQLConnection(), engine, [order('C1', '2024-01-05')]) is False
+    assert engine.pending == {('C1', '2024-01')}
+
+    assert save_cohorts(FakeMySQLConnection(), engine, [order('C2', '2024-02-01')]) is None
+    assert seen[-1] == [('C1', '2024-01'), ('C2', '2024-02')]
+    assert not engine.pending
@@ -0,0 +1,38 @@
+"""Customer feature lookups"""
+
+import threading
+
+import pytest
+
+customer_features = pytest.importorskip('customer_features')
+
+
+def test_legacy_total_gmv_is_served_as_price_sum():
+    values = customer_features._decode({b'cf:total_gmv': b'12.5', b'cf:order_count': b'2'})
+    assert values == {'price_sum': 12.5, 'order_count': 2}
+
+    values = customer_features._decode({b'cf:total_gmv': b'1.0', b'cf:price_sum': b'12.5'})
+    assert values == {'price_sum': 12.5}
+
+
+def test_cache_survives_concurrent_get_and_put():
+    cache = customer_features.TTLCache(size=50, ttl=60)
+    failures = []
+
+    def worker(offset):
+        try:
+            for i in range(2000):
+                key = (i + offset) % 100
+                cache.put(key, i)
+                cache.get((key + 1) % 100)
+        except Exception as e:
+            failures.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n * 7,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not failures
+    assert len(cache.entries) <= 50
@@ -0,0 +1,40 @@
+"""EXPLAIN plan regression check for every endpoint query
+
+Runs against the database configured by MYSQL_* (created from
+init/mysql/init.sql) and is skipped when MySQL is not reachable.
+"""
+
+import pytest
+
+index_advisor = pytest.importorskip('index_advisor')
+
+QUERIES = list(index_advisor.endpoint_queries())
+
+
+@pytest.fixture(scope='module')
+def cursor():
+    try:
+        conn = index_advisor.get_mysql_connection()
+    except Exception as e:
+        pytest.skip(f"MySQL not available: {e}")
+    cursor = conn.cursor(dictionary=True)
+    yield cursor
+    cursor.close()
+    conn.close()
+
+
+def test_full_scan_is_reported():
+    errors, warnings = index_advisor.analyze_plan([
+        {'table': 'transactions', 'type': 'ALL', 'rows': 1000, 'key': None, 'Extra': 'Using filesort'},
+        {'table': '<derived2>', 'type': 'ALL', 'rows': 10, 'key': None, 'Extra': None},
+    ])
+    assert errors == ['full scan on transactions (rows=1000)']
+    assert warnings == ['using filesort on transactions (key=None)']
+
+
+@pytest.mark.parametrize('name, sql, params', QUERIES, ids=[name for name, _, _ in QUERIES])
+def test_query_uses_an_index(cursor, name, sql, params):
+    if name in index_advisor.SMALL_TABLE_QUERIES:
+        pytest.skip("reads a small materialized table by design")
+    errors, _ = index_advisor.analyze_plan(index_advisor.explain(cursor, sql, params))
+    assert not errors, f"{name}: {'; '.join(errors)}"
@@ -0,0 +1,131 @@
+"""save_to_mysql error handling and producer-format parsing"""
+
+from datetime import datetime
+
+import pytest
+
+from common import synthetic_transactions
+from fakes import FakeMySQLConnection
+
+consumer = pytest.importorskip('consumer')
+
+
+class CountingMetric:
+    def __init__(self):
+        self.count = 0
+
+    def inc(self, amount=1):
+        self.count += amount
+
+
+class FailingCursorConnection(FakeMySQLConnection):
+    """Fails the first statement matching `prefix`"""
+
+    def __init__(self, prefix):
+        super().__init__()
+        self.prefix = prefix
+        self.rollbacks = 0
+
+    def cursor(self, *args, **kwargs):
+        cursor = super().cursor(*args, **kwargs)
+        execute = cursor.execute
+
+        def failing_execute(operation, params=None):
+            if ' '.join(operation.split()).startswith(self.prefix):
+                raise RuntimeError('rollup failed')
+            return execute(operation, params)
+
+        cursor.execute = failing_execute
+        return cursor
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+TRANSACTION = {
+    'customer_id': 'C1', 'gender': 'Female', 'age': 30, 'category': 'Books',
+    'quantity': 2, 'price': 10.0, 'payment_method': 'Cash', 'invoice_date': '2024-01-02',
+    'invoice_time': '10:00:00', 'timestamp': '2024-01-02T10:00:00.123456',
+}
+
+
+@pytest.fixture
+def errors(monkeypatch):
+    metric = CountingMetric()
+    monkeypatch.setattr(consumer.metrics, 'MYSQL_ERRORS', metric)
+    consumer.clear_batch_aggregators()
+    consumer.process_transaction(dict(TRANSACTION))
+    yield metric
+    consumer.clear_batch_aggregators()
+    consumer.category_bits.clear()
+
+
+def fail_insert(monkeypatch):
+    def write(conn, transactions, commit=True):
+        raise RuntimeError('insert failed')
+    monkeypatch.setattr(consumer.transaction_writer, 'write', write)
+
+
+def test_insert_failure_is_counted(monkeypatch, errors):
+    fail_insert(monkeypatch)
+    assert consumer.save_to_mysql(FakeMySQLConnection(), [dict(TRANSACTION)]) is False
+    assert errors.count == 1
+
+
+def test_insert_failure_reraises_original_error_in_bulk_mode(monkeypatch, errors):
+    fail_insert(monkeypatch)
+    with pytest.raises(RuntimeError, match='insert failed'):
+        consumer.save_to_mysql(FakeMySQLConnection(), [dict(TRANSACTION)], bulk=True)
+    assert errors.count == 1
+
+
+def test_rollup_failure_rolls_back_and_drops_category_bits(monkeypatch, errors):
+    monkeypatch.setattr(consumer.transaction_writer, 'write', lambda conn, transactions, commit=True: None)
+    consumer.category_bits['Books'] = 0
+    conn = FailingCursorConnection('INSERT INTO category_metrics')
+
+    assert consumer.save_to_mysql(conn, [dict(TRANSACTION)]) is False
+    assert errors.count == 1
+    assert conn.rollbacks == 1
+    assert consumer.category_bits == {}
+
+
+def test_retry_after_rollup_failure_skips_committed_raw_rows(monkeypatch, errors):
+    writes = []
+    monkeypatch.setattr(consumer.transaction_writer, 'write',
+                        lambda conn, transactions, commit=True: writes.append(len(transactions)))
+    committed = set()
+
+    conn = FailingCursorConnection('INSERT INTO category_metrics')
+    assert consumer.save_to_mysql(conn, [dict(TRANSACTION)], committed=committed) is False
+    assert committed == {'raw'}
+
+    assert consumer.save_to_mysql(FakeMySQLConnection(), [dict(TRANSACTION)], committed=committed) is not False
+    assert writes == [1]
+
+
+class RecordingRedis:
+    def __init__(self):
+        self.hashes = {}
+
+    def hset(self, key, mapping):
+        self.hashes[key] = mapping
+
+
+def test_fixture_matches_producer_format():
+    produced = synthetic_transactions(1)[0]
+    assert set(produced) == set(TRANSACTION)
+    for field in ('invoice_date', 'invoice_time', 'timestamp'):
+        assert type(produced[field]) is type(TRANSACTION[field])
+    assert datetime.fromisoformat(produced['timestamp']).strftime('%Y-%m-%d') == produced['invoice_date']
+
+
+def test_freshness_parses_producer_timestamps():
+    produced = datetime.fromisoformat(TRANSACTION['timestamp']).timestamp()
+    redis_conn = RecordingRedis()
+
+    consumer.record_freshness(redis_conn, [dict(TRANSACTION)], produced + 1.0, produced + 1.5)
+
+    freshness = redis_conn.hashes['realtime:freshness']
+    assert freshness['newest_event'] == produced
+    assert freshness['visible_at'] == produced + 1.5
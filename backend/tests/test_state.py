@@ -0,0 +1,26 @@
+"""CustomerState checkpointing"""
+
+from state import CustomerState
+
+
+def test_close_does_not_persist_unflushed_changes(tmp_path):
+    path = str(tmp_path / 'customers.db')
+    state = CustomerState()
+    state.open(path)
+    state.get('C1').orders = 1
+    state.track_offsets({('transactions', 0): 10})
+    state.flush()
+
+    # A batch that MySQL never took
+    state.get('C1').orders = 2
+    state.track_offsets({('transactions', 0): 20})
+    state.discard()
+    assert state.get('C1').orders == 1
+    state.discard()
+    state.close()
+
+    reopened = CustomerState()
+    reopened.open(path)
+    assert reopened.offsets == {('transactions', 0): 10}
+    assert reopened.get('C1').orders == 1
+    reopened.close()